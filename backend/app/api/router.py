@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 
 from app.api.v1.resource import router as resource_router
+from app.api.v1.task import router as task_router
 
 
 v1 = APIRouter(prefix="/v1/merlin")
 v1.include_router(resource_router)
+v1.include_router(task_router)
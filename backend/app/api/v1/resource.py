@@ -1,22 +1,72 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Path
+from fastapi import APIRouter, Depends, Header, Path, Query
+from starlette.responses import Response, StreamingResponse
 
-from app.schema.resource_schema import CreateResourceRequest
+from app.schema.resource_schema import BatchCreateResourceRequest, CreateResourceRequest
 from app.service.resource_service import resource_service
+from common.enum.resource import ExportFormat
 from common.response.response_schema import ResponseModel, response_base
+from libs.database.session import read_only
+from pkg.crud_plus.keyset import KeysetParams
+from utils.serializers import MsgSpecJSONResponse, MsgSpecRoute
 
 
-router = APIRouter(prefix="/resources")
+router = APIRouter(prefix="/resources", route_class=MsgSpecRoute)
 
 
-@router.get('/{id}', summary='获取资源详情')
-async def get_resource(id: Annotated[str, Path(...)]) -> ResponseModel:
-    api = resource_service.get(id=id)
-    return response_base.success(data=api)
+def _split_fields(fields: str | None) -> list[str] | None:
+    return [f for f in dict.fromkeys(f.strip() for f in fields.split(',')) if f] if fields else None
+
+
+@router.get('', summary='获取资源列表', dependencies=[Depends(read_only)])
+async def list_resources(
+        params: Annotated[KeysetParams, Depends()],
+        queue: Annotated[str | None, Query()] = None,
+        parent_id: Annotated[str | None, Query()] = None,
+) -> ResponseModel:
+    page = await resource_service.page(params, queue=queue, parent_id=parent_id)
+    return response_base.success(data=page)
+
+
+@router.get(':export', summary='导出资源', dependencies=[Depends(read_only)])
+async def export_resources(
+        format: Annotated[ExportFormat, Query(description='导出格式')] = ExportFormat.NDJSON,
+        queue: Annotated[str | None, Query()] = None,
+        parent_id: Annotated[str | None, Query()] = None,
+        fields: Annotated[str | None, Query(description='导出的字段，逗号分隔；不传导出全部字段（含 text）')] = None,
+        gzip: Annotated[bool, Query(description='以 Content-Encoding: gzip 压缩响应')] = False,
+) -> StreamingResponse:
+    chunks = resource_service.export(format, queue=queue, parent_id=parent_id, fields=_split_fields(fields), gzip=gzip)
+    headers = {'Content-Disposition': f'attachment; filename="resources.{format.value}"'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(chunks, media_type=format.media_type, headers=headers)
+
+
+@router.get('/{id}', summary='获取资源详情', response_model=ResponseModel, dependencies=[Depends(read_only)])
+async def get_resource(
+        id: Annotated[str, Path(...)],
+        fields: Annotated[
+            str | None, Query(description='返回的字段，逗号分隔，如 id,name,type；不传返回全部字段')
+        ] = None,
+        if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    api, etag = await resource_service.get_with_etag(id=id, fields=_split_fields(fields), if_none_match=if_none_match)
+    # 客户端缓存的版本仍是最新的，只返回 304，不读取也不传输资源内容
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if api is None:
+        return Response(status_code=304, headers=headers)
+    return MsgSpecJSONResponse(response_base.success(data=api), headers=headers)
 
 
 @router.post('', summary='创建资源')
 async def create_resource(reqeust: CreateResourceRequest) -> ResponseModel:
-    resource_service.create(reqeust)
+    await resource_service.create(reqeust)
     return response_base.success()
+
+
+@router.post(':batch', summary='批量创建资源')
+async def create_resources(request: BatchCreateResourceRequest) -> ResponseModel:
+    results = await resource_service.create_batch(request.items)
+    return response_base.success(data=results)
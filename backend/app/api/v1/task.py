@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends
+
+from app.service.task_service import task_service
+from common.response.response_schema import ResponseModel, response_base
+from libs.database.session import read_only
+from utils.serializers import MsgSpecRoute
+
+
+router = APIRouter(prefix="/tasks", route_class=MsgSpecRoute)
+
+
+@router.get('/metrics', summary='任务调度指标', dependencies=[Depends(read_only)])
+async def get_task_metrics() -> ResponseModel:
+    metrics = await task_service.metrics()
+    return response_base.success(data=metrics)
@@ -1,11 +1,113 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import contextlib
+
+from typing import Any, Sequence
+
+from pymysql.constants import ER  # type: ignore[import-untyped]
+from sqlalchemy import Row, func, select, update
+from sqlalchemy.exc import IntegrityError
+
 from app.model.resource_model import ResourceModel
-from pkg.crud_plus.crud import CRUDPlus
+from libs.database.db_mysql import use_primary
+from libs.database.session import get_async_session, get_session
+from pkg.crud_plus.cache import EntityCache
+from pkg.crud_plus.crud import DEFAULT_CHUNK_SIZE, CRUDPlus
+from pkg.crud_plus.crud_async import AsyncCRUDPlus
+
+
+def _is_duplicate_key(e: IntegrityError) -> bool:
+    return e.orig is not None and bool(e.orig.args) and e.orig.args[0] == ER.DUP_ENTRY
 
 
 class CRUDResource(CRUDPlus[ResourceModel]):
-    pass
 
+    def set_output_url(self, id: str, task_type: str, url: str) -> int:
+        """
+        记录一种任务类型的输出地址，JSON_SET 只修改 output_urls 中该类型的键，同一资源的多个任务先后上报互不覆盖
+
+        :param id:
+        :param task_type:
+        :param url:
+        :return: 更新的行数
+        """
+        session = get_session()
+        self._invalidate(session, [id])
+        output_urls = func.json_set(func.coalesce(ResourceModel.output_urls, func.json_object()), f'$.{task_type}', url)
+        result = session.execute(
+            update(ResourceModel).where(ResourceModel.id == id).values(output_urls=output_urls),
+            execution_options={'synchronize_session': False},
+        )
+        # 表达式无法在 Python 中求值，session 中已加载的对象整体过期
+        instance = session.identity_map.get(session.identity_key(ResourceModel, id))
+        if instance is not None:
+            session.expire(instance)
+        return result.rowcount
+
+
+class AsyncCRUDResource(AsyncCRUDPlus[ResourceModel]):
+
+    async def list_existing_ids(self, ids: Sequence[str]) -> set[str]:
+        if not ids:
+            return set()
+        session = get_async_session()
+        # 用于写入前的查重，读主库
+        with use_primary():
+            result = await session.execute(select(ResourceModel.id).filter(ResourceModel.id.in_(ids)))
+        return set(result.scalars().all())
+
+    async def create_missing(self, resources: Sequence[Any]) -> set[str]:
+        """
+        批量写入资源并跳过已存在的 id：每批一条多行 INSERT；查重之后有并发事务写入了相同 id 时，
+        该批回滚到 savepoint 后逐条写入，只跳过冲突的行。自动提交的 session 没有事务，
+        失败的语句本身不生效，不使用 savepoint
+
+        :param resources: ResourceDO 或 ResourceModel
+        :return: 已存在、未写入的 id
+        """
+        session = get_async_session()
+        autocommit = session.get_bind().get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+
+        def savepoint():
+            return contextlib.nullcontext() if autocommit else session.begin_nested()
+
+        existing = set()
+        for i in range(0, len(resources), DEFAULT_CHUNK_SIZE):
+            chunk = resources[i:i + DEFAULT_CHUNK_SIZE]
+            try:
+                async with savepoint():
+                    await self.create_models(chunk, bulk=True)
+                continue
+            except IntegrityError as e:
+                if not _is_duplicate_key(e):
+                    raise
+            for resource in chunk:
+                try:
+                    async with savepoint():
+                        await self.create_models([resource], bulk=True)
+                except IntegrityError as e:
+                    if not _is_duplicate_key(e):
+                        raise
+                    existing.add(resource.id)
+        return existing
+
+    async def select_version(self, id: str) -> Row[tuple[str, Any]] | None:
+        """
+        只查询 (id, update_time)，主键查找不读取 text 列，也不经过缓存，用于 ETag 校验
+
+        :param id:
+        :return: 资源不存在时返回 None
+        """
+        session = get_async_session()
+        result = await session.execute(
+            select(ResourceModel.id, ResourceModel.update_time).where(ResourceModel.id == id)
+        )
+        return result.first()
+
+
+# 同步与 asyncio 版本共用一个缓存，任一侧的写入都会失效另一侧读到的行
+resource_cache: EntityCache = EntityCache()
+
+resource_dao: CRUDResource = CRUDResource(ResourceModel, cache=resource_cache)
 
-resource_dao: CRUDResource = CRUDResource(ResourceModel)
+resource_async_dao: AsyncCRUDResource = AsyncCRUDResource(ResourceModel, cache=resource_cache)
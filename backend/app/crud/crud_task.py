@@ -1,27 +1,100 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import List
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import List, Mapping, Sequence
 
-from sqlalchemy import func, select, update
+from sqlalchemy import Integer, cast, func, insert, literal_column, select, update
+from sqlalchemy.orm import Session
 
+from app.do.task import TaskDO
+from app.model.task_dependency_model import TaskDependencyModel
 from app.model.task_model import TaskModel
 from common.enum.task import TaskStatus
 from libs.conf import settings
-from libs.database.session import get_session
+from libs.database.db_mysql import db_session, use_primary
+from libs.database.session import get_async_session, get_session
+from libs.notifier import notify_on_commit, task_notifier
 from pkg.crud_plus.crud import CRUDPlus
+from pkg.crud_plus.crud_async import AsyncCRUDPlus
+from utils.str import uuid7_hex
+
+
+def _seconds_from_now(seconds):
+    # 以数据库时间计算，多个实例之间不受各自时钟偏差影响
+    return func.timestampadd(literal_column('SECOND'), seconds, func.now())
+
+
+def _ready_conditions() -> list:
+    """到期、未超过重试次数且上游任务均已成功的 PENDING 任务"""
+    return [
+        TaskModel.status == TaskStatus.PENDING.value,
+        TaskModel.pending_upstreams == 0,
+        TaskModel.run_time <= func.now(),
+        TaskModel.retry_count <= settings.TASK_RETRY_COUNT,
+    ]
+
+
+def _downstream_ids(task_ids: Sequence[int]):
+    return select(TaskDependencyModel.task_id).where(TaskDependencyModel.upstream_id.in_(task_ids))
+
+
+def _finish_downstream(session: Session, task_ids: Sequence[int], status: TaskStatus) -> None:
+    """
+    上游任务结束后更新下游：成功时下游的 pending_upstreams 减一，减到 0 即可被领取，提交后唤醒 producer；
+    失败或取消时下游不会再满足条件，逐层取消
+    """
+    options = {'synchronize_session': False}
+    if status == TaskStatus.SUCCESS:
+        query = update(TaskModel).where(TaskModel.id.in_(_downstream_ids(task_ids))) \
+            .values(pending_upstreams=TaskModel.pending_upstreams - 1)
+        if session.execute(query, execution_options=options).rowcount:
+            notify_on_commit(session, task_notifier)
+        return
+    if status not in (TaskStatus.FAILED, TaskStatus.CANCEL):
+        return
+    while task_ids:
+        task_ids = session.execute(_downstream_ids(task_ids)).scalars().all()
+        if task_ids:
+            query = update(TaskModel).where(TaskModel.id.in_(task_ids), TaskModel.status == TaskStatus.PENDING.value) \
+                .values(status=TaskStatus.CANCEL.value, error_msg='上游任务未成功')
+            session.execute(query, execution_options=options)
+
+
+def _check_acyclic(size: int, upstreams: Mapping[int, Sequence[int]]) -> None:
+    """有环的任务永远不会就绪"""
+    state = [0] * size  # 0 未访问，1 访问中，2 已完成
+
+    def visit(i: int) -> None:
+        if state[i] == 1:
+            raise ValueError(f'任务依赖存在环: {i}')
+        if state[i] == 0:
+            state[i] = 1
+            for u in upstreams.get(i, ()):
+                visit(u)
+            state[i] = 2
+
+    for i in range(size):
+        visit(i)
+
+
+def _count_ready_query():
+    return select(TaskModel.queue, TaskModel.type, func.count()).where(*_ready_conditions()) \
+        .group_by(TaskModel.queue, TaskModel.type)
 
 
 class CRUDTask(CRUDPlus[TaskModel]):
 
-    def list_by_queue(self):
+    def count_ready(self) -> dict[tuple[str, str], int]:
+        """
+        各 (queue, type) 的就绪任务数，走主库，刚写入的任务不受从库延迟影响
+
+        :return:
+        """
         session = get_session()
-        query = select(TaskModel.queue, func.min(TaskModel.id)).filter(
-            TaskModel.run_time <= func.now(),
-            TaskModel.retry_count <= settings.TASK_RETRY_COUNT,
-            TaskModel.status <= TaskStatus.PENDING.value,
-        ).group_by(TaskModel.queue)
-        result = session.execute(query)
-        return result.scalars().all()
+        with use_primary():
+            result = session.execute(_count_ready_query())
+        return {(queue, type): count for queue, type, count in result}
 
     def list_by_ids(self, task_ids: List[str]):
         session = get_session()
@@ -44,5 +117,181 @@ class CRUDTask(CRUDPlus[TaskModel]):
         result = session.execute(query)
         return result.rowcount
 
+    def claim(
+            self,
+            owner: str,
+            limit: int = settings.TASK_CONCURRENCY,
+            lease_seconds: int = settings.TASK_LEASE_SECONDS,
+            queues: Sequence[str] | None = None,
+            types: Sequence[str] | None = None,
+    ) -> list[TaskDO]:
+        """
+        为一个 worker 领取最多 limit 个到期的 PENDING 任务，置为 RUNNING 并记录租约
+
+        SELECT ... FOR UPDATE SKIP LOCKED（mysql 8）跳过其它 worker 已锁定的行，多个 worker 并发领取时
+        既不会拿到同一个任务，也不会互相等锁；查询、更新与提交在一个独立的事务内完成，不使用调用方的 session
+
+        每次领取生成一个令牌，lease_owner 记录为 owner:令牌；同一进程内过期后被回收、又被重新领取的任务令牌不同，
+        旧的执行无法再续约或结束它，heartbeat / complete 需传入返回的任务上的 lease_owner
+
+        :param owner: worker 标识，如 hostname:pid
+        :param limit: 最多领取的任务数
+        :param lease_seconds: 租约时长，单位秒
+        :param queues: 只领取这些分组的任务，为空时不限
+        :param types: 只领取这些类型的任务，为空时不限
+        :return: 领取到的任务，按 id 升序
+        """
+        conditions = _ready_conditions()
+        if queues:
+            conditions.append(TaskModel.queue.in_(queues))
+        if types:
+            conditions.append(TaskModel.type.in_(types))
+        query = select(TaskModel, func.now()).where(*conditions).order_by(TaskModel.id).limit(limit) \
+            .with_for_update(skip_locked=True)
+        with db_session() as session, session.begin():
+            rows = session.execute(query).all()
+            if not rows:
+                return []
+            # 到期时间按数据库时间计算，与 run_time <= now() 等比较使用同一个时钟
+            lease = dict(
+                status=TaskStatus.RUNNING.value,
+                lease_owner=f'{owner[:31]}:{uuid7_hex()}',
+                lease_expire_time=rows[0][1] + timedelta(seconds=lease_seconds),
+            )
+            session.execute(
+                update(TaskModel).where(TaskModel.id.in_([task.id for task, _ in rows])).values(**lease),
+                execution_options={'synchronize_session': False},
+            )
+            return [TaskDO.from_orm(task).model_copy(update=lease) for task, _ in rows]
+
+    def complete(self, task_id: int, lease_owner: str, status: TaskStatus, error_msg: str | None = None) -> int:
+        """
+        结束一个已领取的任务并释放租约，在同一个事务内更新下游任务；
+        租约已不属于本次领取（如过期后被重新领取）时不更新
+
+        :param task_id:
+        :param lease_owner: claim 返回的任务上的 lease_owner
+        :param status: SUCCESS / FAILED / PENDING（放回队列）
+        :param error_msg:
+        :return: 更新的行数
+        """
+        query = update(self.model).where(
+            TaskModel.id == task_id,
+            TaskModel.lease_owner == lease_owner,
+        ).values(status=status.value, error_msg=error_msg, lease_owner=None, lease_expire_time=None)
+        with db_session() as session, session.begin():
+            rowcount = session.execute(query, execution_options={'synchronize_session': False}).rowcount
+            if rowcount:
+                _finish_downstream(session, [task_id], status)
+        return rowcount
+
+    def heartbeat(self, task_ids: Sequence[int], lease_owner: str,
+                  lease_seconds: int = settings.TASK_LEASE_SECONDS) -> int:
+        """
+        执行中的 worker 定期调用，把租约延长到 now + lease_seconds
+
+        :param task_ids: 同一次领取的任务
+        :param lease_owner: claim 返回的任务上的 lease_owner
+        :param lease_seconds:
+        :return: 续约成功的任务数，少于 task_ids 说明租约已过期被回收，任务可能已在别处执行
+        """
+        session = get_session()
+        query = update(self.model).where(
+            TaskModel.id.in_(task_ids),
+            TaskModel.status == TaskStatus.RUNNING.value,
+            TaskModel.lease_owner == lease_owner,
+        ).values(lease_expire_time=_seconds_from_now(lease_seconds))
+        result = session.execute(query, execution_options={'synchronize_session': False})
+        return result.rowcount
+
+    def reap_expired(self, batch: int = settings.TASK_REAPER_BATCH) -> tuple[int, int]:
+        """
+        回收租约过期的 RUNNING 任务（worker 崩溃或失联）：未超过 TASK_RETRY_COUNT 的用一条 UPDATE 放回 PENDING，
+        retry_count + 1，run_time 按指数退避推迟；超过的置为 FAILED，并取消其下游任务
+
+        :param batch: 每条 UPDATE 最多处理的行数，避免一次锁住过多行
+        :return: (放回队列的任务数, 置为失败的任务数)
+        """
+        expired = (
+            TaskModel.status == TaskStatus.RUNNING.value,
+            TaskModel.lease_expire_time < func.now(),
+        )
+        released = ((TaskModel.lease_owner, None), (TaskModel.lease_expire_time, None))
+        backoff = cast(func.least(
+            settings.TASK_RETRY_BACKOFF_SECONDS * func.pow(2, TaskModel.retry_count),
+            settings.TASK_RETRY_BACKOFF_MAX_SECONDS,
+        ), Integer)
+        # mysql 按 SET 的顺序求值，run_time 需在 retry_count 自增之前计算
+        requeue = update(self.model).where(
+            *expired, TaskModel.retry_count < settings.TASK_RETRY_COUNT
+        ).ordered_values(
+            (TaskModel.run_time, _seconds_from_now(backoff)),
+            (TaskModel.retry_count, TaskModel.retry_count + 1),
+            (TaskModel.status, TaskStatus.PENDING.value),
+            *released,
+        ).with_dialect_options(mysql_limit=batch)
+        fail = select(TaskModel.id).where(
+            *expired, TaskModel.retry_count >= settings.TASK_RETRY_COUNT
+        ).limit(batch).with_for_update(skip_locked=True)
+        options = {'synchronize_session': False}
+        with db_session() as session, session.begin():
+            requeued = session.execute(requeue, execution_options=options).rowcount
+            failed_ids = session.execute(fail).scalars().all()
+            if failed_ids:
+                query = update(self.model).where(TaskModel.id.in_(failed_ids)).ordered_values(
+                    (TaskModel.retry_count, TaskModel.retry_count + 1),
+                    (TaskModel.status, TaskStatus.FAILED.value),
+                    (TaskModel.error_msg, '租约过期，超过最大重试次数'),
+                    *released,
+                )
+                session.execute(query, execution_options=options)
+                _finish_downstream(session, failed_ids, TaskStatus.FAILED)
+        return requeued, len(failed_ids)
+
+
+class AsyncCRUDTask(AsyncCRUDPlus[TaskModel]):
+
+    async def create_graph(self, tasks: Sequence[TaskDO], upstreams: Mapping[int, Sequence[int]]) -> list[int]:
+        """
+        创建一组有依赖关系的任务：下游任务的 pending_upstreams 为上游任务数，依赖关系写入 task_dependency
+
+        :param tasks:
+        :param upstreams: 下游任务在 tasks 中的下标 -> 上游任务的下标
+        :return: 任务 id，与 tasks 一一对应
+        """
+        _check_acyclic(len(tasks), upstreams)
+        session = get_async_session()
+        rows = [
+            self.do_to_params(t.model_copy(update={'pending_upstreams': len(upstreams.get(i, ()))}))
+            for i, t in enumerate(tasks)
+        ]
+        result = await session.execute(insert(TaskModel).values(rows))
+        # innodb_autoinc_lock_mode=2（mysql 8 默认）或 auto_increment_increment != 1 时自增 id 不连续，
+        # 不能由 lastrowid 推算；lastrowid 是本语句第一行的 id，本语句其余行的 id 都更大，按 (resource_id, type) 读回
+        first_id = result.lastrowid  # type: ignore[attr-defined]
+        with use_primary():
+            inserted = await session.execute(
+                select(TaskModel.id, TaskModel.resource_id, TaskModel.type)
+                .where(TaskModel.resource_id.in_(list({t.resource_id: None for t in tasks})), TaskModel.id >= first_id)
+                .order_by(TaskModel.id)
+            )
+        # 同一 (resource_id, type) 有多个任务时，id 与行的先后顺序一致
+        by_key: dict[tuple[str, str], deque[int]] = defaultdict(deque)
+        for id, resource_id, type in inserted:
+            by_key[(resource_id, type)].append(id)
+        ids = [by_key[(t.resource_id, t.type)].popleft() for t in tasks]
+        edges = [dict(upstream_id=ids[u], task_id=ids[i]) for i, ups in upstreams.items() for u in ups]
+        if edges:
+            await session.execute(insert(TaskDependencyModel), edges)
+        return ids
+
+    async def count_ready(self) -> dict[tuple[str, str], int]:
+        session = get_async_session()
+        with use_primary():
+            result = await session.execute(_count_ready_query())
+        return {(queue, type): count for queue, type, count in result}
+
 
 task_dao: CRUDTask = CRUDTask(TaskModel)
+
+task_async_dao: AsyncCRUDTask = AsyncCRUDTask(TaskModel)
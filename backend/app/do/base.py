@@ -1,7 +1,12 @@
 from abc import abstractmethod
+from typing import Any, Iterable
+
+import msgspec
 
 from pydantic import BaseModel, ConfigDict
 
+from utils.serializers import orm_to_struct, pydantic_struct
+
 
 class DOAttributeBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -10,4 +15,37 @@ class DOAttributeBase(BaseModel):
     def do_to_model(self, **kwargs):
         pass
 
+    def do_to_params(self, **kwargs) -> dict:
+        """
+        转为 Core insert 的参数字典，批量写入时跳过 orm 实例的构造，字段含义需与 do_to_model 保持一致
+
+        :param kwargs:
+        :return:
+        """
+        return {**self.model_dump(), **kwargs}
+
+    @classmethod
+    def from_orm_fields(cls, obj, fields: Iterable[str]) -> dict[str, Any]:
+        """
+        列投影查询的结果只加载了部分列，只取 fields 中的属性
+
+        :param obj:
+        :param fields:
+        :return:
+        """
+        return {f: getattr(obj, f) for f in fields}
+
+    @classmethod
+    def struct_from_orm(cls, obj, fields: Iterable[str] | None = None) -> msgspec.Struct:
+        """
+        orm 实例直接转为本类的 msgspec.Struct 镜像，不构造 pydantic 对象，用于只读接口的返回值
+
+        :param obj:
+        :param fields: 只读取这些属性，其余字段取默认值，用于只加载了部分列的实例
+        :return:
+        """
+        if fields is not None:
+            return msgspec.convert(cls.from_orm_fields(obj, fields), pydantic_struct(cls))
+        return orm_to_struct(obj, pydantic_struct(cls))
+
 # 有do 对象之后，一些方法可以附着在do对象上。不然既不能写在vo里，也不能写在po里，最后只能写各种工具方法
@@ -30,8 +30,13 @@ class ResourceDO(DOAttributeBase):
         default_factory=lambda: ResourceConfig())
     text: str | None = Field(None)
     text_url: str | None = Field(None)
+    output_urls: dict[str, str] | None = Field(None)
     create_time: datetime = Field(default_factory=datetime.now)
     update_time: datetime = Field(default_factory=datetime.now)
 
     def do_to_model(self, **kwargs):
         return ResourceModel(**self.model_dump(), **kwargs)
+
+
+# 不含 deferred 的 text 列：只读这些列时可以命中 EntityCache，text 只在调用方显式请求时读取
+RESOURCE_META_FIELDS: tuple[str, ...] = tuple(f for f in ResourceDO.model_fields if f != 'text')
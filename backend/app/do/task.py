@@ -17,7 +17,10 @@ class TaskDO(DOAttributeBase):
     status: int = Field(TaskStatus.PENDING.value)
     retry_count: int = Field(0)
     error_msg: str | None = Field(None)
+    pending_upstreams: int = Field(0)
     run_time: datetime = Field(default_factory=datetime.now)
+    lease_owner: str | None = Field(None)
+    lease_expire_time: datetime | None = Field(None)
     create_time: datetime = Field(default_factory=datetime.now)
     update_time: datetime = Field(default_factory=datetime.now)
 
@@ -28,4 +31,16 @@ class TaskDO(DOAttributeBase):
                          type=self.type,
                          status=self.status,
                          retry_count=self.retry_count,
-                         error_msg=self.error_msg)
+                         error_msg=self.error_msg,
+                         pending_upstreams=self.pending_upstreams)
+
+    def do_to_params(self, **kwargs) -> dict:
+        return dict(resource_id=self.resource_id,
+                    parent_resource_id=self.parent_resource_id,
+                    queue=self.queue,
+                    type=self.type,
+                    status=self.status,
+                    retry_count=self.retry_count,
+                    error_msg=self.error_msg,
+                    pending_upstreams=self.pending_upstreams,
+                    **kwargs)
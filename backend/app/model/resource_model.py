@@ -16,15 +16,20 @@ class ResourceModel(Base):
     # 自建的id 不带横杠，但是保不齐传入的id带横杠，所以长度还是36
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default_factory=uuid7_hex)
     parent_id: Mapped[str] = mapped_column(String(36), index=True, default=None, nullable=True, comment='父资源id')
-    queue: Mapped[str] = mapped_column(String(32), default='default', nullable=False, comment='分组')
+    queue: Mapped[str] = mapped_column(String(32), index=True, default='default', nullable=False, comment='分组')
     name: Mapped[str] = mapped_column(String(50), index=True, default=None, nullable=False, comment='名称')
     type: Mapped[str] = mapped_column(String(50), default=None, nullable=False, comment='类型')
     extension: Mapped[str] = mapped_column(String(32), default=None, nullable=False, comment='扩展名')
     meta_data: Mapped[dict | None] = mapped_column(JSON, default=None, comment='元信息')
     storage_url: Mapped[str | None] = mapped_column(String(255), default=None, nullable=False, comment='存储地址')
     config: Mapped[dict | None] = mapped_column(JSON, default=None, comment='转换配置')
-    text: Mapped[str] = mapped_column(TEXT, default=None, comment='转换结果')
+    # 转写/OCR 全文，体积大，默认不加载，需要时通过 CRUDPlus 的 fields 显式加载
+    text: Mapped[str] = mapped_column(TEXT, default=None, deferred=True, comment='转换结果')
     text_url: Mapped[str | None] = mapped_column(String(255), default=None, comment='text存储地址')
+    # 任务类型 -> runner 输出地址；None 存为 SQL NULL 而不是 JSON null，JSON_SET 才能在 COALESCE 后的空对象上写入
+    output_urls: Mapped[dict | None] = mapped_column(
+        JSON(none_as_null=True), default=None, comment='各任务类型的输出地址'
+    )
 
     def __repr__(self):
         return (f"<Resource(id='{self.id}', parent_id='{self.parent_id}', "
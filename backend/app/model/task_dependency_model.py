@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from sqlalchemy import Integer
+from sqlalchemy.orm import Mapped, declared_attr, mapped_column
+
+from common.model import Base
+
+
+class TaskDependencyModel(Base):
+    """任务依赖：task_id 在 upstream_id 成功后才能执行"""
+
+    @declared_attr.directive
+    def __tablename__(cls) -> str:
+        return 'task_dependency'
+
+    upstream_id: Mapped[int] = mapped_column(Integer, primary_key=True, default=None, comment='上游任务id')
+    task_id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, default=None, comment='下游任务id')
+
+    def __repr__(self):
+        return f"<TaskDependency(upstream_id={self.upstream_id}, task_id={self.task_id})>"
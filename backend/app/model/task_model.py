@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from sqlalchemy import Index, Integer, String
+from sqlalchemy.orm import Mapped, declared_attr, mapped_column
+
+from common.enum.task import TaskStatus
+from common.model import Base
+from utils.timezone import timezone
+
+
+class TaskModel(Base):
+    """任务"""
+
+    @declared_attr.directive
+    def __tablename__(cls) -> str:
+        return 'task'
+
+    # 与 migrations 中的复合索引一致
+    __table_args__ = (
+        Index('ix_ready', 'status', 'pending_upstreams', 'queue', 'type'),
+        Index('ix_status_lease_expire_time', 'status', 'lease_expire_time'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, init=False)
+    resource_id: Mapped[str] = mapped_column(String(36), index=True, default=None, nullable=False, comment='资源id')
+    parent_resource_id: Mapped[str | None] = mapped_column(String(36), default=None, comment='父资源id')
+    queue: Mapped[str] = mapped_column(String(32), default='default', nullable=False, comment='分组')
+    type: Mapped[str] = mapped_column(String(32), default=None, nullable=False, comment='任务类型')
+    status: Mapped[int] = mapped_column(Integer, default=TaskStatus.PENDING.value, nullable=False, comment='状态')
+    retry_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False, comment='重试次数')
+    error_msg: Mapped[str | None] = mapped_column(String(255), default=None, comment='错误信息')
+    # 为 0 才能被领取，上游任务成功时减一
+    pending_upstreams: Mapped[int] = mapped_column(Integer, default=0, nullable=False, comment='未完成的上游任务数')
+    run_time: Mapped[datetime] = mapped_column(default_factory=timezone.now, comment='最早执行时间')
+    lease_owner: Mapped[str | None] = mapped_column(String(64), default=None, comment='领取任务的 worker')
+    lease_expire_time: Mapped[datetime | None] = mapped_column(default=None, comment='租约到期时间')
+
+    def __repr__(self):
+        return (f"<Task(id={self.id}, resource_id='{self.resource_id}', type='{self.type}', "
+                f"status={self.status}, lease_owner='{self.lease_owner}')>")
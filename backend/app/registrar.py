@@ -1,19 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from multiprocessing import Queue
+import multiprocessing
 
 from fastapi import FastAPI
-from fastapi_sqlalchemy import DBSessionMiddleware
 
 from app.api.router import v1 as v1_router
-from app.task.task_consumer import TaskConsumer
 from app.task.task_producer import TaskProducer
+from app.task.task_reaper import task_reaper
+from app.task.task_scheduler import task_scheduler
+from app.task.task_worker import TaskWorkerPool
 from common.exception.exception_handler import register_exception
 from common.log import setup_logging
 from common.response.response_schema import ResponseModel
 from fastapi_pagination import add_pagination
-from libs.conf import settings
-from libs.database.db_mysql import SQLALCHEMY_DATABASE_URL
+from libs.database.session import RequestSessionMiddleware
+from utils.compress import CompressionMiddleware
 from utils.health_check import ensure_unique_route_names
 from utils.serializers import MsgSpecJSONResponse
 
@@ -45,15 +46,27 @@ def register_app():
     # 全局异常处理
     register_exception(app)
 
-    queue: Queue = Queue(maxsize=settings.TASK_CONCURRENCY)
-    task_producer = TaskProducer(queue)
-    task_producer.start()
-    task_consumer = TaskConsumer(queue)
-    task_consumer.start()
+    # 任务
+    register_task()
 
     return app
 
 
+def register_task() -> None:
+    """
+    任务领取、执行与过期回收
+
+    :return:
+    """
+    # spawn 启动的子进程（如任务进程池）初始化时会重新导入 __main__，此时不启动
+    if getattr(multiprocessing.current_process(), '_inheriting', False):
+        return
+    task_worker_pool = TaskWorkerPool(on_done=task_scheduler.release)
+    task_worker_pool.start()
+    TaskProducer(task_worker_pool).start()
+    task_reaper.start()
+
+
 def register_logger() -> None:
     """
     系统日志
@@ -70,15 +83,10 @@ def register_middleware(app: FastAPI):
     :param app:
     :return:
     """
-    app.add_middleware(DBSessionMiddleware, commit_on_exit=True, db_url=SQLALCHEMY_DATABASE_URL,
-                       engine_args={  # engine arguments example
-                           "echo": settings.DB_ECHO,  # print all SQL statements
-                           "pool_pre_ping": True,
-                           # feature will normally emit SQL equivalent to “SELECT 1” each time a connection is
-                           # checked out from the pool
-                           "pool_size": 5,  # number of connections to keep open at a time
-                           "max_overflow": 10,  # number of connections to allow to be opened above pool_size
-                       }, )
+    # 同步与 asyncio session 均按需创建，只读接口以 Depends(read_only) 标记
+    app.add_middleware(RequestSessionMiddleware)
+    # 最外层，压缩最终的响应体
+    app.add_middleware(CompressionMiddleware)
 
 
 def register_router(app: FastAPI):
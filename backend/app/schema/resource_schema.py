@@ -15,3 +15,13 @@ class CreateResourceRequest(SchemaBase):
     type: ResourceType = Field(description='资源类型')
     meta_data: ResourceMetadata | None = Field(default_factory=ResourceMetadata, description='元数据')
     config: ResourceConfig | None = Field(default_factory=ResourceConfig, description='处理配置')
+
+
+class BatchCreateResourceRequest(SchemaBase):
+    items: list[CreateResourceRequest] = Field(min_length=1, max_length=1000, description='待创建的资源')
+
+
+class BatchCreateResourceResult(SchemaBase):
+    index: int = Field(description='在请求 items 中的下标')
+    id: str | None = Field(None, description='创建成功时的资源id')
+    error: str | None = Field(None, description='创建失败的原因')
@@ -1,32 +1,262 @@
-from app.crud.crud_resource import resource_dao
-from app.crud.crud_task import task_dao
+import csv
+import io
+
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Sequence
+
+import msgspec
+
+from sqlalchemy import JSON, Row
+
+from app.crud.crud_resource import resource_async_dao
+from app.crud.crud_task import task_async_dao
 from app.do.resource import ResourceDO
 from app.do.task import TaskDO
-from app.schema.resource_schema import CreateResourceRequest
+from app.model.resource_model import ResourceModel
+from app.schema.resource_schema import BatchCreateResourceResult, CreateResourceRequest
+from common.enum.resource import ExportFormat
 from common.exception import errors
 from common.log import log
+from libs.conf import settings
+from libs.database.session import async_unit_of_work, get_async_session
+from libs.notifier import notify_on_commit, task_notifier
+from pkg.crud_plus.keyset import KeysetPage, KeysetParams
+from utils.compress import gzip_stream
+from utils.serializers import RowSerializer
+from utils.etag import etag_matches, make_etag
 from utils.str import uuid7_hex
 
 
+# ResourceDO 的全部字段，text 是 deferred 列，返回完整资源时需要显式加载
+RESOURCE_FIELDS: tuple[str, ...] = tuple(ResourceDO.model_fields)
+
+_json_encoder = msgspec.json.Encoder()
+
+
+def _check_fields(fields: Sequence[str]) -> None:
+    unknown = set(fields) - set(RESOURCE_FIELDS)
+    if unknown:
+        raise errors.RequestError(msg=f'不支持的字段: {", ".join(sorted(unknown))}')
+
+
+def _etag(id: str, update_time: Any, fields: Sequence[str] | None) -> str:
+    # 返回的字段不同，响应内容不同，ETag 也要不同；resource.update_time 为 datetime(6)，同一秒内的更新也能区分
+    return make_etag(id, update_time, ','.join(fields or RESOURCE_FIELDS))
+
+
+def _to_api(resource: ResourceModel, fields: Sequence[str] | None) -> msgspec.Struct | dict[str, Any]:
+    if fields:
+        return ResourceDO.from_orm_fields(resource, fields)
+    return ResourceDO.struct_from_orm(resource)
+
+
+def _ndjson_encoder(fields: Sequence[str]) -> Callable[[Sequence[Row]], bytes]:
+    serializer = RowSerializer.for_columns(ResourceModel.__table__.c[f] for f in fields)
+    return lambda rows: _json_encoder.encode_lines(serializer.serialize_all(rows))
+
+
+def _csv_bytes(rows: Sequence[Sequence[Any]]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+def _csv_encoder(fields: Sequence[str]) -> Callable[[Sequence[Row]], bytes]:
+    # JSON 列（meta_data、config）编码为 JSON 字符串，其余列交给 csv 模块（None 写为空）
+    json_columns = [i for i, f in enumerate(fields) if isinstance(ResourceModel.__table__.c[f].type, JSON)]
+    if not json_columns:
+        return _csv_bytes
+
+    def encode(rows: Sequence[Row]) -> bytes:
+        values = [list(row) for row in rows]
+        for row in values:
+            for i in json_columns:
+                if row[i] is not None:
+                    row[i] = _json_encoder.encode(row[i]).decode()
+        return _csv_bytes(values)
+
+    return encode
+
+
+async def _export_chunks(
+        format: ExportFormat, fields: Sequence[str], conditions: dict[str, Any], batch_size: int
+) -> AsyncIterator[bytes]:
+    if format == ExportFormat.CSV:
+        encode = _csv_encoder(fields)
+        yield _csv_bytes([fields])
+    else:
+        encode = _ndjson_encoder(fields)
+    batches = resource_async_dao.iter_entity_batches(list(fields), batch_size=batch_size, **conditions)
+    async with aclosing(batches):
+        async for rows in batches:
+            yield encode(rows)
+
+
+def _task_graph(resource: ResourceDO, offset: int = 0) -> tuple[list[TaskDO], dict[int, list[int]]]:
+    """
+    资源类型对应的任务及其依赖
+
+    :param resource:
+    :param offset: 下标的起始值，多个资源的任务合并写入时使用
+    :return: (任务, 下游任务下标 -> 上游任务下标)
+    """
+    types = resource.type.task_types
+    tasks = [TaskDO(resource_id=resource.id, queue=resource.queue, type=t.value) for t in types]
+    upstreams = {
+        offset + types.index(t): [offset + types.index(u) for u in ups]
+        for t, ups in resource.type.task_dependencies.items()
+    }
+    return tasks, upstreams
+
+
 class ResourceService:
     @staticmethod
-    def get(id: str) -> ResourceDO:
-        resource = resource_dao.select_model_by_column("id", id)
+    async def get(id: str, fields: Sequence[str] | None = None) -> msgspec.Struct | dict[str, Any]:
+        """
+        :param id:
+        :param fields: 只返回这些字段，不含 text 时不读取 TEXT 列，且可以命中缓存；为空时返回完整资源
+        :return:
+        """
+        return _to_api(await ResourceService._select(id, fields), fields)
+
+    @staticmethod
+    async def _select(id: str, fields: Sequence[str] | None) -> ResourceModel:
+        if fields:
+            _check_fields(fields)
+        resource = await resource_async_dao.select_model_by_id(id, fields=fields or RESOURCE_FIELDS)
         if not resource:
             raise errors.NotFoundError(msg='资源不存在')
-        return ResourceDO.from_orm(resource)
+        return resource
 
     @staticmethod
-    def create(request: CreateResourceRequest) -> None:
+    async def etag(id: str, fields: Sequence[str] | None = None) -> str:
+        """
+        由 id 与 update_time 生成资源的强 ETag，只执行一次不含 text 的主键查询
+
+        :param id:
+        :param fields:
+        :return:
+        """
+        version = await resource_async_dao.select_version(id)
+        if version is None:
+            raise errors.NotFoundError(msg='资源不存在')
+        return _etag(id, version.update_time, fields)
+
+    @staticmethod
+    async def get_with_etag(
+            id: str, fields: Sequence[str] | None = None, if_none_match: str | None = None
+    ) -> tuple[msgspec.Struct | dict[str, Any] | None, str]:
+        """
+        条件读取：If-None-Match 与当前 ETag 一致时只查询 update_time，返回 (None, etag)，由调用方返回 304；
+        否则读取完整资源，ETag 按读到的 update_time 计算，与返回的内容对应
+
+        :param id:
+        :param fields:
+        :param if_none_match:
+        :return: (资源, etag)
+        """
+        etag = None
+        if if_none_match:
+            etag = await ResourceService.etag(id, fields)
+            if etag_matches(if_none_match, etag):
+                return None, etag
+        resource = await ResourceService._select(id, fields)
+        if not fields or 'update_time' in fields:
+            etag = _etag(id, resource.update_time, fields)
+        return _to_api(resource, fields), etag or await ResourceService.etag(id, fields)
+
+    @staticmethod
+    async def page(
+            params: KeysetParams, queue: str | None = None, parent_id: str | None = None
+    ) -> KeysetPage[ResourceDO]:
+        conditions: dict[str, Any] = {k: v for k, v in dict(queue=queue, parent_id=parent_id).items() if v is not None}
+        return await resource_async_dao.paginate_keyset(
+            params, transformer=ResourceDO.from_orm, fields=RESOURCE_FIELDS, **conditions
+        )
+
+    @staticmethod
+    def export(
+            format: ExportFormat,
+            queue: str | None = None,
+            parent_id: str | None = None,
+            fields: Sequence[str] | None = None,
+            gzip: bool = False,
+            batch_size: int = settings.EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """
+        按批从服务端游标读取并编码，返回的异步迭代器每次产出一批的 NDJSON / CSV（可选 gzip）；
+        调用方（StreamingResponse）发送完一块才读取下一批，客户端读得慢时游标停在服务端，内存占用与导出行数无关
+
+        :param format:
+        :param queue:
+        :param parent_id:
+        :param fields: 导出的字段，为空时导出全部字段（含 text）
+        :param gzip:
+        :param batch_size:
+        :return:
+        """
+        # 开始输出后无法再返回错误响应，参数在这里同步校验
+        if fields:
+            _check_fields(fields)
+        conditions = {k: v for k, v in dict(queue=queue, parent_id=parent_id).items() if v is not None}
+        chunks = _export_chunks(format, fields or RESOURCE_FIELDS, conditions, batch_size)
+        return gzip_stream(chunks) if gzip else chunks
+
+    @staticmethod
+    async def create(request: CreateResourceRequest) -> None:
         if request.id is None:
             request.id = uuid7_hex()
         resource = ResourceDO(**request.model_dump())
-        resource_dao.create_model(resource)
-        log.info(f'create resource {resource.name} {resource.id}')
-        for task_type in resource.type.task_types:
-            task = TaskDO(resource_id=resource.id, queue=request.queue, type=task_type.value)
-            task_dao.create_model(task)
-            log.info(f'create task {resource.name} {task_type}')
+        # 资源在退出时统一 flush；任务以一条多行 INSERT 写入、一条 SELECT 读回 id，有依赖时再写一条 task_dependency
+        async with async_unit_of_work():
+            await resource_async_dao.create_model(resource)
+            tasks, upstreams = _task_graph(resource)
+            await task_async_dao.create_graph(tasks, upstreams)
+        notify_on_commit(get_async_session().sync_session, task_notifier)
+        log.info(f'create resource {resource.name} {resource.id} tasks {[t.type for t in tasks]}')
+
+    @staticmethod
+    async def create_batch(requests: list[CreateResourceRequest]) -> list[BatchCreateResourceResult]:
+        """
+        批量创建资源及其任务：资源、任务各一条多行 INSERT（任务 id 由一条 SELECT 读回），与请求在同一个事务中；
+        id 重复或已存在的条目不写入，在结果中返回原因。查重之后其他事务写入了相同 id 时，
+        由 create_missing 逐条重试并跳过冲突的条目，不影响其他条目
+
+        :param requests:
+        :return: 与 requests 一一对应的结果
+        """
+        results = [BatchCreateResourceResult(index=i) for i in range(len(requests))]
+        existing = await resource_async_dao.list_existing_ids([r.id for r in requests if r.id])
+        seen: set[str] = set()
+        pending: list[tuple[ResourceDO, BatchCreateResourceResult]] = []
+        for request, result in zip(requests, results):
+            id = request.id or uuid7_hex()
+            if id in existing:
+                result.error = f'资源 {id} 已存在'
+                continue
+            if id in seen:
+                result.error = f'资源 {id} 在请求中重复'
+                continue
+            seen.add(id)
+            pending.append((ResourceDO(**request.model_dump(exclude={'id'}), id=id), result))
+        conflicts = await resource_async_dao.create_missing([r for r, _ in pending]) if pending else set()
+        resources: list[ResourceDO] = []
+        tasks: list[TaskDO] = []
+        upstreams: dict[int, list[int]] = {}
+        for resource, result in pending:
+            if resource.id in conflicts:
+                result.error = f'资源 {resource.id} 已存在'
+                continue
+            resources.append(resource)
+            resource_tasks, resource_upstreams = _task_graph(resource, offset=len(tasks))
+            tasks.extend(resource_tasks)
+            upstreams.update(resource_upstreams)
+            result.id = resource.id
+        if resources:
+            await task_async_dao.create_graph(tasks, upstreams)
+            notify_on_commit(get_async_session().sync_session, task_notifier)
+        log.info(f'create_batch resources {len(resources)} tasks {len(tasks)} skipped {len(requests) - len(resources)}')
+        return results
 
 
 resource_service: ResourceService = ResourceService()
@@ -0,0 +1,19 @@
+from typing import Any
+
+from app.crud.crud_task import task_async_dao
+from app.task.task_reaper import task_reaper
+from app.task.task_scheduler import task_scheduler
+
+
+class TaskService:
+    @staticmethod
+    async def metrics() -> dict[str, Any]:
+        """
+        调度指标：当前各队列、各任务类型的就绪任务数（全部实例），执行中任务数与上限、过期租约回收统计（本进程）
+
+        :return:
+        """
+        return dict(task_scheduler.metrics(await task_async_dao.count_ready()), reaper=task_reaper.stats.to_dict())
+
+
+task_service: TaskService = TaskService()
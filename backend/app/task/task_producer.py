@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import threading
+
+from app.task.task_scheduler import TaskScheduler, task_scheduler
+from app.task.task_worker import TaskWorkerPool
+from common.log import log
+from libs.conf import settings
+from libs.notifier import Notifier, task_notifier
+
+
+class TaskProducer(threading.Thread):
+    """
+    由 TaskScheduler 按队列权重与并发上限领取到期的任务，交给 TaskWorkerPool 执行
+
+    领取基于 SELECT ... FOR UPDATE SKIP LOCKED，多个实例 / 进程同时领取也不会拿到同一个任务，增加实例即可提高吞吐；
+    新任务由 notifier 唤醒，没有信号时按指数退避轮询兜底；并发已满时等待执行中的任务结束
+    """
+
+    def __init__(self, pool: TaskWorkerPool, scheduler: TaskScheduler = task_scheduler,
+                 notifier: Notifier = task_notifier):
+        super().__init__(name='task-producer', daemon=True)
+        self.pool = pool
+        self.scheduler = scheduler
+        self.notifier = notifier
+
+    def run(self):
+        min_interval = settings.POLLING_MIN_INTERVAL_MILLISECONDS / 1000
+        max_interval = settings.POLLING_INTERVAL_MILLISECONDS / 1000
+        interval = min_interval
+        while True:
+            try:
+                tasks = self.scheduler.schedule()
+            except Exception as e:
+                log.exception(f'领取任务失败: {e}')
+                tasks = []
+            for task in tasks:
+                self.pool.submit(task)
+            if tasks:
+                interval = min_interval
+                continue
+            if self.scheduler.free <= 0:
+                self.scheduler.wait_released(max_interval)
+                continue
+            if self.scheduler.backlog:
+                # 就绪任务受队列或类型的并发上限限制，等待任务结束，同时短间隔检查其它队列的新任务
+                self.scheduler.wait_released(min_interval)
+                continue
+            if self.notifier.wait(interval):
+                interval = min_interval
+            else:
+                interval = min(interval * 2, max_interval)
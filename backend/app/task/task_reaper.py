@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import dataclasses
+import threading
+import time
+
+from typing import Any
+
+from app.crud.crud_task import task_dao
+from common.log import log
+from libs.conf import settings
+
+
+@dataclasses.dataclass
+class ReaperStats:
+    """回收统计，stale_leases 为累计发现的过期租约数，last_* 为最近一轮的结果"""
+
+    runs: int = 0
+    requeued: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    last_stale_leases: int = 0
+    last_seconds: float = 0.0
+
+    @property
+    def stale_leases(self) -> int:
+        return self.requeued + self.failed
+
+    @property
+    def throughput(self) -> float:
+        """每秒回收的任务数"""
+        return self.stale_leases / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(dataclasses.asdict(self), stale_leases=self.stale_leases, throughput=self.throughput)
+
+
+class TaskReaper(threading.Thread):
+    """
+    定期回收租约过期的 RUNNING 任务，worker 崩溃后任务不会一直停留在 RUNNING；
+    多个实例同时运行时由数据库行锁保证每个任务只被回收一次
+    """
+
+    def __init__(self, interval: float = settings.TASK_REAPER_INTERVAL_SECONDS,
+                 batch: int = settings.TASK_REAPER_BATCH):
+        super().__init__(name='task-reaper', daemon=True)
+        self.interval = interval
+        self.batch = batch
+        self.stats = ReaperStats()
+
+    def run(self):
+        while True:
+            try:
+                self.reap()
+            except Exception as e:
+                log.exception(f'回收过期任务失败: {e}')
+            time.sleep(self.interval)
+
+    def reap(self) -> tuple[int, int]:
+        """
+        回收一轮，直到没有过期租约
+
+        :return: (放回队列的任务数, 置为失败的任务数)
+        """
+        start = time.perf_counter()
+        requeued = failed = 0
+        while True:
+            r, f = task_dao.reap_expired(self.batch)
+            requeued += r
+            failed += f
+            if r < self.batch and f < self.batch:
+                break
+        elapsed = time.perf_counter() - start
+        self.stats.runs += 1
+        self.stats.requeued += requeued
+        self.stats.failed += failed
+        self.stats.seconds += elapsed
+        self.stats.last_stale_leases = requeued + failed
+        self.stats.last_seconds = elapsed
+        if requeued or failed:
+            log.warning(f'回收过期租约 {requeued + failed} 个: 重新入队 {requeued}, 失败 {failed}, 耗时 {elapsed:.3f}s')
+        return requeued, failed
+
+
+task_reaper: TaskReaper = TaskReaper()
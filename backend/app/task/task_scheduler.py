@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+import socket
+import threading
+import time
+
+from collections import Counter, defaultdict
+from typing import Any, Collection
+
+from app.crud.crud_task import task_dao
+from app.do.task import TaskDO
+from core.base import RUNNERS
+from libs.conf import settings
+
+
+def worker_id() -> str:
+    """当前进程的 worker 标识，记录在任务的 lease_owner 上"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class TaskScheduler:
+    """
+    按队列加权的 deficit round robin：每一轮每个有就绪任务的队列获得 weight 个配额，按配额轮流从各队列领取任务，
+    同时受全局 concurrency、队列并发上限与任务类型并发上限约束（本进程内计数）；
+    未用完的配额最多保留一轮的 weight，队列没有就绪任务时清零，避免空闲或受限的队列积累配额后突发
+
+    types 不为空时只领取其中的任务类型，如 RUNNERS：没有 runner 的任务保持 PENDING，不被领取后置为失败，
+    也不计入 backlog；传入 RUNNERS 本身（而非拷贝），之后注册的 runner 同样生效
+
+    有 backlog 时 depth_refresh 秒内沿用上一次的就绪任务数，其它队列的新任务最多延迟 depth_refresh 秒被领取
+    """
+
+    def __init__(
+            self,
+            concurrency: int = settings.TASK_CONCURRENCY,
+            weights: dict[str, int] | None = None,
+            queue_limits: dict[str, int] | None = None,
+            type_limits: dict[str, int] | None = None,
+            types: Collection[str] | None = None,
+            depth_refresh: float = settings.TASK_DEPTH_REFRESH_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.types = types
+        self.depth_refresh = depth_refresh
+        self.weights = settings.TASK_QUEUE_WEIGHTS if weights is None else weights
+        self.queue_limits = settings.TASK_QUEUE_CONCURRENCY if queue_limits is None else queue_limits
+        self.type_limits = settings.TASK_TYPE_CONCURRENCY if type_limits is None else type_limits
+        # 是否还有就绪任务因并发上限未领取
+        self.backlog = False
+        self._lock = threading.Lock()
+        self._released = threading.Event()
+        self._deficits: dict[str, float] = defaultdict(float)
+        self._type_cursors: Counter[str] = Counter()
+        self._depths: dict[tuple[str, str], int] = {}
+        self._depths_time = float('-inf')
+        self._claimed: Counter[str] = Counter()
+        self._running_queues: Counter[str] = Counter()
+        self._running_types: Counter[str] = Counter()
+        self._running = 0
+        self._cursor = 0
+
+    @property
+    def free(self) -> int:
+        return self.concurrency - self._running
+
+    def schedule(self) -> list[TaskDO]:
+        """
+        按配额领取任务，领取到的任务计入并发，执行结束后需调用 release
+
+        :return:
+        """
+        if self.free <= 0:
+            return []
+        now = time.monotonic()
+        if self.backlog and now - self._depths_time < self.depth_refresh:
+            # 受并发上限限制时 producer 每个短间隔调用一次，沿用上一次统计（已扣除本进程领取的任务），不每次 GROUP BY
+            depths = self._depths
+        else:
+            depths = task_dao.count_ready()
+            if self.types is not None:
+                depths = {(queue, type): n for (queue, type), n in depths.items() if type in self.types}
+            self._depths_time = now
+        queues = sorted({queue for queue, _ in depths})
+        if queues:
+            # 每次从不同的队列开始，排在前面的队列不会一直占先
+            self._cursor %= len(queues)
+            queues = queues[self._cursor:] + queues[:self._cursor]
+            self._cursor += 1
+        claimed: list[TaskDO] = []
+        progressed = True
+        while progressed and self.free > 0:
+            progressed = False
+            for queue in queues:
+                tasks = self._visit(queue, depths)
+                claimed.extend(tasks)
+                progressed = progressed or bool(tasks)
+        # 扣除本次领取后剩余的就绪任务数
+        self._depths = depths
+        self.backlog = any(depths.values())
+        return claimed
+
+    def release(self, task: TaskDO) -> None:
+        with self._lock:
+            self._running -= 1
+            self._running_queues[task.queue] -= 1
+            self._running_types[task.type] -= 1
+        self._released.set()
+
+    def wait_released(self, timeout: float) -> bool:
+        """等待有任务执行结束"""
+        released = self._released.wait(timeout)
+        self._released.clear()
+        return released
+
+    def metrics(self, depths: dict[tuple[str, str], int] | None = None) -> dict[str, Any]:
+        """
+        :param depths: 各 (queue, type) 的就绪任务数，为空时使用最近一次 schedule 的统计
+        :return: 全局、各队列、各任务类型的就绪任务数与本进程内的并发
+        """
+        with self._lock:
+            queues = {q: self._queue_stats(q)
+                      for q in set(self._running_queues) | set(self.weights) | set(self.queue_limits)}
+            types = {t: self._type_stats(t) for t in set(self._running_types) | set(self.type_limits)}
+            running = self._running
+            for (queue, type), depth in (self._depths if depths is None else depths).items():
+                queues.setdefault(queue, self._queue_stats(queue))['depth'] += depth
+                types.setdefault(type, self._type_stats(type))['depth'] += depth
+        return dict(running=running, concurrency=self.concurrency, queues=queues, types=types)
+
+    def _queue_stats(self, queue: str) -> dict[str, Any]:
+        return dict(depth=0, running=self._running_queues[queue], claimed=self._claimed[queue],
+                    weight=self.weights.get(queue, 1), limit=self.queue_limits.get(queue))
+
+    def _type_stats(self, type: str) -> dict[str, Any]:
+        return dict(depth=0, running=self._running_types[type], limit=self.type_limits.get(type))
+
+    def _visit(self, queue: str, depths: dict[tuple[str, str], int]) -> list[TaskDO]:
+        ready = sorted((t, n) for (q, t), n in depths.items() if q == queue and n > 0)
+        if not ready:
+            self._deficits[queue] = 0
+            return []
+        weight = self.weights.get(queue, 1)
+        self._deficits[queue] = min(self._deficits[queue] + weight, 2 * weight)
+        # 队列内各任务类型轮流优先
+        cursor = self._type_cursors[queue] % len(ready)
+        self._type_cursors[queue] += 1
+        claimed: list[TaskDO] = []
+        for type, depth in ready[cursor:] + ready[:cursor]:
+            limit = min(int(self._deficits[queue]), self.free, depth,
+                        self._remaining(self.queue_limits, self._running_queues, queue),
+                        self._remaining(self.type_limits, self._running_types, type))
+            if limit <= 0:
+                continue
+            tasks = task_dao.claim(worker_id(), limit=limit, queues=[queue], types=[type])
+            # 领取不足说明其余任务已被其它 worker 领取
+            depths[(queue, type)] = depth - len(tasks) if len(tasks) == limit else 0
+            self._deficits[queue] -= len(tasks)
+            self._acquire(tasks)
+            claimed.extend(tasks)
+        return claimed
+
+    def _acquire(self, tasks: list[TaskDO]) -> None:
+        with self._lock:
+            for task in tasks:
+                self._running += 1
+                self._running_queues[task.queue] += 1
+                self._running_types[task.type] += 1
+                self._claimed[task.queue] += 1
+
+    def _remaining(self, limits: dict[str, int], running: Counter[str], key: str) -> int:
+        limit = limits.get(key)
+        # 未配置上限时只受全局 concurrency 限制
+        return self.concurrency if limit is None else limit - running[key]
+
+
+task_scheduler: TaskScheduler = TaskScheduler(types=RUNNERS)
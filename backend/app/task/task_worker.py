@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import multiprocessing
+import threading
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Callable, Literal, NamedTuple
+
+from app.crud.crud_resource import resource_dao
+from app.crud.crud_task import task_dao
+from app.do.resource import RESOURCE_META_FIELDS, ResourceDO
+from app.do.task import TaskDO
+from common.enum.task import TaskStatus
+from common.log import log
+from core.base import RUNNERS, BaseRunner, get_runner
+from core.storage import output_storage
+from libs.conf import settings
+
+
+ExecutorMode = Literal['thread', 'process']
+
+
+def _lease_owner(task: TaskDO) -> str:
+    # 只执行 claim 领取的任务，lease_owner 总是有值
+    if task.lease_owner is None:
+        raise ValueError(f'任务 {task.id} 未被领取')
+    return task.lease_owner
+
+
+class TaskOutcome(NamedTuple):
+    status: int
+    error_msg: str | None = None
+    # runner 有文本输出时，输出所在的地址
+    output_url: str | None = None
+
+
+def run_task(runner_class: type[BaseRunner], resource: ResourceDO) -> TaskOutcome:
+    """
+    在线程池或子进程中执行 runner，输出逐段写入 output_storage；
+    只返回结果，不访问数据库和共享状态，由 TaskWorkerPool 统一上报
+
+    :param runner_class:
+    :param resource:
+    :return:
+    """
+    try:
+        runner = get_runner(runner_class)
+        chunks = runner.run(resource)
+        if chunks is None:
+            return TaskOutcome(TaskStatus.SUCCESS.value)
+        output_url = output_storage.url_for(resource.id, runner_class.task_type.value)
+        output_storage.write_chunks(output_url, chunks)
+        return TaskOutcome(TaskStatus.SUCCESS.value, output_url=output_url)
+    except Exception as e:
+        log.exception(f'资源 {resource.id} 执行 {runner_class.__name__} 失败: {e}')
+        return TaskOutcome(TaskStatus.FAILED.value, str(e)[:255])
+
+
+class TaskWorkerPool(threading.Thread):
+    """
+    进程内的任务执行池：TaskProducer 领取的任务放入 asyncio.Queue，concurrency 个协程取出后按任务类型
+    交给线程池（io 密集）或进程池（cpu 密集，如 VFE、OCR）执行，执行期间续约，结束后上报结果
+
+    on_done 在任务结束（无论成败）后调用，如 TaskScheduler.release；
+    事件循环运行在独立的线程中，不占用 api 的事件循环；进程池默认以 spawn 启动，子进程不继承父进程的线程与连接
+    """
+
+    def __init__(
+            self,
+            concurrency: int = settings.TASK_CONCURRENCY,
+            modes: dict[str, ExecutorMode] | None = None,
+            process_pool_size: int = settings.TASK_PROCESS_POOL_SIZE,
+            mp_context: BaseContext | None = None,
+            on_done: Callable[[TaskDO], None] | None = None,
+    ):
+        super().__init__(name='task-worker-pool', daemon=True)
+        self.concurrency = concurrency
+        self.on_done = on_done
+        self.modes = settings.TASK_EXECUTOR_MODES if modes is None else modes
+        self._threads = ThreadPoolExecutor(concurrency, thread_name_prefix='task-runner')
+        self._processes = ProcessPoolExecutor(
+            process_pool_size, mp_context=mp_context or multiprocessing.get_context('spawn')
+        )
+        self._loop = asyncio.new_event_loop()
+        # 3.10 起 asyncio.Queue 在首次使用时才绑定事件循环，可以在其它线程中创建
+        self._queue: asyncio.Queue[TaskDO] = asyncio.Queue()
+        # 排队与执行中的任务数上限，submit 在没有空位时阻塞
+        self._slots = threading.BoundedSemaphore(concurrency * 2)
+
+    def run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._main())
+
+    def submit(self, task: TaskDO) -> None:
+        """
+        由其它线程（TaskProducer）调用，队列已满时阻塞
+
+        :param task:
+        :return:
+        """
+        self._slots.acquire()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, task)
+
+    def load_resource(self, task: TaskDO) -> ResourceDO | None:
+        # 不读取 text，命中 EntityCache；runner 的输入是 storage_url，不需要上一次的转换结果
+        resource = resource_dao.select_model_by_id(task.resource_id, fields=RESOURCE_META_FIELDS)
+        if resource is None:
+            return None
+        return ResourceDO.model_validate(ResourceDO.from_orm_fields(resource, RESOURCE_META_FIELDS))
+
+    def report(self, task: TaskDO, outcome: TaskOutcome) -> None:
+        # 先记录输出地址，下游任务就绪时即可读取；按任务类型分别记录，不覆盖其它任务的输出
+        if outcome.output_url is not None:
+            resource_dao.set_output_url(task.resource_id, task.type, outcome.output_url)
+        task_dao.complete(task.id, _lease_owner(task), TaskStatus(outcome.status), error_msg=outcome.error_msg)
+
+    async def _main(self):
+        await asyncio.gather(*(self._work() for _ in range(self.concurrency)))
+
+    async def _work(self):
+        while True:
+            task = await self._queue.get()
+            try:
+                await self._dispatch(task)
+            except Exception as e:
+                # 读取资源或上报失败，任务保持 RUNNING，租约过期后由 reaper 重新入队
+                log.exception(f'任务 {task.id} 调度失败: {e}')
+            finally:
+                self._slots.release()
+                if self.on_done is not None:
+                    self.on_done(task)
+
+    async def _dispatch(self, task: TaskDO) -> None:
+        loop = asyncio.get_running_loop()
+        keeper = asyncio.create_task(self._keep_lease(task))
+        try:
+            if self.modes.get(task.type) == 'process':
+                outcome = await loop.run_in_executor(self._threads, self._load, task)
+                if isinstance(outcome, ResourceDO):
+                    try:
+                        outcome = await loop.run_in_executor(self._processes, run_task, RUNNERS[task.type], outcome)
+                    except Exception as e:
+                        # 子进程异常退出等，runner 自身的异常由 run_task 处理
+                        log.exception(f'任务 {task.id} 执行失败: {e}')
+                        outcome = TaskOutcome(TaskStatus.FAILED.value, str(e)[:255])
+                await loop.run_in_executor(self._threads, self.report, task, outcome)
+            else:
+                # 读取资源、执行与上报在同一个线程内完成，每个任务只切换一次线程
+                await loop.run_in_executor(self._threads, self._execute, task)
+        finally:
+            keeper.cancel()
+
+    def _load(self, task: TaskDO) -> ResourceDO | TaskOutcome:
+        """
+        :param task:
+        :return: 资源，无法执行时返回失败的结果
+        """
+        if task.type not in RUNNERS:
+            # 本进程没有该类型的 runner（TaskScheduler 只领取已注册的类型，通常不会发生），放回队列，
+            # 由注册了该类型的 worker 执行，而不是置为失败
+            log.warning(f'任务 {task.id} 的类型 {task.type} 未注册 runner，放回队列')
+            return TaskOutcome(TaskStatus.PENDING.value, f'未注册 runner: {task.type}')
+        resource = self.load_resource(task)
+        if resource is None:
+            return TaskOutcome(TaskStatus.FAILED.value, f'资源不存在: {task.resource_id}')
+        return resource
+
+    def _execute(self, task: TaskDO) -> None:
+        outcome = self._load(task)
+        if isinstance(outcome, ResourceDO):
+            outcome = run_task(RUNNERS[task.type], outcome)
+        self.report(task, outcome)
+
+    @staticmethod
+    async def _keep_lease(task: TaskDO) -> None:
+        """执行期间每 1/3 个租约时长续约一次，续约失败说明任务已被 reaper 回收"""
+        loop = asyncio.get_running_loop()
+        heartbeat = functools.partial(task_dao.heartbeat, [task.id], _lease_owner(task))
+        while True:
+            await asyncio.sleep(settings.TASK_LEASE_SECONDS / 3)
+            try:
+                if not await loop.run_in_executor(None, heartbeat):
+                    log.warning(f'任务 {task.id} 的租约已失效')
+                    return
+            except Exception as e:
+                log.exception(f'任务 {task.id} 续约失败: {e}')
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List
+from typing import Dict, List
 
 from common.enum.task import TaskType
 
@@ -14,10 +14,31 @@ class ResourceType(str, Enum):
     @property
     def task_types(self) -> List[TaskType]:
         if self == ResourceType.VIDEO:
-            return [TaskType.V2A, TaskType.VFE]
+            return [TaskType.V2A, TaskType.VFE, TaskType.STT]
         elif self == ResourceType.AUDIO:
             return [TaskType.STT]
         elif self == ResourceType.PICTURE:
             return [TaskType.OCR]
         else:
             raise ValueError(f"Invalid resource type: {self}")
+
+    @property
+    def task_dependencies(self) -> Dict[TaskType, List[TaskType]]:
+        """任务类型 -> 上游任务类型，上游成功后才执行"""
+        if self == ResourceType.VIDEO:
+            # 转写 V2A 抽取的音频
+            return {TaskType.STT: [TaskType.V2A]}
+        return {}
+
+
+class ExportFormat(str, Enum):
+    """资源导出格式"""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @property
+    def media_type(self) -> str:
+        if self == ExportFormat.NDJSON:
+            return 'application/x-ndjson'
+        return 'text/csv; charset=utf-8'
@@ -1,9 +1,98 @@
+import threading
+
+from multiprocessing import util
+
+from typing import Callable, ClassVar, Iterable, TypeVar
+
 from app.do.resource import ResourceDO
+from common.enum.task import TaskType
+from common.log import log
 
 
 class BaseRunner:
-    def __init__(self, resource: ResourceDO):
-        self.resource = resource
+    """
+    执行一种类型的任务，通过 register_runner 注册到 RUNNERS
+
+    每个 worker（线程池中的线程、进程池中的进程）为每个 runner 类创建一个实例并在多个任务间复用：
+    首次使用时调用 setup 加载模型等可复用的资源，每个任务调用一次 run，进程退出时调用 teardown
+    """
 
-    def run(self):
+    task_type: ClassVar[TaskType]
+
+    def setup(self) -> None:
         pass
+
+    def run(self, resource: ResourceDO) -> Iterable[str] | None:
+        """
+        执行一个任务，可以逐段 yield 输出（如转写文本），由调用方边生成边写入输出存储，
+        地址记录在 resource.output_urls，不在内存中拼接
+
+        :param resource:
+        :return: 输出片段，没有文本输出时返回 None
+        """
+        return None
+
+    def teardown(self) -> None:
+        pass
+
+
+_Runner = TypeVar('_Runner', bound=type[BaseRunner])
+
+# 任务类型 -> 执行该类型任务的 runner
+RUNNERS: dict[str, type[BaseRunner]] = {}
+
+_local = threading.local()
+_instances: list[BaseRunner] = []
+_instances_lock = threading.Lock()
+
+
+def register_runner(task_type: TaskType) -> Callable[[_Runner], _Runner]:
+    """
+    类装饰器，注册 task_type 对应的 runner
+
+    :param task_type:
+    :return:
+    """
+
+    def decorator(cls: _Runner) -> _Runner:
+        if task_type.value in RUNNERS and RUNNERS[task_type.value] is not cls:
+            raise ValueError(f'Runner for {task_type.value} already registered: {RUNNERS[task_type.value].__name__}')
+        cls.task_type = task_type
+        RUNNERS[task_type.value] = cls
+        return cls
+
+    return decorator
+
+
+def get_runner(cls: type[BaseRunner]) -> BaseRunner:
+    """
+    当前线程的 runner 实例，首次获取时调用 setup；setup 失败时不缓存，下一个任务重试
+
+    :param cls:
+    :return:
+    """
+    runners: dict[type[BaseRunner], BaseRunner] = getattr(_local, 'runners', None) or {}
+    _local.runners = runners
+    runner = runners.get(cls)
+    if runner is None:
+        runner = cls()
+        runner.setup()
+        runners[cls] = runner
+        with _instances_lock:
+            _instances.append(runner)
+    return runner
+
+
+def _teardown_runners() -> None:
+    with _instances_lock:
+        instances = list(_instances)
+        _instances.clear()
+    for runner in instances:
+        try:
+            runner.teardown()
+        except Exception as e:
+            log.exception(f'{type(runner).__name__} teardown 失败: {e}')
+
+
+# 进程池的子进程以 os._exit 退出，不执行 atexit，multiprocessing 的 finalizer 在主进程与子进程退出时都会执行
+util.Finalize(None, _teardown_runners, exitpriority=10)
@@ -0,0 +1,72 @@
+import contextlib
+import os
+
+from abc import ABC, abstractmethod
+from typing import ContextManager, Iterable, Iterator, Protocol
+from urllib.parse import urlparse
+
+from libs.conf import settings
+
+
+class OutputWriter(Protocol):
+    def write(self, chunk: str) -> object:
+        ...
+
+
+class OutputStorage(ABC):
+    """
+    runner 输出（如转写全文）的存储，按片段写入，不需要在内存中拼出完整内容
+    """
+
+    @abstractmethod
+    def url_for(self, resource_id: str, task_type: str) -> str:
+        ...
+
+    @abstractmethod
+    def open_writer(self, url: str) -> ContextManager[OutputWriter]:
+        """
+        正常退出时内容才对读取方可见，异常退出时丢弃已写入的片段
+
+        :param url:
+        :return:
+        """
+        ...
+
+    def write_chunks(self, url: str, chunks: Iterable[str]) -> int:
+        """
+        :param url:
+        :param chunks:
+        :return: 写入的字符数
+        """
+        size = 0
+        with self.open_writer(url) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+                size += len(chunk)
+        return size
+
+
+class LocalOutputStorage(OutputStorage):
+    """本地（或挂载的共享）目录，url 形如 file:///<root>/<resource_id>/<task_type>.txt"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def url_for(self, resource_id: str, task_type: str) -> str:
+        return f'file://{os.path.join(os.path.abspath(self.root), resource_id, f"{task_type}.txt")}'
+
+    @contextlib.contextmanager
+    def open_writer(self, url: str) -> Iterator[OutputWriter]:
+        path = urlparse(url).path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part = f'{path}.part'
+        try:
+            with open(part, 'w', encoding='utf-8') as f:
+                yield f
+            os.replace(part, path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(part)
+
+
+output_storage: OutputStorage = LocalOutputStorage(settings.OUTPUT_STORAGE_DIR)
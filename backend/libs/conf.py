@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import os
+
 from functools import lru_cache
 from typing import Literal
 
@@ -24,6 +26,22 @@ class Settings(BaseSettings):
     DB_DATABASE: str = "test"
     DB_ECHO: bool = True
     DB_CHARSET: str = "utf8mb4"
+    # 每个进程一个同步连接池、一个 asyncio 连接池，总连接数约为 workers * (size + overflow) * 2
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 20
+    DB_POOL_RECYCLE: int = 3600
+    DB_ASYNC_POOL_SIZE: int = 10
+    DB_ASYNC_MAX_OVERFLOW: int = 20
+    # 关闭 pre ping 时，连接空闲超过该秒数才在检出时 ping
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_LIVENESS_INTERVAL: int = 30
+    # 断连时幂等读的重试次数与首次退避秒数（指数退避）
+    DB_READ_RETRY_COUNT: int = 3
+    DB_READ_RETRY_BACKOFF: float = 0.1
+    # 从库列表，每项为 host 或 host:port，为空时读写都走主库；从库不可用时摘除的秒数
+    DB_REPLICA_HOSTS: list[str] = []
+    DB_REPLICA_EJECT_SECONDS: int = 30
 
     # Log
     LOG_ROOT_LEVEL: str = 'NOTSET'
@@ -36,9 +54,47 @@ class Settings(BaseSettings):
     LOG_CID_DEFAULT_VALUE: str = '-'
     LOG_CID_UUID_LENGTH: int = 32  # must <= 32
 
+    # CRUDPlus.select_model_by_id 的进程内缓存：最大行数、ttl 与负缓存（记录不存在）的 ttl，单位秒
+    ENTITY_CACHE_SIZE: int = 10000
+    ENTITY_CACHE_TTL: int = 60
+    ENTITY_CACHE_NEGATIVE_TTL: int = 5
+
+    # 资源导出每批从服务端游标读取的行数，含 text 列时单行可能较大
+    EXPORT_BATCH_SIZE: int = 200
+
+    # 响应压缩：小于 COMPRESS_MINIMUM_SIZE 字节的响应不压缩；brotli 为可选依赖，未安装时只使用 gzip
+    COMPRESS_MINIMUM_SIZE: int = 1024
+    COMPRESS_GZIP_LEVEL: int = 6
+    COMPRESS_BROTLI_QUALITY: int = 4
+
+    # 新任务通过 notifier 唤醒 producer，轮询只是兜底（如重试任务的 run_time 到期）：
+    # 未领取到任务时间隔从 MIN 开始翻倍，最长 POLLING_INTERVAL_MILLISECONDS
+    POLLING_MIN_INTERVAL_MILLISECONDS: int = 500
     POLLING_INTERVAL_MILLISECONDS: int = 10 * 1000
+    # local 只唤醒本进程；socket 通过 unix socket 唤醒本机所有 worker；redis 通过 pub/sub 唤醒所有实例
+    TASK_NOTIFIER: Literal['local', 'socket', 'redis'] = 'local'
+    NOTIFY_SOCKET_DIR: str = '/tmp/merlin-notify'
+    NOTIFY_REDIS_URL: str = 'redis://localhost:6379/0'
     TASK_RETRY_COUNT: int = 3
     TASK_CONCURRENCY: int = 5
+    # 任务类型 -> 执行方式，thread 为进程内线程池（io 密集），process 为进程池（cpu 密集），未配置的类型使用 thread
+    TASK_EXECUTOR_MODES: dict[str, Literal['thread', 'process']] = {'ocr': 'process', 'vfe': 'process'}
+    TASK_PROCESS_POOL_SIZE: int = 2
+    # runner 输出（转写 / OCR 全文）的存储目录，地址按任务类型写入 resource.output_urls
+    OUTPUT_STORAGE_DIR: str = '/tmp/merlin-output'
+    # 调度：各队列的权重（未配置为 1）与并发上限、各任务类型的并发上限，未配置时只受 TASK_CONCURRENCY 限制
+    TASK_QUEUE_WEIGHTS: dict[str, int] = {}
+    TASK_QUEUE_CONCURRENCY: dict[str, int] = {}
+    TASK_TYPE_CONCURRENCY: dict[str, int] = {'vfe': os.cpu_count() or 1}
+    # 就绪任务受并发上限限制时，统计就绪任务数（按 queue、type GROUP BY）的最小间隔，期间沿用上一次的统计
+    TASK_DEPTH_REFRESH_SECONDS: float = 5
+    # worker 领取任务后的租约时长，单位秒
+    TASK_LEASE_SECONDS: int = 10 * 60
+    # 回收过期租约的间隔与每条 UPDATE 处理的最大行数；重新入队的任务按 base * 2^retry_count 推迟，不超过 max，单位秒
+    TASK_REAPER_INTERVAL_SECONDS: int = 30
+    TASK_REAPER_BATCH: int = 500
+    TASK_RETRY_BACKOFF_SECONDS: int = 30
+    TASK_RETRY_BACKOFF_MAX_SECONDS: int = 60 * 60
 
 
 @lru_cache
@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import copy
+import functools
+import itertools
 import sys
+import threading
 import time
-from functools import wraps
-from typing import Any, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, ClassVar, Iterator, Mapping
 from urllib.parse import quote_plus
 
 from pymysql.connections import CLIENT
-from sqlalchemy import URL, Engine, create_engine, exc, orm as sa_orm
+from sqlalchemy import URL, Engine, create_engine, event, exc, orm as sa_orm
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from common.log import log
 from libs.conf import settings
@@ -16,135 +22,301 @@ from libs.conf import settings
 
 engine_args: Mapping[str, Any] = dict(
     future=True,
-    pool_size=50,
-    pool_recycle=3600,
-    pool_pre_ping=True,  # 是否在使用连接前先进行ping, https://docs.sqlalchemy.org/en/14/core/pooling.html#pool-disconnects
-    max_overflow=100,
-    pool_timeout=20,
+    pool_size=settings.DB_POOL_SIZE,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    # 是否在每次检出连接前先进行ping, https://docs.sqlalchemy.org/en/14/core/pooling.html#pool-disconnects
+    # 关闭时改用 _on_checkout 中基于空闲时间的存活检查
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
 )
 
 
-def ensure_connection(func):
-    """装饰器：确保执行数据库操作前连接是健康的"""
+# MySQL 客户端/服务端断连错误码，补充 dialect 自带的 is_disconnect 判断
+# 1927: 连接被 KILL, 2006: MySQL server has gone away, 2013: Lost connection, 2055: Lost connection(系统错误),
+# 4031: 客户端空闲超时被服务端断开
+MYSQL_DISCONNECT_CODES = frozenset({1927, 2006, 2013, 2055, 4031})
 
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        try:
-            return func(self, *args, **kwargs)
-        except exc.OperationalError as e:
-            if "Lost connection" in str(e):
-                log.warning(f"Lost connection during {func.__name__}, attempting to reconnect...")
-                self.ensure_healthy_connection()
-                # 重试操作
-                return func(self, *args, **kwargs)
-            raise
 
-    return wrapper
+def _handle_error(context: ExceptionContext) -> None:
+    """
+    handle_error 钩子：识别断连并只作废出错的那一个连接，连接池中的其他连接不受影响
+    """
+    # 两个属性都是 handle_error 中允许修改的（见 sqlalchemy 文档 Supporting new database error codes
+    # for disconnect scenarios）；ExceptionContext 接口类声明了空的 __slots__，mypy 据此报错
+    args = getattr(context.original_exception, 'args', ())
+    if not context.is_disconnect and args and args[0] in MYSQL_DISCONNECT_CODES:
+        context.is_disconnect = True  # type: ignore[misc]
+    if context.is_disconnect:
+        context.invalidate_pool_on_disconnect = False  # type: ignore[misc]
+
+
+def _on_checkin(dbapi_connection, connection_record) -> None:
+    connection_record.info['last_used'] = time.monotonic()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    """
+    基于时间的存活检查：连接空闲超过 DB_POOL_LIVENESS_INTERVAL 秒才 ping（COM_PING，不走 SQL 解析），
+    失败时抛出 DisconnectionError，连接池会丢弃该连接并重新建立
+    """
+    last_used = connection_record.info.get('last_used')
+    if last_used is None or time.monotonic() - last_used < settings.DB_POOL_LIVENESS_INTERVAL:
+        return
+    try:
+        dbapi_connection.ping(False)
+    except Exception as e:
+        log.warning(f'Stale connection detected on checkout: {e}')
+        raise exc.DisconnectionError() from e
+
+
+def install_disconnect_handling(engine: Engine) -> None:
+    event.listen(engine, 'handle_error', _handle_error)
+    if not settings.DB_POOL_PRE_PING:
+        event.listen(engine.pool, 'checkin', _on_checkin)
+        event.listen(engine.pool, 'checkout', _on_checkout)
+
+
+def read_retry_delay(attempt: int) -> float:
+    """第 attempt 次（从 1 开始）重试前的退避时长，单位秒"""
+    return settings.DB_READ_RETRY_BACKOFF * 2 ** (attempt - 1)
 
 
 class HealthySession(sa_orm.Session):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.ping_query = "SELECT 1"  # 用于健康检查的简单查询
-        self._last_check_time: int = 0
-        self.check_interval = 60  # 连接检查间隔（秒）
-        self.max_retries = 3  # 最大重试次数
-
-    def should_check_connection(self):
-        """判断是否需要检查连接（基于时间间隔）"""
-        current_time = int(time.time())
-        if current_time - self._last_check_time > self.check_interval:
-            self._last_check_time = current_time
-            return True
-        return False
+    """
+    断连时对幂等读做有限次数的退避重试；连接的作废与重建由 handle_error / 连接池负责
+    """
 
-    def is_connection_valid(self):
-        """检查数据库连接是否有效"""
-        try:
-            # 执行一个简单的查询来测试连接
-            self.execute(self.ping_query)
-            return True
-        except exc.OperationalError as e:
-            log.warning(f"Database connection check failed: {str(e)}")
-            return False
-        except Exception as e:
-            log.error(f"Unexpected error during connection check: {str(e)}")
+    # 为 False 时不在本层重试：AsyncSession 内部的同步 session 运行在 greenlet 中，time.sleep 会阻塞事件循环，
+    # 由 HealthyAsyncSession 在 asyncio 层重试
+    retry_reads: ClassVar[bool] = True
+
+    def read_retryable(self, statement) -> bool:
+        """
+        断连后回滚重试是否安全：读语句，且本次调用开启了事务（事务里没有其他语句）；
+        或 session 绑定自动提交连接（worker_session_auto 等），每条语句各自提交，
+        autobegin 的 SessionTransaction 不对应数据库事务，只要没有会被回滚丢弃的待写入对象即可重试
+
+        :param statement:
+        :return:
+        """
+        if not getattr(statement, 'is_select', False):
             return False
+        if not self.in_transaction():
+            return True
+        autocommit = self.bind is not None and \
+            self.bind.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+        return autocommit and not (self.new or self.dirty or self.deleted)
 
-    def ensure_healthy_connection(self):
-        """确保连接健康，如果不健康则重新连接"""
-        if not self.is_connection_valid():
-            log.info("Detected invalid connection, disposing engine...")
-            if not self.bind:
-                raise exc.UnboundExecutionError(
-                    "Cannot dispose connection - no valid engine found"
-                )
-            # 释放所有连接
-            self.bind.dispose()  # type: ignore
-            # 执行一个查询来触发新连接的建立
-            self.execute(self.ping_query)
-            log.info("New connection established")
-
-    @ensure_connection
-    def execute(self, *args, **kwargs):
-        return super().execute(*args, **kwargs)
-
-    @ensure_connection
-    def commit(self):
-        try:
-            super().commit()
-        except exc.OperationalError as e:
-            log.error(f"Error during commit: {str(e)}")
-            raise
-        except Exception as e:
-            log.error(f"Unexpected error during commit: {str(e)}")
-            raise
+    def execute(self, statement, *args, **kwargs):
+        retryable = self.retry_reads and self.read_retryable(statement)
+        attempt = 0
+        while True:
+            try:
+                return super().execute(statement, *args, **kwargs)
+            except exc.DBAPIError as e:
+                if not (retryable and e.connection_invalidated) or attempt >= settings.DB_READ_RETRY_COUNT:
+                    raise
+                attempt += 1
+                log.warning(f'Lost connection during read, retry {attempt}/{settings.DB_READ_RETRY_COUNT}: {e.orig}')
+                self.rollback()
+                time.sleep(read_retry_delay(attempt))
+
+
+class EngineRegistry:
+    """
+    进程内的 Engine 注册表，同一个 url 只创建一个 Engine（即一个连接池），
+    请求内的 session、worker_session、worker_session_auto 都从这里取 Engine，
+    自动提交通过 execution_options(isolation_level='AUTOCOMMIT') 按连接设置，不再单独建池
+    """
+
+    def __init__(self):
+        self._engines: dict[str, Engine] = {}
+        self._async_engines: dict[str, AsyncEngine] = {}
+        self._lock = threading.Lock()
 
-    @ensure_connection
-    def rollback(self):
+    def get(self, url: str | URL, **kwargs) -> Engine:
+        """
+        获取 url 对应的 Engine，不存在时按 engine_args 创建
+
+        :param url:
+        :param kwargs: 覆盖 engine_args，仅在首次创建时生效
+        :return:
+        """
+        return self._get(self._engines, create_engine, url, **kwargs)
+
+    def get_async(self, url: str | URL, **kwargs) -> AsyncEngine:
+        """
+        获取 url 对应的 AsyncEngine，不存在时按 engine_args 创建
+
+        :param url:
+        :param kwargs: 覆盖 engine_args，仅在首次创建时生效
+        :return:
+        """
+        return self._get(self._async_engines, create_async_engine, url, **kwargs)
+
+    def _get(self, engines: dict, factory: Callable, url: str | URL, **kwargs):
+        key = str(url)
+        engine = engines.get(key)
+        if engine is not None:
+            return engine
+        with self._lock:
+            if key not in engines:
+                engines[key] = self._create(factory, url, **kwargs)
+            return engines[key]
+
+    @staticmethod
+    def _create(factory: Callable, url: str | URL, **kwargs):
         try:
-            super().rollback()
-        except exc.OperationalError as e:
-            log.error(f"Error during rollback: {str(e)}")
-            raise
+            args = {**copy.deepcopy(engine_args), **kwargs}
+            # 数据库引擎
+            engine = factory(
+                url,
+                echo=settings.DB_ECHO,
+                **args,
+                connect_args={
+                    "client_flag": CLIENT.MULTI_STATEMENTS,
+                },
+            )
+            install_disconnect_handling(getattr(engine, 'sync_engine', engine))
+            return engine
         except Exception as e:
-            log.error(f"Unexpected error during rollback: {str(e)}")
-            raise
+            log.error('❌ 数据库链接失败 {}', e)
+            sys.exit()
+
+
+engine_registry: EngineRegistry = EngineRegistry()
+
+
+# 连接不上从库时的错误码，2003: Can't connect, 2005: Unknown host
+MYSQL_CONNECT_ERROR_CODES = frozenset({2003, 2005})
+
+
+class ReplicaPool:
+    """
+    从库 Engine 集合，轮询选择；断连或连接失败的从库被摘除 DB_REPLICA_EJECT_SECONDS 秒，
+    全部不可用时返回 None，由调用方回落到主库
+    """
+
+    def __init__(self, engines: list[Engine]):
+        self._engines = engines
+        self._autocommit_engines: list[Engine] = [e.execution_options(isolation_level='AUTOCOMMIT') for e in engines]
+        self._ejected_until: dict[Engine, float] = {}
+        self._counter = itertools.count()
+        for e in engines:
+            event.listen(e, 'handle_error', functools.partial(self._on_error, e))
+
+    def __bool__(self) -> bool:
+        return bool(self._engines)
+
+    def choose(self, autocommit: bool = False) -> Engine | None:
+        """
+        :param autocommit: 与主库 bind 的隔离级别保持一致，避免从库连接上长期持有读快照
+        :return:
+        """
+        engines = self._autocommit_engines if autocommit else self._engines
+        now = time.monotonic()
+        for _ in range(len(engines)):
+            i = next(self._counter) % len(engines)
+            if self._ejected_until.get(self._engines[i], 0) <= now:
+                return engines[i]
+        return None
+
+    def eject(self, engine: Engine) -> None:
+        log.warning(f'Replica {engine.url.host} ejected for {settings.DB_REPLICA_EJECT_SECONDS}s')
+        self._ejected_until[engine] = time.monotonic() + settings.DB_REPLICA_EJECT_SECONDS
+
+    def _on_error(self, engine: Engine, context: ExceptionContext) -> None:
+        args = getattr(context.original_exception, 'args', ())
+        if context.is_disconnect or (args and args[0] in MYSQL_CONNECT_ERROR_CODES):
+            self.eject(engine)
+
+
+# 为 True 时当前上下文内的读也走主库，见 use_primary
+_use_primary: ContextVar[bool] = ContextVar('_use_primary', default=False)
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """
+    read-your-writes：块内的读全部走主库，用于刚写入就要读到的场景
+
+        with use_primary():
+            resource_dao.select_model_by_id(pk)
+    """
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class RoutingSession(HealthySession):
+    """
+    读写分离：SELECT 走从库，写语句、flush 以及写事务中的后续读走主库；
+    未配置从库时与 HealthySession 行为一致
+    """
+
+    replicas: ReplicaPool = ReplicaPool([])
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        autocommit = primary.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+        # SELECT ... FOR UPDATE 要加锁，与写入一样走主库
+        if self._flushing or not getattr(clause, 'is_select', False) or \
+                getattr(clause, '_for_update_arg', None) is not None:
+            # 自动提交下没有跨语句的事务，不需要把后续的读钉在主库上，也不需要提交；
+            # 未配置从库时同样记录，RequestSessionMiddleware 据此判断是否需要提交
+            if not autocommit:
+                self.info['wrote'] = True
+            return primary
+        if not self.replicas or self.info.get('wrote') or _use_primary.get():
+            return primary
+        return self.replicas.choose(autocommit) or primary
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _reset_routing(session: RoutingSession, transaction: sa_orm.SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop('wrote', None)
 
 
 def create_engine_and_session(url: str | URL, autocommit: bool = False) -> \
         tuple[Engine, sa_orm.sessionmaker[sa_orm.Session]]:
-    try:
-        args = dict(copy.deepcopy(engine_args))
-        if autocommit:
-            args['isolation_level'] = 'AUTOCOMMIT'
-        # 数据库引擎
-        engine = create_engine(
-            url,
-            echo=settings.DB_ECHO,
-            **args,
-            connect_args={
-                "client_flag": CLIENT.MULTI_STATEMENTS,
-            },
-        )
+    engine = engine_registry.get(url)
+    if autocommit:
+        # 与非自动提交共用连接池，连接检出时设置隔离级别，归还时复原
+        engine = engine.execution_options(isolation_level='AUTOCOMMIT')
+    session = sa_orm.sessionmaker(
+        bind=engine,
+        autoflush=False,
+        expire_on_commit=True,
+        class_=RoutingSession,
+    )
+    return engine, session  # type: ignore
 
-    except Exception as e:
-        log.error('❌ 数据库链接失败 {}', e)
-        sys.exit()
-    else:
-        session = sa_orm.sessionmaker(
-            bind=engine,
-            autoflush=False,
-            expire_on_commit=True,
-            class_=HealthySession,
-        )
-        return engine, session  # type: ignore
-
-
-SQLALCHEMY_DATABASE_URL = (
-    f'mysql+pymysql://{settings.DB_USERNAME}:{quote_plus(settings.DB_PASSWORD)}@{settings.DB_HOST}:'
-    f'{settings.DB_PORT}/{settings.DB_DATABASE}?charset={settings.DB_CHARSET}'
-)
+
+def _mysql_url(host: str, port: int, driver: str = 'pymysql') -> str:
+    return (
+        f'mysql+{driver}://{settings.DB_USERNAME}:{quote_plus(settings.DB_PASSWORD)}@{host}:'
+        f'{port}/{settings.DB_DATABASE}?charset={settings.DB_CHARSET}'
+    )
+
+
+def replica_urls(driver: str = 'pymysql') -> list[str]:
+    """
+    DB_REPLICA_HOSTS 中的每一项为 host 或 host:port，账号、库名与主库一致
+    """
+    urls = []
+    for item in settings.DB_REPLICA_HOSTS:
+        host, _, port = item.partition(':')
+        urls.append(_mysql_url(host, int(port or settings.DB_PORT), driver))
+    return urls
+
+
+SQLALCHEMY_DATABASE_URL = _mysql_url(settings.DB_HOST, settings.DB_PORT)
+
+RoutingSession.replicas = ReplicaPool([engine_registry.get(url) for url in replica_urls()])
 
 engine, db_session = create_engine_and_session(SQLALCHEMY_DATABASE_URL)
 
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+
+from sqlalchemy import URL, exc
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_scoped_session,
+    async_sessionmaker,
+)
+
+from common.log import log
+from libs.conf import settings
+from libs.database.db_mysql import (
+    SQLALCHEMY_DATABASE_URL,
+    ReplicaPool,
+    RoutingSession,
+    engine_registry,
+    read_retry_delay,
+    replica_urls,
+)
+
+
+class AsyncRoutingSession(RoutingSession):
+    """
+    AsyncSession 内部使用的同步 Session，从库取自 asyncio 连接池
+    """
+
+    replicas: ReplicaPool = ReplicaPool([])
+    # 运行在 greenlet 中，不在这一层 time.sleep 重试，见 HealthyAsyncSession
+    retry_reads = False
+
+
+class HealthyAsyncSession(AsyncSession):
+    """
+    HealthySession 的断连重试放在 asyncio 层，退避使用 asyncio.sleep，数据库切换期间不阻塞事件循环；
+    scalars 经由 execute，同样重试；scalar、get、stream 不经过 execute，不重试
+    """
+
+    sync_session: AsyncRoutingSession
+
+    async def execute(self, statement, *args, **kwargs):
+        retryable = self.sync_session.read_retryable(statement)
+        attempt = 0
+        while True:
+            try:
+                return await super().execute(statement, *args, **kwargs)
+            except exc.DBAPIError as e:
+                if not (retryable and e.connection_invalidated) or attempt >= settings.DB_READ_RETRY_COUNT:
+                    raise
+                attempt += 1
+                log.warning(f'Lost connection during read, retry {attempt}/{settings.DB_READ_RETRY_COUNT}: {e.orig}')
+                await self.rollback()
+                await asyncio.sleep(read_retry_delay(attempt))
+
+
+def create_async_engine_and_session(url: str | URL, autocommit: bool = False) -> \
+        tuple[AsyncEngine, async_sessionmaker[HealthyAsyncSession]]:
+    # aiomysql 驱动，与同步引擎一样由 engine_registry 统一管理，自动提交与非自动提交共用一个连接池
+    engine = engine_registry.get_async(
+        url,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    )
+    if autocommit:
+        engine = engine.execution_options(isolation_level='AUTOCOMMIT')
+    session = async_sessionmaker(
+        bind=engine,
+        autoflush=False,
+        expire_on_commit=False,
+        class_=HealthyAsyncSession,
+        sync_session_class=AsyncRoutingSession,
+    )
+    return engine, session
+
+
+SQLALCHEMY_ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace('mysql+pymysql://', 'mysql+aiomysql://', 1)
+
+AsyncRoutingSession.replicas = ReplicaPool([
+    engine_registry.get_async(
+        url,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    ).sync_engine
+    for url in replica_urls('aiomysql')
+])
+
+async_engine, async_db_session = create_async_engine_and_session(SQLALCHEMY_ASYNC_DATABASE_URL)
+
+async_engine_auto, async_db_session_auto = create_async_engine_and_session(
+    SQLALCHEMY_ASYNC_DATABASE_URL, autocommit=True
+)
+
+# 不同 asyncio task 使用不同的 session 实例，对应同步版本的 worker_session_auto
+# 注意 registry 以 task 为 key，请求之外（如后台 task）使用时，task 结束前需要 await worker_async_session_auto.remove()
+worker_async_session_auto = async_scoped_session(async_db_session_auto, scopefunc=asyncio.current_task)
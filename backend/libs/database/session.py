@@ -1,18 +1,169 @@
-from fastapi_sqlalchemy import db as fastapi_db
-from fastapi_sqlalchemy.exceptions import (
-    MissingSessionError,
-    SessionNotInitialisedError,
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from libs.database.db_mysql import db_session, db_session_auto, worker_session_auto
+from libs.database.db_mysql_async import (
+    async_db_session,
+    async_db_session_auto,
+    worker_async_session_auto,
 )
 
-from libs.database.db_mysql import worker_session_auto
+
+class _RequestSessions:
+    """
+    一个请求内的 session，首次 get_session / get_async_session 时才创建，未访问数据库的请求不创建也不检出连接
+    """
+
+    __slots__ = ('read_only', 'session', 'async_session')
+
+    def __init__(self):
+        self.read_only = False
+        self.session: Session | None = None
+        self.async_session: AsyncSession | None = None
+
+
+_request: ContextVar[_RequestSessions | None] = ContextVar('_request', default=None)
+
+# 为 True 时 CRUDPlus 的 create / upsert 只把对象加入 session，由 unit_of_work 退出时统一 flush
+_deferred_flush: ContextVar[bool] = ContextVar('_deferred_flush', default=False)
+
+
+def get_session() -> Session:
+    request = _request.get()
+    if request is None:
+        # 不在 RequestSessionMiddleware 内（任务线程、脚本），session改用自动commit机制，取当前线程的 session
+        return worker_session_auto()
+    if request.session is None:
+        request.session = (db_session_auto if request.read_only else db_session)()
+    return request.session
 
 
-def get_session():
+def get_async_session() -> AsyncSession:
+    request = _request.get()
+    if request is None:
+        # 与 get_session 一致，不在请求内时改用自动commit机制，取当前 asyncio task 的 session
+        return worker_async_session_auto()
+    if request.async_session is None:
+        request.async_session = (async_db_session_auto if request.read_only else async_db_session)()
+    return request.async_session
+
+
+async def read_only() -> None:
+    """
+    路由依赖，标记只读接口：请求内的 session 使用自动提交连接，不开启事务，结束时也无需提交；
+    需在首次访问数据库前执行，用法 @router.get(..., dependencies=[Depends(read_only)])
+    """
+    request = _request.get()
+    if request is not None:
+        request.read_only = True
+
+
+def flush_deferred() -> bool:
+    return _deferred_flush.get()
+
+
+@contextmanager
+def unit_of_work() -> Iterator[None]:
+    """
+    块内 CRUDPlus 的 create_model / create_models / upsert_model 不再各自 flush，退出时 flush 一次；
+    session 关闭了 autoflush，块内的查询看不到尚未 flush 的对象，需要主键的场景（自增 id）应在块外读取
+    """
+    token = _deferred_flush.set(True)
     try:
-        s = fastapi_db.session
-        if s is None:
-            raise MissingSessionError
-        return s
-    except (MissingSessionError, SessionNotInitialisedError):
-        # 等到这个路径的时候，因为没有fastapi middleware 帮忙，session改用自动commit机制
-        return worker_session_auto
+        yield
+        get_session().flush()
+    finally:
+        _deferred_flush.reset(token)
+
+
+@asynccontextmanager
+async def async_unit_of_work() -> AsyncIterator[None]:
+    """unit_of_work 的 asyncio 版本，作用于 AsyncCRUDPlus"""
+    token = _deferred_flush.set(True)
+    try:
+        yield
+        await get_async_session().flush()
+    finally:
+        _deferred_flush.reset(token)
+
+
+def has_writes(session: Session) -> bool:
+    """执行过写语句（RoutingSession 在 info 中记录），或有尚未 flush 的对象"""
+    return bool(session.info.get('wrote') or session.new or session.dirty or session.deleted)
+
+
+@asynccontextmanager
+async def request_session_scope() -> AsyncIterator[_RequestSessions]:
+    """
+    一个请求的 session 作用域，RequestSessionMiddleware 为每个请求进入一次；
+    脚本与测试中需要事务（而不是自动提交）时也可以直接使用：正常退出时有写入才提交，异常时回滚，结束时关闭
+
+    :return:
+    """
+    request = _RequestSessions()
+    token = _request.set(request)
+    try:
+        yield request
+        await _commit(request)
+    except Exception:
+        await _rollback(request)
+        raise
+    finally:
+        _request.reset(token)
+        await _close(request)
+
+
+async def _commit(request: _RequestSessions) -> None:
+    if request.session is not None and has_writes(request.session):
+        await run_in_threadpool(request.session.commit)
+    if request.async_session is not None and has_writes(request.async_session.sync_session):
+        await request.async_session.commit()
+
+
+async def _rollback(request: _RequestSessions) -> None:
+    if request.session is not None:
+        await run_in_threadpool(request.session.rollback)
+    if request.async_session is not None:
+        await request.async_session.rollback()
+
+
+async def _close(request: _RequestSessions) -> None:
+    if request.session is not None:
+        await run_in_threadpool(request.session.close)
+    if request.async_session is not None:
+        await request.async_session.close()
+
+
+class RequestSessionMiddleware:
+    """
+    每个请求一个 _RequestSessions，session 在首次 get_session / get_async_session 时才创建，
+    /health、文档与参数校验失败的请求不会创建 session；
+    只有执行过写入时才提交，且在发送响应头之前提交，提交失败返回 500 而不是已经发出的 200；
+    异常时回滚，结束时关闭 session 归还连接
+
+    同步 session 的提交与关闭在线程池中执行，不阻塞事件循环
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async with request_session_scope() as request:
+
+            async def send_committed(message: Message) -> None:
+                if message['type'] == 'http.response.start':
+                    await _commit(request)
+                await send(message)
+
+            # 流式响应在发送响应头之后仍可能写入，退出作用域时再提交一次
+            await self.app(scope, receive, send_committed)
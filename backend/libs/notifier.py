@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import contextlib
+import os
+import queue
+import select
+import socket
+import threading
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from common.log import log
+from libs.conf import settings
+
+
+# session.info 中记录本事务提交后需要发出的唤醒信号
+PENDING_NOTIFICATIONS = 'notifier_pending'
+
+
+class Notifier(ABC):
+    """
+    唤醒信号：notify 不阻塞，wait 阻塞到收到信号或超时；信号只表示"有新数据"，不携带内容，多次 notify 可合并为一次
+    """
+
+    @abstractmethod
+    def notify(self) -> None:
+        ...
+
+    @abstractmethod
+    def wait(self, timeout: float) -> bool:
+        """
+        :param timeout: 单位秒
+        :return: 是否收到信号，超时返回 False
+        """
+        ...
+
+
+class LocalNotifier(Notifier):
+    """进程内，producer 与 api 在同一个 uvicorn worker 中"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def notify(self) -> None:
+        self._event.set()
+
+    def wait(self, timeout: float) -> bool:
+        notified = self._event.wait(timeout)
+        # 只在收到信号时清除，之后的 notify 不会丢失；超时后不能清除，否则超时返回与 clear 之间到达的 notify 会被丢弃
+        if notified:
+            self._event.clear()
+        return notified
+
+
+class SocketNotifier(Notifier):
+    """
+    本机多个进程之间通过 unix datagram socket 唤醒：每个等待的进程在 path 目录下绑定 <pid>.sock，
+    notify 向目录下的每个 socket 发送 1 字节，对方接收缓冲区已满（已有未处理的信号）时直接丢弃
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._sock: socket.socket | None = None
+        self._pid: int | None = None
+
+    def notify(self) -> None:
+        try:
+            names = [n for n in os.listdir(self.path) if n.endswith('.sock')]
+        except FileNotFoundError:
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for name in names:
+                address = os.path.join(self.path, name)
+                try:
+                    sender.sendto(b'1', address)
+                except BlockingIOError:
+                    pass
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # 进程已退出，清理残留的 socket 文件
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(address)
+
+    def wait(self, timeout: float) -> bool:
+        sock = self._socket()
+        readable, _, _ = select.select([sock], [], [], timeout)
+        with contextlib.suppress(BlockingIOError):
+            while True:
+                sock.recv(64)
+        return bool(readable)
+
+    def _socket(self) -> socket.socket:
+        # fork 之后子进程需要绑定自己的 socket
+        if self._sock is None or self._pid != os.getpid():
+            os.makedirs(self.path, exist_ok=True)
+            address = os.path.join(self.path, f'{os.getpid()}.sock')
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(address)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(address)
+            sock.setblocking(False)
+            self._sock, self._pid = sock, os.getpid()
+        return self._sock
+
+
+class PubSubNotifier(Notifier):
+    """
+    redis 兼容的 pub/sub（publish、pubsub().subscribe、get_message），跨主机唤醒；
+    notify 是一次网络往返，在事务提交后同步执行
+    """
+
+    def __init__(self, client: Any, channel: str):
+        self.client = client
+        self.channel = channel
+        self._pubsub: Any = None
+
+    def notify(self) -> None:
+        self.client.publish(self.channel, b'1')
+
+    def wait(self, timeout: float) -> bool:
+        if self._pubsub is None:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(self.channel)
+        notified = self._pubsub.get_message(timeout=timeout) is not None
+        while self._pubsub.get_message(timeout=0) is not None:
+            notified = True
+        return notified
+
+
+class LocalPubSub:
+    """进程内的 redis pub/sub 替身，实现 PubSubNotifier 用到的接口，用于测试"""
+
+    def __init__(self):
+        self._subscribers: dict[str, list[queue.Queue]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, message: bytes) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers[channel])
+        for q in subscribers:
+            q.put({'type': 'message', 'channel': channel, 'data': message})
+        return len(subscribers)
+
+    def pubsub(self, **kwargs) -> '_LocalSubscription':
+        return _LocalSubscription(self)
+
+
+class _LocalSubscription:
+    def __init__(self, hub: LocalPubSub):
+        self._hub = hub
+        self._queue: queue.Queue = queue.Queue()
+
+    def subscribe(self, *channels: str) -> None:
+        with self._hub._lock:
+            for channel in channels:
+                self._hub._subscribers[channel].append(self._queue)
+
+    def get_message(self, timeout: float = 0.0) -> dict | None:
+        try:
+            return self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
+def create_notifier(kind: str, channel: str) -> Notifier:
+    """
+    :param kind: local / socket / redis
+    :param channel: 区分不同用途的信号
+    :return:
+    """
+    if kind == 'local':
+        return LocalNotifier()
+    if kind == 'socket':
+        return SocketNotifier(os.path.join(settings.NOTIFY_SOCKET_DIR, channel))
+    if kind == 'redis':
+        # 可选依赖，只在使用 redis 时需要安装
+        try:
+            import redis  # type: ignore[import-untyped]
+        except ImportError as e:
+            raise ImportError('TASK_NOTIFIER=redis 需要安装 redis: pip install redis') from e
+
+        return PubSubNotifier(redis.Redis.from_url(settings.NOTIFY_REDIS_URL), channel)
+    raise ValueError(f'Unsupported notifier: {kind}')
+
+
+def notify_on_commit(session: Session, notifier: Notifier) -> None:
+    """
+    事务提交后再 notify，避免接收方在提交前查询而错过新数据；自动提交的 session 立即 notify
+
+    :param session:
+    :param notifier:
+    :return:
+    """
+    bind = session.get_bind()
+    if bind.get_execution_options().get('isolation_level') == 'AUTOCOMMIT':
+        notifier.notify()
+        return
+    session.info.setdefault(PENDING_NOTIFICATIONS, set()).add(notifier)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(session: Session) -> None:
+    for notifier in session.info.pop(PENDING_NOTIFICATIONS, ()):
+        try:
+            notifier.notify()
+        except Exception as e:
+            # 数据已提交，唤醒失败只会延迟到下一次轮询
+            log.warning(f'notify failed: {e}')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_NOTIFICATIONS, None)
+
+
+# 新任务写入后唤醒 TaskProducer
+task_notifier: Notifier = create_notifier(settings.TASK_NOTIFIER, 'task')
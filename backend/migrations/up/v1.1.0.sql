@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS `task` (
+    `id` int NOT NULL AUTO_INCREMENT COMMENT '任务id',
+    `resource_id` varchar(36) NOT NULL COMMENT '资源id',
+    `parent_resource_id` varchar(36) DEFAULT NULL COMMENT '父资源id',
+    `queue` varchar(32) DEFAULT 'default' NOT NULL COMMENT '分组',
+    `type` varchar(32) NOT NULL COMMENT '任务类型',
+    `status` int DEFAULT 0 NOT NULL COMMENT '状态',
+    `retry_count` int DEFAULT 0 NOT NULL COMMENT '重试次数',
+    `error_msg` varchar(255) DEFAULT NULL COMMENT '错误信息',
+    `run_time` datetime DEFAULT (now()) COMMENT '最早执行时间',
+    `create_time` datetime DEFAULT (now()) COMMENT '创建时间',
+    `update_time` datetime DEFAULT (now()) COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    KEY `ix_resource_id` (`resource_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,5 @@
+ALTER TABLE `task`
+    ADD COLUMN `lease_owner` varchar(64) DEFAULT NULL COMMENT '领取任务的 worker' AFTER `run_time`,
+    ADD COLUMN `lease_expire_time` datetime DEFAULT NULL COMMENT '租约到期时间' AFTER `lease_owner`,
+    -- claim 按 status + run_time 扫描，FOR UPDATE SKIP LOCKED 只锁索引命中的行
+    ADD KEY `ix_status_run_time` (`status`, `run_time`);
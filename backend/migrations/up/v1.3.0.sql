@@ -0,0 +1,14 @@
+ALTER TABLE `task`
+    ADD COLUMN `pending_upstreams` int DEFAULT 0 NOT NULL COMMENT '未完成的上游任务数' AFTER `error_msg`,
+    DROP KEY `ix_status_run_time`,
+    -- 就绪任务：status = 0 AND pending_upstreams = 0 AND run_time <= now()
+    ADD KEY `ix_status_pending_upstreams_run_time` (`status`, `pending_upstreams`, `run_time`);
+
+CREATE TABLE IF NOT EXISTS `task_dependency` (
+    `upstream_id` int NOT NULL COMMENT '上游任务id',
+    `task_id` int NOT NULL COMMENT '下游任务id',
+    `create_time` datetime DEFAULT (now()) COMMENT '创建时间',
+    `update_time` datetime DEFAULT (now()) COMMENT '更新时间',
+    PRIMARY KEY (`upstream_id`, `task_id`),
+    KEY `ix_task_id` (`task_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,11 @@
+ALTER TABLE `task`
+    DROP KEY `ix_status_pending_upstreams_run_time`,
+    -- 领取与就绪统计：status = 0 AND pending_upstreams = 0 AND queue = ? AND type = ? ORDER BY id，
+    -- 二级索引末尾隐含主键 id，等值前缀下按 id 有序，不需要 filesort，run_time 在索引记录上过滤
+    ADD KEY `ix_ready` (`status`, `pending_upstreams`, `queue`, `type`),
+    -- 租约回收：status = 1 AND lease_expire_time < now()
+    ADD KEY `ix_status_lease_expire_time` (`status`, `lease_expire_time`);
+
+ALTER TABLE `resource`
+    -- 按分组的 keyset 分页：queue = ? AND id > ? ORDER BY id
+    ADD KEY `ix_queue` (`queue`);
@@ -0,0 +1,3 @@
+ALTER TABLE `resource`
+    -- 任务类型 -> 输出地址，如 {"stt": "file:///.../stt.txt", "ocr": "file:///.../ocr.txt"}，各类型的任务分别写入自己的键
+    ADD COLUMN `output_urls` json DEFAULT NULL COMMENT '各任务类型的输出地址' AFTER `text_url`;
@@ -0,0 +1,3 @@
+ALTER TABLE `resource`
+    -- 资源的 ETag 由 update_time 生成，精确到秒时同一秒内的两次更新 ETag 相同，客户端会拿到过期的 304
+    MODIFY COLUMN `update_time` datetime(6) DEFAULT (now(6)) COMMENT '更新时间';
@@ -0,0 +1,232 @@
+import asyncio
+import dataclasses
+import pickle
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from libs.conf import settings
+
+
+# session.info 中记录本事务内待失效的缓存 key，提交后再失效一次，避免提交前被并发读回填旧值
+PENDING_INVALIDATIONS = 'entity_cache_pending'
+
+# 分段锁数量，同一个 key 的并发未命中只有一个线程回源
+_STRIPES = 64
+
+# 回源的协程被取消时 in-flight future 的结果，等待者不继承取消，改为自己回源
+_CANCELLED = object()
+
+
+@dataclasses.dataclass
+class CacheStats:
+    """命中统计，negative_hits 为命中负缓存（记录不存在）的次数"""
+
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.negative_hits + self.misses
+        return (self.hits + self.negative_hits) / total if total else 0.0
+
+
+class CacheBackend(ABC):
+    """
+    二级缓存（如 redis），多个进程共享；value 为 pickle 后的 bytes，ttl 单位为秒
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class EntityCache:
+    """
+    按 表名:主键 缓存一行的字段值（dict），一级为进程内 LRU + TTL，可选二级 CacheBackend
+
+    缓存的是字段值而不是 orm 实例，命中后由 CRUDPlus 合并到调用方的 session；
+    value 为 None 表示记录不存在（负缓存），使用较短的 negative_ttl
+    """
+
+    def __init__(
+            self,
+            maxsize: int = settings.ENTITY_CACHE_SIZE,
+            ttl: float = settings.ENTITY_CACHE_TTL,
+            negative_ttl: float = settings.ENTITY_CACHE_NEGATIVE_TTL,
+            backend: CacheBackend | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self.stats = CacheStats()
+        self._data: OrderedDict[str, tuple[float, dict[str, Any] | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(_STRIPES)]
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def get(self, key: str) -> tuple[bool, dict[str, Any] | None]:
+        """
+        :param key:
+        :return: (是否命中, 字段值)，命中负缓存时返回 (True, None)
+        """
+        hit, value = self._lookup(key)
+        with self._lock:
+            if not hit:
+                self.stats.misses += 1
+            elif value is None:
+                self.stats.negative_hits += 1
+            else:
+                self.stats.hits += 1
+        return hit, value
+
+    def set(self, key: str, value: dict[str, Any] | None) -> None:
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._set_local(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, pickle.dumps(value), ttl)
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            with self._lock:
+                self._data.pop(key, None)
+                self.stats.invalidations += 1
+            if self.backend is not None:
+                self.backend.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key: str, loader: Callable[[], dict[str, Any] | None]) -> dict[str, Any] | None:
+        """
+        read-through，同一个 key 的并发未命中只有一个线程执行 loader，其余线程等待后读缓存
+
+        :param key:
+        :param loader: 回源查询，返回字段值或 None
+        :return:
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+        with self._stripes[hash(key) % _STRIPES]:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            value = self._load(key, loader())
+        return value
+
+    async def get_or_load_async(
+            self, key: str, loader: Callable[[], Awaitable[dict[str, Any] | None]]
+    ) -> dict[str, Any] | None:
+        """
+        get_or_load 的 asyncio 版本，同一个 key 的并发未命中共享一次 loader；
+        loader 使用发起者的 session，发起者被取消（如客户端断开）时回源随之中止，等待者收到 _CANCELLED 后重新回源
+
+        :param key:
+        :param loader:
+        :return:
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+        while (future := self._inflight.get(key)) is not None:
+            value = await asyncio.shield(future)
+            if value is not _CANCELLED:
+                return value
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = self._load(key, await loader())
+        except asyncio.CancelledError:
+            future.set_result(_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self._inflight[key]
+        return value
+
+    def _load(self, key: str, value: dict[str, Any] | None) -> dict[str, Any] | None:
+        with self._lock:
+            self.stats.loads += 1
+        self.set(key, value)
+        return value
+
+    def _lookup(self, key: str) -> tuple[bool, dict[str, Any] | None]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    return True, entry[1]
+                del self._data[key]
+        if self.backend is None:
+            return False, None
+        raw = self.backend.get(key)
+        if raw is None:
+            return False, None
+        value = pickle.loads(raw)
+        # 二级缓存的剩余 ttl 未知，一级只保留较短的时间
+        self._set_local(key, value, min(self.ttl, self.negative_ttl))
+        return True, value
+
+    def _set_local(self, key: str, value: dict[str, Any] | None, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+
+def invalidate_on_commit(session: Session, cache: EntityCache, keys: list[str]) -> None:
+    """
+    立即失效，并在事务提交后再失效一次；自动提交的 session 写入即可见，不需要等待提交
+
+    :param session:
+    :param cache:
+    :param keys:
+    :return:
+    """
+    cache.invalidate(keys)
+    bind = session.get_bind()
+    if bind.get_execution_options().get('isolation_level') == 'AUTOCOMMIT':
+        return
+    session.info.setdefault(PENDING_INVALIDATIONS, []).append((cache, keys))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session: Session) -> None:
+    for cache, keys in session.info.pop(PENDING_INVALIDATIONS, ()):
+        cache.invalidate(keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(PENDING_INVALIDATIONS, None)
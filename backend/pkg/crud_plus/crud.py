@@ -1,37 +1,57 @@
+import dataclasses
+
 from enum import Enum
+from functools import cached_property
 from typing import (
     Any,
+    Callable,
     Generic,
     Iterable,
+    Iterator,
     Literal,
     Protocol,
     Sequence,
     Type,
     TypeVar,
-    cast,
 )
 
 from pydantic import BaseModel
 from sqlalchemy import (
-    ColumnElement,
     Row,
     RowMapping,
+    Select,
     and_,
     asc,
+    bindparam,
     delete as sa_delete,
     desc,
+    insert as sa_insert,
     or_,
     select,
     update as sa_update,
 )
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import MultipleResultsFound, NoResultFound
-from sqlalchemy.orm import Mapped, Session
+from sqlalchemy.orm import InstrumentedAttribute, Mapped, Session, class_mapper, load_only
+from sqlalchemy.orm.attributes import instance_state, set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
 
 from app.do.base import DOAttributeBase
 from common.exception import errors
 from common.log import log
-from libs.database.session import get_session
+from libs.database.db_mysql import use_primary
+from libs.database.session import flush_deferred, get_session, has_writes
+from pkg.crud_plus.cache import EntityCache, invalidate_on_commit
 from pkg.crud_plus.error import ModelColumnError, SelectExpressionError
+from pkg.crud_plus.keyset import (
+    KeysetCursor,
+    KeysetPage,
+    KeysetParams,
+    KeysetSlice,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+)
 
 
 class ExpressionLiteral(str, Enum):
@@ -50,10 +70,56 @@ _CreateSchema = TypeVar('_CreateSchema', bound=BaseModel)
 _UpsertSchema = TypeVar('_UpsertSchema', bound=BaseModel)
 _UpdateSchema = TypeVar('_UpdateSchema', bound=BaseModel)
 
+# 批量写入时单条 INSERT 语句包含的行数，过大容易超过 max_allowed_packet
+DEFAULT_CHUNK_SIZE = 1000
+
+# 每个 CRUDPlus 缓存的语句形状数量上限，超过后新形状按次构造、不再缓存
+STATEMENT_CACHE_SIZE = 256
+
+
+@dataclasses.dataclass
+class UpsertResult:
+    """批量 upsert 的写入统计"""
+
+    inserted: int = 0
+    updated: int = 0
+
+    def add(self, pks: Sequence[Any], existing: Iterable[Any]) -> None:
+        """
+        :param pks: 本批写入行的主键，自增主键为 None
+        :param existing: 写入前已存在的主键
+        :return:
+        """
+        seen = set(existing)
+        for pk in pks:
+            if pk is not None and pk in seen:
+                self.updated += 1
+                continue
+            self.inserted += 1
+            # 同一批中重复的主键，后一行是对前一行的更新
+            if pk is not None:
+                seen.add(pk)
+
+
+def _chunked(items: Sequence[Any], size: int) -> Iterable[Sequence[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class CRUDPlusBase(Generic[_Model]):
+    """CRUDPlus 与 AsyncCRUDPlus 共用的、与 IO 无关的部分：参数转换与语句构造"""
 
-class CRUDPlus(Generic[_Model]):
-    def __init__(self, model: Type[_Model]):
+    def __init__(self, model: Type[_Model], cache: EntityCache | None = None):
+        """
+        :param model:
+        :param cache: select_model_by_id 的 read-through 缓存，写方法会自动失效对应的行；
+            同一个 model 的同步与 asyncio CRUDPlus 需要共用一个 EntityCache
+        """
         self.model = model
+        self.cache = cache
+        # (操作, 条件列, 表达式, ...) -> 以 bindparam 占位的语句，
+        # 同一个语句对象的 cache key 只计算一次，编译结果也只有一份
+        self._statements: dict[tuple, Any] = {}
 
     def do_to_model(self, obj, **kwargs):
         if isinstance(obj, self.model):
@@ -62,6 +128,371 @@ class CRUDPlus(Generic[_Model]):
             return obj.do_to_model(**kwargs)
         return self.model(**obj.model_dump(), **kwargs)
 
+    @cached_property
+    def _column_keys(self) -> dict[str, str]:
+        """orm 属性名 -> 表字段名"""
+        return {prop.key: prop.columns[0].key for prop in class_mapper(self.model).column_attrs}
+
+    @cached_property
+    def _column_defaults(self) -> dict[str, Callable[[], Any]]:
+        """
+        dataclass 层面的默认值（如 default_factory=uuid7_hex），Core insert 不经过 orm 构造函数，需要在组装参数时补齐
+        """
+        defaults: dict[str, Callable[[], Any]] = {}
+        if not dataclasses.is_dataclass(self.model):
+            return defaults
+        for field in dataclasses.fields(self.model):
+            if field.name not in self._column_keys:
+                continue
+            if field.default_factory is not dataclasses.MISSING:
+                defaults[field.name] = field.default_factory
+            elif field.default is not dataclasses.MISSING:
+                defaults[field.name] = (lambda v: lambda: v)(field.default)
+        return defaults
+
+    def do_to_params(self, obj, **kwargs) -> dict[str, Any]:
+        """
+        将 do / schema / model 直接转为 insert 参数字典，不构造 orm 实例
+
+        :param obj:
+        :param kwargs:
+        :return:
+        """
+        if isinstance(obj, self.model):
+            data = {key: getattr(obj, key) for key in self._column_keys}
+            data.update(kwargs)
+        elif isinstance(obj, DOAttributeBase):
+            data = obj.do_to_params(**kwargs)
+        else:
+            data = {**obj.model_dump(), **kwargs}
+        params = {}
+        for key, column_key in self._column_keys.items():
+            if key in data:
+                params[column_key] = data[key]
+            elif key in self._column_defaults:
+                params[column_key] = self._column_defaults[key]()
+        return params
+
+    def _onupdate_values(self) -> dict[str, Any]:
+        """ON DUPLICATE KEY UPDATE 不会触发 Column.onupdate，需要显式求值"""
+        values = {}
+        for column in self.model.__table__.columns:  # type: ignore[attr-defined]
+            onupdate = column.onupdate
+            if onupdate is None:
+                continue
+            if onupdate.is_callable:
+                values[column.key] = onupdate.arg(None)
+            elif onupdate.is_scalar:
+                values[column.key] = onupdate.arg
+        return values
+
+    @cached_property
+    def _columns(self) -> dict[str, InstrumentedAttribute]:
+        """orm 属性名 -> 列属性，代替每次调用时的 hasattr / getattr"""
+        return {key: getattr(self.model, key) for key in self._column_keys}
+
+    def _column(self, name: str) -> InstrumentedAttribute:
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise ModelColumnError(f'Model column {name} is not found') from None
+
+    def _get_where_conditions(self, conditions):
+        return [self._column(column) == value for column, value in conditions.items()]
+
+    def _cached_statement(self, key: tuple, build: Callable[[], Any]) -> Any:
+        stmt = self._statements.get(key)
+        if stmt is None:
+            stmt = build()
+            if len(self._statements) < STATEMENT_CACHE_SIZE:
+                self._statements[key] = stmt
+        return stmt
+
+    @staticmethod
+    def _condition_shape(conditions: dict[str, Any]) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        """条件的形状：值为 None 的列编译为 IS NULL，其余列为 = :w_列名"""
+        binds = tuple(sorted(k for k, v in conditions.items() if v is not None))
+        nulls = tuple(sorted(k for k, v in conditions.items() if v is None))
+        return binds, nulls
+
+    @staticmethod
+    def _where_params(conditions: dict[str, Any]) -> dict[str, Any]:
+        return {f'w_{k}': v for k, v in conditions.items() if v is not None}
+
+    def _shaped_where(self, binds: tuple[str, ...], nulls: tuple[str, ...], expression: ExpressionLiteral) -> list:
+        where_list = [self._column(k) == bindparam(f'w_{k}') for k in binds]
+        where_list.extend(self._column(k).is_(None) for k in nulls)
+        if not where_list:
+            return []
+        match expression:
+            case ExpressionLiteral.and_:
+                return [and_(*where_list)]
+            case ExpressionLiteral.or_:
+                return [or_(*where_list)]
+            case _:
+                raise SelectExpressionError(f'select expression {expression} is not supported')
+
+    def _select_statement(
+            self,
+            conditions: dict[str, Any],
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            *,
+            fields: Sequence[str] | None = None,
+            entities: Sequence[str] | None = None,
+            order_by: Sequence[str] = (),
+            model_sort: str = 'default',
+    ) -> tuple[Select, dict[str, Any]]:
+        """
+        按形状缓存的 select，返回语句与执行参数
+
+        :param conditions: 列 == 值 的条件
+        :param expression:
+        :param fields: 只加载这些列，见 _load_options
+        :param entities: 只查询这些列，返回 Core row
+        :param order_by:
+        :param model_sort:
+        :return:
+        """
+        binds, nulls = self._condition_shape(conditions)
+        key = (
+            'select', binds, nulls, expression,
+            tuple(fields) if fields is not None else None, tuple(entities or ()), tuple(order_by), model_sort,
+        )
+
+        def build() -> Select:
+            if entities:
+                stmt = select(*[self._column(c) for c in entities])
+            else:
+                stmt = select(self.model).options(*self._load_options(fields))
+            stmt = stmt.where(*self._shaped_where(binds, nulls, expression))
+            if order_by:
+                columns = [self._column(c) for c in order_by]
+                match model_sort:
+                    case 'default':
+                        stmt = stmt.order_by(*columns)
+                    case 'asc':
+                        stmt = stmt.order_by(*[asc(c) for c in columns])
+                    case 'desc':
+                        stmt = stmt.order_by(*[desc(c) for c in columns])
+                    case _:
+                        raise SelectExpressionError(f'select sort expression {model_sort} is not supported')
+            return stmt
+
+        return self._cached_statement(key, build), self._where_params(conditions)
+
+    def _update_statement(
+            self,
+            conditions: dict[str, Any],
+            values: dict[str, Any],
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+    ) -> tuple[Any, dict[str, Any]]:
+        """
+        按形状缓存的 update。ORM 的 synchronize_session='evaluate' 只能读取语句中的字面值，读不到执行时传入的参数，
+        因此以 synchronize_session=False 执行，由 _synchronize 同步 session 中已加载的对象
+        """
+        binds, nulls = self._condition_shape(conditions)
+        value_keys = tuple(sorted(values))
+        key = ('update', binds, nulls, expression, value_keys)
+
+        def build():
+            return sa_update(self.model).where(
+                *self._shaped_where(binds, nulls, expression)
+            ).values(
+                {self._column(k): bindparam(f'v_{k}') for k in value_keys}
+            ).execution_options(synchronize_session=False)
+
+        params = self._where_params(conditions)
+        params.update({f'v_{k}': v for k, v in values.items()})
+        return self._cached_statement(key, build), params
+
+    def _delete_statement(
+            self, conditions: dict[str, Any], expression: ExpressionLiteral = ExpressionLiteral.and_
+    ) -> tuple[Any, dict[str, Any]]:
+        """按形状缓存的 delete，同 _update_statement"""
+        binds, nulls = self._condition_shape(conditions)
+        key = ('delete', binds, nulls, expression)
+
+        def build():
+            return sa_delete(self.model).where(
+                *self._shaped_where(binds, nulls, expression)
+            ).execution_options(synchronize_session=False)
+
+        return self._cached_statement(key, build), self._where_params(conditions)
+
+    def _synchronize(
+            self,
+            session,
+            conditions: dict[str, Any],
+            expression: ExpressionLiteral,
+            values: dict[str, Any] | None,
+    ) -> None:
+        """
+        缓存的 update / delete 执行后同步 session：条件都是 列 == 值，在 Python 中匹配已加载的对象，
+        更新时写入未修改的属性并使 onupdate 列过期，删除时移出 session；无法判断的对象整体过期
+
+        :param session:
+        :param conditions:
+        :param expression:
+        :param values: 为 None 时表示删除
+        :return:
+        """
+        for obj in list(session.identity_map.values()):
+            if not isinstance(obj, self.model):
+                continue
+            state = instance_state(obj)
+            if any(k not in state.dict for k in conditions):
+                session.expire(obj)
+                continue
+            hits = [state.dict[k] == v for k, v in conditions.items()]
+            if hits and not (all(hits) if expression == ExpressionLiteral.and_ else any(hits)):
+                continue
+            if values is None:
+                session.expunge(obj)
+                continue
+            for k in state.unmodified.intersection(values):
+                set_committed_value(obj, k, values[k])
+            expired = [k for k in self._onupdate_keys if k not in values]
+            if expired:
+                session.expire(obj, expired)
+
+    @cached_property
+    def _onupdate_keys(self) -> list[str]:
+        table = self.model.__table__  # type: ignore[attr-defined]
+        columns = {c.key for c in table.columns if c.onupdate is not None}
+        return [key for key, column_key in self._column_keys.items() if column_key in columns]
+
+    def _keyset_columns(self, sort_column: str) -> list:
+        self._column(sort_column)
+        table = self.model.__table__  # type: ignore[attr-defined]
+        pk_column = table.columns[self._column_keys['id']]
+        if sort_column == 'id':
+            return [pk_column]
+        column = table.columns[self._column_keys[sort_column]]
+        indexed = column.primary_key or column.index or any(
+            index.columns.values()[0] is column for index in table.indexes
+        )
+        if not indexed:
+            raise SelectExpressionError(f'keyset sort column {sort_column} is not indexed')
+        if column.nullable:
+            # NULL 与任何值比较都不成立，游标条件会漏掉排序列为 NULL 的行
+            raise SelectExpressionError(f'keyset sort column {sort_column} is nullable')
+        # id 作为 tiebreaker，保证排序键唯一、游标稳定
+        return [column, pk_column]
+
+    def _cache_key(self, pk: Any) -> str:
+        return f'{self.model.__tablename__}:{pk}'  # type: ignore[attr-defined]
+
+    def _to_cache(self, instance: _Model | None) -> dict[str, Any] | None:
+        """只取已加载的列，deferred 列不进缓存"""
+        if instance is None:
+            return None
+        loaded = instance_state(instance).dict
+        return {key: loaded[key] for key in self._column_keys if key in loaded}
+
+    @cached_property
+    def _undeferred_keys(self) -> frozenset[str]:
+        """默认加载的列，即没有标记 deferred 的列"""
+        return frozenset(prop.key for prop in class_mapper(self.model).column_attrs if not prop.deferred)
+
+    def _load_options(self, fields: Sequence[str] | None) -> list:
+        """
+        列投影：只加载 fields 中的列（主键总是加载），fields 中的 deferred 列也一并加载；
+        未加载的列访问时直接报错，而不是逐行补查。fields 为空时按 model 的定义加载
+
+        :param fields:
+        :return:
+        """
+        if fields is None:
+            return []
+        for field in fields:
+            if field not in self._column_keys:
+                raise ModelColumnError(f'Model column {field} is not found')
+        columns = [self._column(f) for f in dict.fromkeys(['id', *fields])]
+        return [load_only(*columns, raiseload=True)]
+
+    def _cacheable(self, fields: Sequence[str] | None) -> bool:
+        """缓存只保存默认加载的列，需要 deferred 列时直接查库"""
+        return self.cache is not None and (fields is None or self._undeferred_keys.issuperset(fields))
+
+    def _from_cache(self, values: dict[str, Any]) -> _Model:
+        """由缓存的字段值构造 detached 实例，调用方再以 merge(load=False) 放入 session，不产生查询"""
+        instance = class_mapper(self.model).class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+        return instance
+
+    def _invalidate(self, session, pks: Iterable[Any]) -> None:
+        if self.cache is not None:
+            # unit_of_work 中自增主键在 flush 前为 None
+            invalidate_on_commit(session, self.cache, [self._cache_key(pk) for pk in pks if pk is not None])
+
+    def _pk_statement(self, conditions: dict[str, Any], expression: ExpressionLiteral) -> tuple[Select, dict]:
+        return self._select_statement(conditions, expression, entities=['id'])
+
+    def _upsert_update_columns(self, update_columns: Sequence[str] | None) -> Sequence[str]:
+        table = self.model.__table__  # type: ignore[attr-defined]
+        if update_columns is None:
+            return [c.key for c in table.columns if not c.primary_key and c.key != 'create_time']
+        for column in update_columns:
+            if column not in table.columns:
+                raise ModelColumnError(f'Model column {column} is not found')
+        return update_columns
+
+    def _existing_pks_statement(self, pks: Sequence[Any]) -> Select:
+        """
+        upsert 前查出已存在的主键，用于区分插入与更新；加锁读，读到最新提交的行，
+        并在事务内锁住这些主键（含不存在主键的间隙），upsert 完成前其他事务无法插入或删除
+        """
+        table = self.model.__table__  # type: ignore[attr-defined]
+        pk_column = table.columns[self._column_keys['id']]
+        return select(pk_column).where(pk_column.in_(pks)).with_for_update()
+
+    def _upsert_statement(self, chunk: Sequence[dict[str, Any]], update_columns: Sequence[str]):
+        stmt = mysql_insert(self.model.__table__).values(list(chunk))  # type: ignore[attr-defined]
+        set_ = {column: stmt.inserted[column] for column in update_columns}
+        set_.update(self._onupdate_values())
+        return stmt.on_duplicate_key_update(set_)
+
+    def _keyset_statement(
+            self, cursor: str | None, size: int, sort_column: str, model_sort: str, conditions: dict[str, Any],
+            fields: Sequence[str] | None = None,
+    ) -> tuple[Select, list, KeysetCursor | None]:
+        if model_sort not in ('asc', 'desc'):
+            raise SelectExpressionError(f'select sort expression {model_sort} is not supported')
+        columns = self._keyset_columns(sort_column)
+        token = decode_cursor(cursor, columns) if cursor else None
+        backwards = token.backwards if token else False
+        # 向前翻页时反向扫描，取到结果后再翻转回来
+        ascending = (model_sort == 'asc') != backwards
+        stmt = select(self.model).where(*self._get_where_conditions(conditions))
+        if fields is not None:
+            # 游标取自排序列，排序列必须加载
+            stmt = stmt.options(*self._load_options([*fields, sort_column]))
+        if token:
+            stmt = stmt.where(keyset_condition(columns, token.values, ascending))
+        stmt = stmt.order_by(*[asc(c) if ascending else desc(c) for c in columns]).limit(size + 1)
+        return stmt, columns, token
+
+    @staticmethod
+    def _keyset_slice(rows: Sequence[Any], size: int, columns: list, token: KeysetCursor | None) -> KeysetSlice:
+        backwards = token.backwards if token else False
+        has_more = len(rows) > size
+        items = list(rows[:size])
+        if backwards:
+            items.reverse()
+        page: KeysetSlice = KeysetSlice(items=items)
+        if not items:
+            return page
+        keys = [c.key for c in columns]
+        if has_more or backwards:
+            page.next_cursor = encode_cursor([getattr(items[-1], k) for k in keys])
+        if token and (not backwards or has_more):
+            page.previous_cursor = encode_cursor([getattr(items[0], k) for k in keys], backwards=True)
+        return page
+
+
+class CRUDPlus(CRUDPlusBase[_Model]):
     def create_model(self, obj: _CreateSchema | _Model, **kwargs) -> None:
         """
         Create a new instance of a model
@@ -74,20 +505,72 @@ class CRUDPlus(Generic[_Model]):
         session: Session = get_session()
         instance = self.do_to_model(obj, **kwargs)
         session.add(instance)
-        session.flush()
+        if not flush_deferred():
+            session.flush()
+        # 清除可能存在的负缓存
+        self._invalidate(session, [instance.id])
 
-    def create_models(self, objs: Iterable[_CreateSchema | _Model]) -> None:
+    def create_models(
+            self,
+            objs: Iterable[_CreateSchema | _Model],
+            *,
+            bulk: bool = False,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            return_pks: bool = False,
+    ) -> list[Any] | None:
         """
         Create new instances of a model
 
         :param session:
         :param obj:
+        :param bulk: 跳过 orm 实例与 unit of work，直接以 executemany 分批写入
+        :param chunk_size: bulk 模式下每批的行数
+        :param return_pks: 返回写入行的主键，bulk 模式下只支持由客户端生成的主键
         :return:
         """
+        if bulk:
+            return self.bulk_insert_models(objs, chunk_size=chunk_size, return_pks=return_pks)
         session: Session = get_session()
         instance_list = [self.do_to_model(i) for i in objs]
         session.add_all(instance_list)
-        session.flush()
+        if not flush_deferred():
+            session.flush()
+        self._invalidate(session, [i.id for i in instance_list])
+        if return_pks:
+            return [i.id for i in instance_list]
+        return None
+
+    def bulk_insert_models(
+            self,
+            objs: Iterable[_CreateSchema | _Model],
+            *,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            return_pks: bool = False,
+    ) -> list[Any] | None:
+        """
+        Bulk insert instances of a model, bypassing the orm unit of work
+
+        return_pks 只支持由客户端生成的主键（如 uuid7_hex），直接从参数中取回；
+        自增主键在 innodb_autoinc_lock_mode=2（mysql 8 默认）时同一语句内也不连续，无法由 lastrowid 推算，
+        需要 id 时使用 create_models(bulk=False)，或按业务键读回
+
+        :param objs:
+        :param chunk_size:
+        :param return_pks:
+        :return:
+        """
+        table = self.model.__table__  # type: ignore[attr-defined]
+        pk_key = self._column_keys['id']
+        rows = [self.do_to_params(i) for i in objs]
+        if return_pks and any(row.get(pk_key) is None for row in rows):
+            raise ModelColumnError(f'return_pks requires client-generated primary keys for {self.model.__name__}')
+        session: Session = get_session()
+        for chunk in _chunked(rows, chunk_size):
+            session.execute(sa_insert(table), chunk)
+        # 写入前可能有对这些主键的读取留下了负缓存
+        self._invalidate(session, [row.get(pk_key) for row in rows])
+        log.info(f'bulk_insert_models {self.model.__name__} rows {len(rows)}')
+        return [row[pk_key] for row in rows] if return_pks else None
 
     def upsert_model(self, obj: _UpsertSchema | _Model, **kwargs) -> None:
         """
@@ -100,41 +583,97 @@ class CRUDPlus(Generic[_Model]):
         session: Session = get_session()
         instance = self.do_to_model(obj, **kwargs)
         """执行 UPSERT 操作"""
-        session.merge(instance)
-        session.flush()
+        instance = session.merge(instance)
+        if not flush_deferred():
+            session.flush()
+        self._invalidate(session, [instance.id])
+
+    def upsert_models(
+            self,
+            objs: Iterable[_UpsertSchema | _Model],
+            *,
+            update_columns: Sequence[str] | None = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> UpsertResult:
+        """
+        Upsert instances of a model, one INSERT ... ON DUPLICATE KEY UPDATE per chunk
+
+        MySQL 的 affected rows（插入记 1，更新记 2，值未变化记 0）无法可靠反推插入与更新的行数，
+        每批写入前先以 SELECT ... FOR UPDATE 查出已存在的主键，据此统计；
+        自动提交的 session 中锁随语句释放，并发写入时统计可能有偏差
 
-    def select_model_by_id(self, pk: str) -> _Model | None:
+        :param objs:
+        :param update_columns: 冲突时覆盖的字段，默认为除主键与 create_time 之外的全部字段
+        :param chunk_size:
+        :return:
         """
-        Query by ID
+        session: Session = get_session()
+        update_columns = self._upsert_update_columns(update_columns)
+        rows = [self.do_to_params(i) for i in objs]
+        pk_key = self._column_keys['id']
+        self._invalidate(session, [row[pk_key] for row in rows if row.get(pk_key) is not None])
+        result = UpsertResult()
+        for chunk in _chunked(rows, chunk_size):
+            pks = [row.get(pk_key) for row in chunk]
+            known = [pk for pk in pks if pk is not None]
+            existing = session.scalars(self._existing_pks_statement(known)).all() if known else []
+            session.execute(self._upsert_statement(chunk, update_columns))
+            result.add(pks, existing)
+        log.info(f'upsert_models {self.model.__name__} inserted {result.inserted} updated {result.updated}')
+        return result
+
+    def select_model_by_id(self, pk: str, *, fields: Sequence[str] | None = None) -> _Model | None:
+        """
+        Query by ID, 配置了 cache 时先读缓存；当前事务已有写入时直接查库，
+        既读到本事务未提交的写入，也不把未提交（可能回滚）的值填进缓存
 
         :param session:
         :param pk:
+        :param fields: 只加载这些列，见 _load_options
         :return:
         """
         session: Session = get_session()
-        query = session.execute(
-            select(self.model).where(
-                cast("ColumnElement[bool]", self.model.id == pk)
-            )
-        )
-        return query.scalars().first()
+        if self.cache is None or not self._cacheable(fields) or has_writes(session):
+            return self._select_model_by_id(session, pk, fields)
 
-    def select_model_by_column(self, column: str, column_value: Any) -> _Model | None:
+        def load():
+            # 回源读主库：写入提交后失效缓存，紧接着的读若落到延迟的从库，会把旧值回填并缓存整个 ttl
+            with use_primary():
+                return self._to_cache(self._select_model_by_id(session, pk))
+
+        values = self.cache.get_or_load(self._cache_key(pk), load)
+        if values is None:
+            return None
+        return session.merge(self._from_cache(values), load=False)
+
+    def _select_model_by_id(self, session: Session, pk: str, fields: Sequence[str] | None = None) -> _Model | None:
+        stmt, params = self._select_statement({'id': pk}, fields=fields)
+        return session.execute(stmt, params).scalars().first()
+
+    def _invalidate_where(self, session: Session, conditions: dict[str, Any], expression: ExpressionLiteral) -> None:
+        """按条件写入前先查出受影响的主键（走主库），再失效缓存"""
+        if self.cache is None:
+            return
+        stmt, params = self._pk_statement(conditions, expression)
+        with use_primary():
+            pks = session.execute(stmt, params).scalars().all()
+        self._invalidate(session, pks)
+
+    def select_model_by_column(
+            self, column: str, column_value: Any, *, fields: Sequence[str] | None = None
+    ) -> _Model | None:
         """
         Query by column
 
         :param session:
         :param column:
         :param column_value:
+        :param fields: 只加载这些列，见 _load_options
         :return:
         """
         session: Session = get_session()
-        if hasattr(self.model, column):
-            model_column = getattr(self.model, column)
-            query = session.execute(select(self.model).where(model_column == column_value))  # type: ignore
-            return query.scalars().first()
-        else:
-            raise ModelColumnError(f'Model column {column} is not found')
+        stmt, params = self._select_statement({column: column_value}, fields=fields)
+        return session.execute(stmt, params).scalars().first()
 
     def select_one_model_by_column(self, column: str, column_value: Any) -> _Model:
         """
@@ -147,17 +686,14 @@ class CRUDPlus(Generic[_Model]):
         :raises MultipleResultsFound: If multiple results are found.
         """
         session: Session = get_session()
-        if hasattr(self.model, column):
-            model_column = getattr(self.model, column)
-            query = session.execute(select(self.model).where(model_column == column_value))  # type: ignore
-            try:
-                return query.scalars().one()
-            except NoResultFound:
-                raise NoResultFound(f'No result found for {column} = {column_value}')
-            except MultipleResultsFound:
-                raise MultipleResultsFound(f'Multiple results found for {column} = {column_value}')
-        else:
-            raise ModelColumnError(f'Model column {column} is not found')
+        stmt, params = self._select_statement({column: column_value})
+        query = session.execute(stmt, params)
+        try:
+            return query.scalars().one()
+        except NoResultFound:
+            raise NoResultFound(f'No result found for {column} = {column_value}')
+        except MultipleResultsFound:
+            raise MultipleResultsFound(f'Multiple results found for {column} = {column_value}')
 
     def select_model_by_columns(
             self, expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
@@ -171,15 +707,8 @@ class CRUDPlus(Generic[_Model]):
         :return:
         """
         session: Session = get_session()
-        where_list = self._get_where_conditions(conditions)
-        match expression:
-            case ExpressionLiteral.and_:
-                query = session.execute(select(self.model).where(and_(*where_list)))
-            case ExpressionLiteral.or_:
-                query = session.execute(select(self.model).where(or_(*where_list)))
-            case _:
-                raise SelectExpressionError(f'select expression {expression} is not supported')
-        return query.scalars().first()
+        stmt, params = self._select_statement(conditions, expression)
+        return session.execute(stmt, params).scalars().first()
 
     def _build_entity_query_by_columns(
             self, columns: list[str], expression: ExpressionLiteral = ExpressionLiteral.and_,
@@ -188,17 +717,9 @@ class CRUDPlus(Generic[_Model]):
             raise errors.NotFoundError(msg='no entities found in the query')
         if 'id' not in columns:
             columns.append('id')
-        entities = [getattr(self.model, e) for e in columns]
         session: Session = get_session()
-        where_list = self._get_where_conditions(conditions)
-        match expression:
-            case ExpressionLiteral.and_:
-                query = session.execute(select(*entities).where(and_(*where_list)))
-            case ExpressionLiteral.or_:
-                query = session.execute(select(*entities).where(or_(*where_list)))
-            case _:
-                raise SelectExpressionError(f'select expression {expression} is not supported')
-        return query
+        stmt, params = self._select_statement(conditions, expression, entities=columns)
+        return session.execute(stmt, params)
 
     def select_entities_by_columns(
             self, columns: list[str], expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
@@ -228,16 +749,6 @@ class CRUDPlus(Generic[_Model]):
         query = self._build_entity_query_by_columns(columns, expression, **conditions)
         return query.first()
 
-    def _get_where_conditions(self, conditions):
-        where_list = []
-        for column, value in conditions.items():
-            if hasattr(self.model, column):
-                model_column = getattr(self.model, column)
-                where_list.append(model_column == value)
-            else:
-                raise ModelColumnError(f'Model column {column} is not found')
-        return where_list
-
     def select_models(self) -> Sequence[Row | RowMapping | Any] | None:
         """
         Query all rows
@@ -246,8 +757,123 @@ class CRUDPlus(Generic[_Model]):
         :return:
         """
         session: Session = get_session()
-        query = session.execute(select(self.model))
-        return query.scalars().all()
+        stmt, params = self._select_statement({})
+        return session.execute(stmt, params).scalars().all()
+
+    def select_models_keyset(
+            self,
+            *,
+            cursor: str | None = None,
+            size: int = 50,
+            sort_column: str = 'id',
+            model_sort: Literal['asc', 'desc'] = 'asc',
+            fields: Sequence[str] | None = None,
+            **conditions,
+    ) -> KeysetSlice[_Model]:
+        """
+        Keyset (cursor) pagination, 每页都是一次索引范围扫描，与翻页深度无关
+
+        主键为 uuid7_hex 时按 id 排序即按创建时间排序；按其他列排序时该列必须有索引，并以 id 作为 tiebreaker
+
+        :param cursor: 上一次返回的 next_cursor / previous_cursor，为空时返回第一页
+        :param size:
+        :param sort_column:
+        :param model_sort:
+        :param fields: 只加载这些列，见 _load_options
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        session: Session = get_session()
+        stmt, columns, token = self._keyset_statement(cursor, size, sort_column, model_sort, conditions, fields)
+        rows = session.execute(stmt).scalars().all()
+        return self._keyset_slice(rows, size, columns, token)
+
+    def paginate_keyset(
+            self,
+            params: KeysetParams,
+            *,
+            sort_column: str = 'id',
+            model_sort: Literal['asc', 'desc'] = 'asc',
+            transformer: Callable[[_Model], Any] | None = None,
+            fields: Sequence[str] | None = None,
+            **conditions,
+    ) -> KeysetPage:
+        """
+        fastapi_pagination 形式的 keyset 分页
+
+        :param params:
+        :param sort_column:
+        :param model_sort:
+        :param transformer: 将 orm 实例转换为返回对象，如 ResourceDO.from_orm
+        :param fields:
+        :param conditions:
+        :return:
+        """
+        page = self.select_models_keyset(
+            cursor=params.cursor, size=params.size, sort_column=sort_column, model_sort=model_sort, fields=fields,
+            **conditions,
+        )
+        items = [transformer(i) for i in page.items] if transformer else page.items
+        return KeysetPage.create(items, params, next_=page.next_cursor, previous=page.previous_cursor)
+
+    def iter_models(
+            self,
+            *,
+            batch_size: int = DEFAULT_CHUNK_SIZE,
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            fields: Sequence[str] | None = None,
+            **conditions,
+    ) -> Iterator[_Model]:
+        """
+        Stream rows through a server-side cursor (pymysql SSCursor), batch_size rows are buffered at a time
+
+        session 的 identity map 是弱引用，调用方不持有的行在遍历过程中即可回收，内存占用与结果集大小无关；
+        遍历结束前该连接被游标占用，不要在同一个 session 上执行其他查询
+
+        :param batch_size:
+        :param expression:
+        :param fields: 只加载这些列，见 _load_options；deferred 列（如 text）需在此显式指定
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        session: Session = get_session()
+        stmt, params = self._select_statement(conditions, expression, fields=fields)
+        result = session.execute(stmt, params, execution_options={'yield_per': batch_size})
+        try:
+            for partition in result.scalars().partitions():
+                yield from partition
+        finally:
+            result.close()
+
+    def iter_entities(
+            self,
+            columns: list[str],
+            *,
+            batch_size: int = DEFAULT_CHUNK_SIZE,
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            **conditions,
+    ) -> Iterator[Row[Any]]:
+        """
+        Stream selected columns as Core rows through a server-side cursor, without hydrating orm instances
+
+        :param columns:
+        :param batch_size:
+        :param expression:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        if len(columns) == 0:
+            raise errors.NotFoundError(msg='no entities found in the query')
+        session: Session = get_session()
+        stmt, params = self._select_statement(conditions, expression, entities=columns)
+        result = session.execute(
+            stmt, params, execution_options={'stream_results': True, 'max_row_buffer': batch_size}
+        )
+        try:
+            for partition in result.partitions(batch_size):
+                yield from partition
+        finally:
+            result.close()
 
     def select_models_by_column(self, column: str, column_value: Any) -> Sequence[_Model]:
         """
@@ -259,12 +885,8 @@ class CRUDPlus(Generic[_Model]):
         :return:
         """
         session: Session = get_session()
-        if hasattr(self.model, column):
-            model_column = getattr(self.model, column)
-            query = session.execute(select(self.model).where(model_column == column_value))  # type: ignore
-            return query.scalars().all()
-        else:
-            raise ModelColumnError(f'Model column {column} is not found')
+        stmt, params = self._select_statement({column: column_value})
+        return session.execute(stmt, params).scalars().all()
 
     def select_models_order(
             self,
@@ -279,24 +901,28 @@ class CRUDPlus(Generic[_Model]):
         :param model_sort:
         :return:
         """
-        sort_list = []
         session: Session = get_session()
-        for column in columns:
-            if hasattr(self.model, column):
-                model_column = getattr(self.model, column)
-                sort_list.append(model_column)
-            else:
-                raise ModelColumnError(f'Model column {column} is not found')
-        match model_sort:
-            case 'default':
-                query = session.execute(select(self.model).order_by(*sort_list))
-            case 'asc':
-                query = session.execute(select(self.model).order_by(asc(*sort_list)))
-            case 'desc':
-                query = session.execute(select(self.model).order_by(desc(*sort_list)))
-            case _:
-                raise SelectExpressionError(f'select sort expression {model_sort} is not supported')
-        return query.scalars().all()
+        stmt, params = self._select_statement({}, order_by=columns, model_sort=model_sort)
+        return session.execute(stmt, params).scalars().all()
+
+    def _execute_update(
+            self, session: Session, conditions: dict[str, Any], values: dict[str, Any],
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+    ) -> int:
+        stmt, params = self._update_statement(conditions, values, expression)
+        result = session.execute(stmt, params)
+        self._synchronize(session, conditions, expression, values)
+        session.flush()
+        return result.rowcount  # type: ignore
+
+    def _execute_delete(
+            self, session: Session, conditions: dict[str, Any], expression: ExpressionLiteral = ExpressionLiteral.and_
+    ) -> int:
+        stmt, params = self._delete_statement(conditions, expression)
+        result = session.execute(stmt, params)
+        self._synchronize(session, conditions, expression, None)
+        session.flush()
+        return result.rowcount  # type: ignore
 
     def update_model(self, pk: str, obj: _UpdateSchema | dict[str, Any], **kwargs) -> int:
         """
@@ -315,14 +941,10 @@ class CRUDPlus(Generic[_Model]):
             instance_data = obj.model_dump(exclude_unset=True)
         if kwargs:
             instance_data.update(kwargs)
-        result = session.execute(
-            sa_update(self.model).where(
-                cast('ColumnElement[bool]', self.model.id == pk),
-            ).values(**instance_data)
-        )
-        session.flush()
-        log.info(f'update_model result.rowcount {result.rowcount}')
-        return result.rowcount  # type: ignore
+        self._invalidate(session, [pk])
+        rowcount = self._execute_update(session, {'id': pk}, instance_data)
+        log.info(f'update_model result.rowcount {rowcount}')
+        return rowcount
 
     def update_model_by_column(
             self, column: str, column_value: Any, obj: _UpdateSchema | dict[str, Any], **kwargs
@@ -344,18 +966,14 @@ class CRUDPlus(Generic[_Model]):
             instance_data = obj.model_dump(exclude_unset=True)
         if kwargs:
             instance_data.update(kwargs)
-        if hasattr(self.model, column):
-            model_column = getattr(self.model, column)
+        conditions = {column: column_value}
+        if column == 'id':
+            self._invalidate(session, [column_value])
         else:
-            raise ModelColumnError(f'Model column {column} is not found')
-        result = session.execute(
-            sa_update(self.model).where(
-                cast('ColumnElement[bool]', model_column == column_value)
-            ).values(**instance_data)
-        )
-        session.flush()
-        log.info(f'update_model_by_column result.rowcount {result.rowcount}')
-        return result.rowcount  # type: ignore
+            self._invalidate_where(session, conditions, ExpressionLiteral.and_)
+        rowcount = self._execute_update(session, conditions, instance_data)
+        log.info(f'update_model_by_column result.rowcount {rowcount}')
+        return rowcount
 
     def update_model_by_columns(
             self, obj: _UpdateSchema | dict[str, Any],
@@ -363,29 +981,14 @@ class CRUDPlus(Generic[_Model]):
             **conditions,
     ):
         session: Session = get_session()
-        where_list = self._get_where_conditions(conditions)
         if isinstance(obj, dict):
             instance_data = obj
         else:
             instance_data = obj.model_dump(exclude_unset=True)
-        match expression:
-            case ExpressionLiteral.and_:
-                result = session.execute(
-                    sa_update(self.model).where(
-                        and_(*where_list)
-                    ).values(**instance_data)
-                )
-            case ExpressionLiteral.or_:
-                result = session.execute(
-                    sa_update(self.model).where(
-                        or_(*where_list)
-                    ).values(**instance_data)
-                )
-            case _:
-                raise SelectExpressionError(f'sa_delete expression {expression} is not supported')
-        session.flush()
-        log.info(f'update_model_by_columns result.rowcount {result.rowcount}')
-        return result.rowcount  # type: ignore
+        self._invalidate_where(session, conditions, expression)
+        rowcount = self._execute_update(session, conditions, instance_data, expression)
+        log.info(f'update_model_by_columns result.rowcount {rowcount}')
+        return rowcount
 
     def delete_model(self, pk: str, **kwargs) -> int:
         """
@@ -397,21 +1000,13 @@ class CRUDPlus(Generic[_Model]):
         :return:
         """
         session: Session = get_session()
+        self._invalidate(session, [pk])
         if not kwargs:
-            result = session.execute(
-                sa_delete(self.model).where(
-                    cast('ColumnElement[bool]', self.model.id == pk)
-                )
-            )
+            rowcount = self._execute_delete(session, {'id': pk})
         else:
-            result = session.execute(
-                sa_update(self.model).where(
-                    cast("ColumnElement[bool]", self.model.id == pk)
-                ).values(**kwargs)
-            )
-        session.flush()
-        log.info(f'delete_model result.rowcount {result.rowcount}')
-        return result.rowcount  # type: ignore
+            rowcount = self._execute_update(session, {'id': pk}, kwargs)
+        log.info(f'delete_model result.rowcount {rowcount}')
+        return rowcount
 
     def delete_model_by_columns(
             self, expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
@@ -425,22 +1020,7 @@ class CRUDPlus(Generic[_Model]):
         :return:
         """
         session: Session = get_session()
-        where_list = self._get_where_conditions(conditions)
-        match expression:
-            case ExpressionLiteral.and_:
-                result = session.execute(
-                    sa_delete(self.model).where(
-                        and_(*where_list)
-                    )
-                )
-            case ExpressionLiteral.or_:
-                result = session.execute(
-                    sa_delete(self.model).where(
-                        or_(*where_list)
-                    )
-                )
-            case _:
-                raise SelectExpressionError(f'sa_delete expression {expression} is not supported')
-        session.flush()
-        log.info(f'delete_model_by_columns result.rowcount {result.rowcount}')
-        return result.rowcount  # type: ignore
+        self._invalidate_where(session, conditions, expression)
+        rowcount = self._execute_delete(session, conditions, expression)
+        log.info(f'delete_model_by_columns result.rowcount {rowcount}')
+        return rowcount
@@ -0,0 +1,564 @@
+from contextlib import aclosing
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Literal,
+    Sequence,
+)
+
+from sqlalchemy import Row, RowMapping, insert as sa_insert
+from sqlalchemy.exc import MultipleResultsFound, NoResultFound
+
+from common.exception import errors
+from common.log import log
+from libs.database.db_mysql import use_primary
+from libs.database.session import flush_deferred, get_async_session, has_writes
+from pkg.crud_plus.crud import (
+    DEFAULT_CHUNK_SIZE,
+    CRUDPlusBase,
+    ExpressionLiteral,
+    UpsertResult,
+    _chunked,
+    _CreateSchema,
+    _Model,
+    _UpdateSchema,
+    _UpsertSchema,
+)
+from pkg.crud_plus.error import ModelColumnError
+from pkg.crud_plus.keyset import KeysetPage, KeysetParams, KeysetSlice
+
+
+class AsyncCRUDPlus(CRUDPlusBase[_Model]):
+    """
+    CRUDPlus 的 asyncio 版本，方法与 CRUDPlus 一一对应，session 来自 get_async_session
+    """
+
+    async def create_model(self, obj: _CreateSchema | _Model, **kwargs) -> None:
+        """
+        Create a new instance of a model
+
+        :param obj:
+        :param kwargs:
+        :return:
+        """
+        session = get_async_session()
+        instance = self.do_to_model(obj, **kwargs)
+        session.add(instance)
+        if not flush_deferred():
+            await session.flush()
+        self._invalidate(session, [instance.id])
+
+    async def create_models(
+            self,
+            objs: Iterable[_CreateSchema | _Model],
+            *,
+            bulk: bool = False,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            return_pks: bool = False,
+    ) -> list[Any] | None:
+        """
+        Create new instances of a model
+
+        :param objs:
+        :param bulk:
+        :param chunk_size:
+        :param return_pks:
+        :return:
+        """
+        if bulk:
+            return await self.bulk_insert_models(objs, chunk_size=chunk_size, return_pks=return_pks)
+        session = get_async_session()
+        instance_list = [self.do_to_model(i) for i in objs]
+        session.add_all(instance_list)
+        if not flush_deferred():
+            await session.flush()
+        self._invalidate(session, [i.id for i in instance_list])
+        if return_pks:
+            return [i.id for i in instance_list]
+        return None
+
+    async def bulk_insert_models(
+            self,
+            objs: Iterable[_CreateSchema | _Model],
+            *,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+            return_pks: bool = False,
+    ) -> list[Any] | None:
+        """
+        Bulk insert instances of a model, bypassing the orm unit of work
+
+        :param objs:
+        :param chunk_size:
+        :param return_pks:
+        :return:
+        """
+        table = self.model.__table__  # type: ignore[attr-defined]
+        pk_key = self._column_keys['id']
+        rows = [self.do_to_params(i) for i in objs]
+        if return_pks and any(row.get(pk_key) is None for row in rows):
+            raise ModelColumnError(f'return_pks requires client-generated primary keys for {self.model.__name__}')
+        session = get_async_session()
+        for chunk in _chunked(rows, chunk_size):
+            await session.execute(sa_insert(table), chunk)
+        # 写入前可能有对这些主键的读取留下了负缓存
+        self._invalidate(session, [row.get(pk_key) for row in rows])
+        log.info(f'bulk_insert_models {self.model.__name__} rows {len(rows)}')
+        return [row[pk_key] for row in rows] if return_pks else None
+
+    async def upsert_model(self, obj: _UpsertSchema | _Model, **kwargs) -> None:
+        """
+        upsert a new instance of a model
+
+        :param obj:
+        :param kwargs:
+        :return:
+        """
+        session = get_async_session()
+        instance = self.do_to_model(obj, **kwargs)
+        instance = await session.merge(instance)
+        if not flush_deferred():
+            await session.flush()
+        self._invalidate(session, [instance.id])
+
+    async def upsert_models(
+            self,
+            objs: Iterable[_UpsertSchema | _Model],
+            *,
+            update_columns: Sequence[str] | None = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> UpsertResult:
+        """
+        Upsert instances of a model, one INSERT ... ON DUPLICATE KEY UPDATE per chunk
+
+        :param objs:
+        :param update_columns:
+        :param chunk_size:
+        :return:
+        """
+        session = get_async_session()
+        update_columns = self._upsert_update_columns(update_columns)
+        rows = [self.do_to_params(i) for i in objs]
+        pk_key = self._column_keys['id']
+        self._invalidate(session, [row[pk_key] for row in rows if row.get(pk_key) is not None])
+        result = UpsertResult()
+        for chunk in _chunked(rows, chunk_size):
+            pks = [row.get(pk_key) for row in chunk]
+            known = [pk for pk in pks if pk is not None]
+            existing = (await session.scalars(self._existing_pks_statement(known))).all() if known else []
+            await session.execute(self._upsert_statement(chunk, update_columns))
+            result.add(pks, existing)
+        log.info(f'upsert_models {self.model.__name__} inserted {result.inserted} updated {result.updated}')
+        return result
+
+    async def select_model_by_id(self, pk: str, *, fields: Sequence[str] | None = None) -> _Model | None:
+        """
+        Query by ID, 配置了 cache 时先读缓存，当前事务已有写入时直接查库，见 CRUDPlus.select_model_by_id
+
+        :param pk:
+        :param fields: 只加载这些列；asyncio 下不能隐式补查未加载的列，需要的 deferred 列必须列出
+        :return:
+        """
+        session = get_async_session()
+        if self.cache is None or not self._cacheable(fields) or has_writes(session.sync_session):
+            return await self._select_model_by_id(session, pk, fields)
+
+        async def load():
+            # 回源读主库，见 CRUDPlus.select_model_by_id
+            with use_primary():
+                return self._to_cache(await self._select_model_by_id(session, pk))
+
+        values = await self.cache.get_or_load_async(self._cache_key(pk), load)
+        if values is None:
+            return None
+        return await session.merge(self._from_cache(values), load=False)
+
+    async def _select_model_by_id(self, session, pk: str, fields: Sequence[str] | None = None) -> _Model | None:
+        stmt, params = self._select_statement({'id': pk}, fields=fields)
+        return (await session.execute(stmt, params)).scalars().first()
+
+    async def _invalidate_where(self, session, conditions: dict[str, Any], expression: ExpressionLiteral) -> None:
+        if self.cache is None:
+            return
+        stmt, params = self._pk_statement(conditions, expression)
+        with use_primary():
+            pks = (await session.execute(stmt, params)).scalars().all()
+        self._invalidate(session, pks)
+
+    async def select_model_by_column(
+            self, column: str, column_value: Any, *, fields: Sequence[str] | None = None
+    ) -> _Model | None:
+        """
+        Query by column
+
+        :param column:
+        :param column_value:
+        :param fields:
+        :return:
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement({column: column_value}, fields=fields)
+        return (await session.execute(stmt, params)).scalars().first()
+
+    async def select_one_model_by_column(self, column: str, column_value: Any) -> _Model:
+        """
+        Select a unique model instance by column.
+
+        :param column: The column to filter by.
+        :param column_value: The value to filter the column by.
+        :return: A unique model instance.
+        :raises NoResultFound: If no result is found.
+        :raises MultipleResultsFound: If multiple results are found.
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement({column: column_value})
+        query = await session.execute(stmt, params)
+        try:
+            return query.scalars().one()
+        except NoResultFound:
+            raise NoResultFound(f'No result found for {column} = {column_value}')
+        except MultipleResultsFound:
+            raise MultipleResultsFound(f'Multiple results found for {column} = {column_value}')
+
+    async def select_model_by_columns(
+            self, expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
+    ) -> _Model | None:
+        """
+        Query by columns
+
+        :param expression:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement(conditions, expression)
+        return (await session.execute(stmt, params)).scalars().first()
+
+    async def _execute_entity_query_by_columns(
+            self, columns: list[str], expression: ExpressionLiteral = ExpressionLiteral.and_,
+            **conditions):
+        if len(columns) == 0:
+            raise errors.NotFoundError(msg='no entities found in the query')
+        if 'id' not in columns:
+            columns.append('id')
+        session = get_async_session()
+        stmt, params = self._select_statement(conditions, expression, entities=columns)
+        return await session.execute(stmt, params)
+
+    async def select_entities_by_columns(
+            self, columns: list[str], expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
+    ) -> Sequence[Row[tuple[Any]]]:
+        """
+        Query entities by columns
+
+        :param columns:
+        :param expression:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        query = await self._execute_entity_query_by_columns(columns, expression, **conditions)
+        return query.fetchall()
+
+    async def select_entity_by_columns(
+            self, columns: list[str], expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
+    ) -> Row[Any] | None:
+        """
+        Query entity by columns
+
+        :param columns:
+        :param expression:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        query = await self._execute_entity_query_by_columns(columns, expression, **conditions)
+        return query.first()
+
+    async def select_models(self) -> Sequence[Row | RowMapping | Any] | None:
+        """
+        Query all rows
+
+        :return:
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement({})
+        return (await session.execute(stmt, params)).scalars().all()
+
+    async def select_models_keyset(
+            self,
+            *,
+            cursor: str | None = None,
+            size: int = 50,
+            sort_column: str = 'id',
+            model_sort: Literal['asc', 'desc'] = 'asc',
+            fields: Sequence[str] | None = None,
+            **conditions,
+    ) -> KeysetSlice[_Model]:
+        """
+        Keyset (cursor) pagination
+
+        :param cursor:
+        :param size:
+        :param sort_column:
+        :param model_sort:
+        :param fields:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        session = get_async_session()
+        stmt, columns, token = self._keyset_statement(cursor, size, sort_column, model_sort, conditions, fields)
+        rows = (await session.execute(stmt)).scalars().all()
+        return self._keyset_slice(rows, size, columns, token)
+
+    async def paginate_keyset(
+            self,
+            params: KeysetParams,
+            *,
+            sort_column: str = 'id',
+            model_sort: Literal['asc', 'desc'] = 'asc',
+            transformer: Callable[[_Model], Any] | None = None,
+            fields: Sequence[str] | None = None,
+            **conditions,
+    ) -> KeysetPage:
+        """
+        fastapi_pagination 形式的 keyset 分页
+
+        :param params:
+        :param sort_column:
+        :param model_sort:
+        :param transformer:
+        :param fields:
+        :param conditions:
+        :return:
+        """
+        page = await self.select_models_keyset(
+            cursor=params.cursor, size=params.size, sort_column=sort_column, model_sort=model_sort, fields=fields,
+            **conditions,
+        )
+        items = [transformer(i) for i in page.items] if transformer else page.items
+        return KeysetPage.create(items, params, next_=page.next_cursor, previous=page.previous_cursor)
+
+    async def iter_models(
+            self,
+            *,
+            batch_size: int = DEFAULT_CHUNK_SIZE,
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            fields: Sequence[str] | None = None,
+            **conditions,
+    ) -> AsyncIterator[_Model]:
+        """
+        Stream rows through a server-side cursor (aiomysql SSCursor)
+
+        :param batch_size:
+        :param expression:
+        :param fields: 只加载这些列，见 _load_options；deferred 列（如 text）需在此显式指定
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement(conditions, expression, fields=fields)
+        result = await session.stream(stmt, params, execution_options={'yield_per': batch_size})
+        try:
+            async for partition in result.scalars().partitions():
+                for row in partition:
+                    yield row
+        finally:
+            await result.close()
+
+    async def iter_entities(
+            self,
+            columns: list[str],
+            *,
+            batch_size: int = DEFAULT_CHUNK_SIZE,
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            **conditions,
+    ) -> AsyncIterator[Row[Any]]:
+        """
+        Stream selected columns as Core rows through a server-side cursor
+
+        :param columns:
+        :param batch_size:
+        :param expression:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        batches = self.iter_entity_batches(columns, batch_size=batch_size, expression=expression, **conditions)
+        # 提前结束遍历时立即关闭游标，而不是等待异步生成器被回收
+        async with aclosing(batches):
+            async for partition in batches:
+                for row in partition:
+                    yield row
+
+    async def iter_entity_batches(
+            self,
+            columns: list[str],
+            *,
+            batch_size: int = DEFAULT_CHUNK_SIZE,
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            **conditions,
+    ) -> AsyncGenerator[Sequence[Row[Any]], None]:
+        """
+        iter_entities 的按批版本，每次返回最多 batch_size 行，便于调用方按批编码；
+        调用方处理完一批才读取下一批，处理慢时游标停在服务端，内存占用与结果集大小无关
+
+        :param columns:
+        :param batch_size:
+        :param expression:
+        :param conditions: Query conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        if len(columns) == 0:
+            raise errors.NotFoundError(msg='no entities found in the query')
+        session = get_async_session()
+        stmt, params = self._select_statement(conditions, expression, entities=columns)
+        result = await session.stream(stmt, params, execution_options={'max_row_buffer': batch_size})
+        try:
+            async for partition in result.partitions(batch_size):
+                yield partition
+        finally:
+            await result.close()
+
+    async def select_models_by_column(self, column: str, column_value: Any) -> Sequence[_Model]:
+        """
+        Select Models by column
+
+        :param column:
+        :param column_value:
+        :return:
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement({column: column_value})
+        return (await session.execute(stmt, params)).scalars().all()
+
+    async def select_models_order(
+            self,
+            *columns,
+            model_sort: Literal['default', 'asc', 'desc'] = 'default',
+    ) -> Sequence[Row | RowMapping | Any] | None:
+        """
+        Query all rows asc or desc
+
+        :param columns:
+        :param model_sort:
+        :return:
+        """
+        session = get_async_session()
+        stmt, params = self._select_statement({}, order_by=columns, model_sort=model_sort)
+        return (await session.execute(stmt, params)).scalars().all()
+
+    async def _execute_update(
+            self, session, conditions: dict[str, Any], values: dict[str, Any],
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+    ) -> int:
+        stmt, params = self._update_statement(conditions, values, expression)
+        result = await session.execute(stmt, params)
+        self._synchronize(session, conditions, expression, values)
+        await session.flush()
+        return result.rowcount  # type: ignore[attr-defined]
+
+    async def _execute_delete(
+            self, session, conditions: dict[str, Any], expression: ExpressionLiteral = ExpressionLiteral.and_
+    ) -> int:
+        stmt, params = self._delete_statement(conditions, expression)
+        result = await session.execute(stmt, params)
+        self._synchronize(session, conditions, expression, None)
+        await session.flush()
+        return result.rowcount  # type: ignore[attr-defined]
+
+    async def update_model(self, pk: str, obj: _UpdateSchema | dict[str, Any], **kwargs) -> int:
+        """
+        Update an instance of model's primary key
+
+        :param pk:
+        :param obj:
+        :param kwargs:
+        :return:
+        """
+        session = get_async_session()
+        if isinstance(obj, dict):
+            instance_data = obj
+        else:
+            instance_data = obj.model_dump(exclude_unset=True)
+        if kwargs:
+            instance_data.update(kwargs)
+        self._invalidate(session, [pk])
+        rowcount = await self._execute_update(session, {'id': pk}, instance_data)
+        log.info(f'update_model result.rowcount {rowcount}')
+        return rowcount
+
+    async def update_model_by_column(
+            self, column: str, column_value: Any, obj: _UpdateSchema | dict[str, Any], **kwargs
+    ) -> int:
+        """
+        Update an instance of model column
+
+        :param column:
+        :param column_value:
+        :param obj:
+        :param kwargs:
+        :return:
+        """
+        session = get_async_session()
+        if isinstance(obj, dict):
+            instance_data = obj
+        else:
+            instance_data = obj.model_dump(exclude_unset=True)
+        if kwargs:
+            instance_data.update(kwargs)
+        conditions = {column: column_value}
+        if column == 'id':
+            self._invalidate(session, [column_value])
+        else:
+            await self._invalidate_where(session, conditions, ExpressionLiteral.and_)
+        rowcount = await self._execute_update(session, conditions, instance_data)
+        log.info(f'update_model_by_column result.rowcount {rowcount}')
+        return rowcount
+
+    async def update_model_by_columns(
+            self, obj: _UpdateSchema | dict[str, Any],
+            expression: ExpressionLiteral = ExpressionLiteral.and_,
+            **conditions,
+    ):
+        session = get_async_session()
+        if isinstance(obj, dict):
+            instance_data = obj
+        else:
+            instance_data = obj.model_dump(exclude_unset=True)
+        await self._invalidate_where(session, conditions, expression)
+        rowcount = await self._execute_update(session, conditions, instance_data, expression)
+        log.info(f'update_model_by_columns result.rowcount {rowcount}')
+        return rowcount
+
+    async def delete_model(self, pk: str, **kwargs) -> int:
+        """
+        Delete an instance of a model
+
+        :param pk:
+        :param kwargs: for soft deletion only
+        :return:
+        """
+        session = get_async_session()
+        self._invalidate(session, [pk])
+        if not kwargs:
+            rowcount = await self._execute_delete(session, {'id': pk})
+        else:
+            rowcount = await self._execute_update(session, {'id': pk}, kwargs)
+        log.info(f'delete_model result.rowcount {rowcount}')
+        return rowcount
+
+    async def delete_model_by_columns(
+            self, expression: ExpressionLiteral = ExpressionLiteral.and_, **conditions
+    ) -> int:
+        """
+        Delete by columns
+
+        :param expression:
+        :param conditions: Delete conditions, format：column1=value1, column2=value2
+        :return:
+        """
+        session = get_async_session()
+        await self._invalidate_where(session, conditions, expression)
+        rowcount = await self._execute_delete(session, conditions, expression)
+        log.info(f'delete_model_by_columns result.rowcount {rowcount}')
+        return rowcount
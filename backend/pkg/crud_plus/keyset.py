@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import binascii
+import dataclasses
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import Any, Generic, Sequence, TypeVar
+
+from fastapi import Query
+from pydantic import BaseModel, Field
+from sqlalchemy import Column, ColumnElement, and_, or_
+
+from common.exception import errors
+from fastapi_pagination.bases import AbstractPage, AbstractParams, CursorRawParams
+from msgspec import convert, json
+
+
+T = TypeVar('T')
+
+
+@dataclasses.dataclass
+class KeysetCursor:
+    """
+    游标解码后的内容：上一页边界行的排序键（排序列 + id）以及翻页方向
+    """
+
+    values: list[Any]
+    backwards: bool = False
+
+
+@dataclasses.dataclass
+class KeysetSlice(Generic[T]):
+    """keyset 分页的一页数据"""
+
+    items: list[T]
+    next_cursor: str | None = None
+    previous_cursor: str | None = None
+
+
+def encode_cursor(values: Sequence[Any], backwards: bool = False) -> str:
+    """
+    将排序键编码为不透明的游标
+
+    :param values:
+    :param backwards:
+    :return:
+    """
+    raw = json.encode([list(values), backwards])
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, columns: Sequence[Column]) -> KeysetCursor:
+    """
+    解码游标，并按排序列的类型还原排序键
+
+    :param cursor:
+    :param columns:
+    :return:
+    """
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values, backwards = json.decode(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        values = [_restore_value(v, c) for v, c in zip(values, columns)]
+    except (binascii.Error, ValueError, TypeError):
+        raise errors.RequestError(msg='非法的分页游标')
+    return KeysetCursor(values=values, backwards=bool(backwards))
+
+
+def _restore_value(value: Any, column: Column) -> Any:
+    if value is not None and issubclass(column.type.python_type, datetime):
+        return convert(value, datetime)
+    return value
+
+
+def keyset_condition(columns: Sequence[Column], values: Sequence[Any], ascending: bool) -> ColumnElement[bool]:
+    """
+    (c1, c2) > (v1, v2) 展开为 c1 > v1 OR (c1 = v1 AND c2 > v2)，
+    MySQL 对行构造器比较不一定能走索引范围扫描，展开后可以；
+    列不能为 NULL，否则排序列为 NULL 的行不满足任何一个分支而被跳过
+
+    :param columns:
+    :param values:
+    :param ascending:
+    :return:
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equals = [columns[j] == values[j] for j in range(i)]
+        bound = column > values[i] if ascending else column < values[i]
+        clauses.append(and_(*equals, bound))
+    return or_(*clauses)
+
+
+class KeysetParams(BaseModel, AbstractParams):
+    """
+    keyset 分页参数，游标由 encode_cursor 编码，本身即不透明字符串
+    """
+
+    cursor: str | None = Query(None, description='Cursor for the next or previous page')
+    size: int = Query(50, ge=1, le=100, description='Page size')
+
+    def to_raw_params(self) -> CursorRawParams:
+        return CursorRawParams(cursor=self.cursor, size=self.size)
+
+
+class KeysetPage(AbstractPage[T], Generic[T]):
+    """
+    keyset 分页结果，不统计 total，避免每页一次 COUNT(*)
+
+    E.g. ::
+
+        @router.get('')
+        def list_resources(params: Annotated[KeysetParams, Depends()]) -> ResponseModel:
+            return response_base.success(data=resource_dao.paginate_keyset(params))
+    """
+
+    items: Sequence[T]
+    next_page: str | None = Field(None, description='Cursor for the next page')
+    previous_page: str | None = Field(None, description='Cursor for the previous page')
+
+    __params_type__ = KeysetParams
+
+    @classmethod
+    def create(
+            cls,
+            items: Sequence[T],
+            params: AbstractParams,
+            *,
+            next_: str | None = None,
+            previous: str | None = None,
+            **kwargs: Any,
+    ) -> 'KeysetPage[T]':
+        return cls(items=items, next_page=next_, previous_page=previous)
@@ -0,0 +1,107 @@
+import asyncio
+import gzip
+import zlib
+
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.responses import PlainTextResponse, StreamingResponse
+
+from utils.compress import CompressionMiddleware, accepted_encodings, gzip_stream
+from utils.etag import etag_matches, make_etag
+
+
+BODY = 'x' * 4096
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get('/small')
+    def small():
+        return PlainTextResponse('x')
+
+    @app.get('/large')
+    def large():
+        return PlainTextResponse(BODY, headers={'ETag': '"v1"'})
+
+    @app.get('/stream')
+    def stream():
+        return StreamingResponse(iter([BODY.encode()] * 3), media_type='application/x-ndjson')
+
+    @app.get('/encoded')
+    def encoded():
+        return PlainTextResponse(gzip.compress(BODY.encode()), headers={'Content-Encoding': 'gzip'})
+
+    return TestClient(app)
+
+
+def test_accepted_encodings():
+    assert accepted_encodings('gzip, deflate, br;q=0.5, identity;q=0') == {'gzip', 'deflate', 'br'}
+    assert accepted_encodings('') == set()
+
+
+def test_compression_middleware():
+    client = _client()
+    headers = {'Accept-Encoding': 'gzip'}
+    assert 'content-encoding' not in client.get('/small', headers=headers).headers
+
+    response = client.get('/large', headers=headers)
+    assert response.headers['content-encoding'] == 'gzip'
+    assert int(response.headers['content-length']) < len(BODY)
+    assert response.headers['etag'] == 'W/"v1"'
+    assert response.text == BODY
+
+    response = client.get('/stream', headers=headers)
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'content-length' not in response.headers
+    assert response.text == BODY * 3
+
+    response = client.get('/encoded', headers=headers)
+    assert response.text == BODY
+
+    response = client.get('/large', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in response.headers
+    assert response.headers['etag'] == '"v1"'
+
+
+def test_streaming_chunks_are_flushed():
+    """流式响应的每一块压缩后都能立即解压出完整内容，不被压缩器缓冲"""
+    chunks = [b'{"id": 1}\n', b'{"id": 2}\n']
+    app = CompressionMiddleware(StreamingResponse(iter(chunks), media_type='application/x-ndjson'), minimum_size=1)
+    scope = {'type': 'http', 'method': 'GET', 'path': '/', 'headers': [(b'accept-encoding', b'gzip')]}
+    bodies = []
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            bodies.append(message['body'])
+
+    asyncio.run(app(scope, receive, send))
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert [decompressor.decompress(body) for body in bodies[:len(chunks)]] == chunks
+
+    async def compress():
+        async def source():
+            for chunk in chunks:
+                yield chunk
+        return [data async for data in gzip_stream(source())]
+
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    assert [decompressor.decompress(data) for data in asyncio.run(compress())[:len(chunks)]] == chunks
+
+
+def test_etag_matches():
+    etag = make_etag('r1', '2024-01-01 00:00:00')
+    assert etag != make_etag('r1', '2024-01-01 00:00:01')
+    # 同一秒内的两次更新
+    assert make_etag('r1', datetime(2024, 1, 1, 0, 0, 0, 1)) != make_etag('r1', datetime(2024, 1, 1, 0, 0, 0, 2))
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
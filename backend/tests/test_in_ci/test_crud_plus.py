@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+
+from app.crud.crud_resource import resource_dao
+from app.do.resource import RESOURCE_META_FIELDS, ResourceDO
+from app.do.task import TaskDO
+from app.model.resource_model import ResourceModel
+from app.model.task_model import TaskModel
+from common.enum.resource import ResourceType
+import pkg.crud_plus.crud as crud_module
+
+from pkg.crud_plus.cache import EntityCache
+from pkg.crud_plus.crud import CRUDPlus
+from pkg.crud_plus.error import ModelColumnError, SelectExpressionError
+
+
+dao = CRUDPlus(ResourceModel)
+
+
+def test_do_to_params_from_do():
+    do = ResourceDO(name='a', extension='mp3', storage_url='/a', type=ResourceType.AUDIO)
+    params = dao.do_to_params(do, text='t')
+    assert params['id'] == do.id
+    assert params['text'] == 't'
+    assert set(params) == set(ResourceModel.__table__.columns.keys())
+
+
+def test_do_to_params_fills_dataclass_defaults():
+    model = ResourceModel(name='a', type='audio', extension='mp3', storage_url='/a')
+    params = dao.do_to_params(model)
+    assert params['id'] == model.id
+    assert params['queue'] == 'default'
+    assert params['create_time'] is not None
+
+
+def test_upsert_models_refreshes_onupdate_columns():
+    assert set(dao._onupdate_values()) == {'update_time'}
+
+
+def test_upsert_models_rejects_unknown_update_column():
+    with pytest.raises(ModelColumnError):
+        dao.upsert_models([], update_columns=['not_a_column'])
+
+
+class _UpsertSession:
+    """记录 upsert_models 发出的语句，existing 为库中已存在的主键"""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.statements = []
+
+    def scalars(self, statement):
+        self.statements.append(statement)
+        pks = statement.compile().params.values()
+        return SimpleNamespace(all=lambda: [pk for values in pks for pk in values if pk in self.existing])
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+
+def test_upsert_models_counts_and_statement(monkeypatch):
+    dos = [ResourceDO(name=n, extension='mp3', storage_url='/a', type=ResourceType.AUDIO) for n in 'abc']
+    session = _UpsertSession({dos[0].id})
+    monkeypatch.setattr(crud_module, 'get_session', lambda: session)
+    # a 已存在；b 在同一批中出现两次，后一行是更新
+    result = dao.upsert_models([*dos, dos[1]], update_columns=['name'])
+    assert (result.inserted, result.updated) == (2, 2)
+
+    lock, upsert = (str(s.compile(dialect=mysql.dialect())) for s in session.statements[:2])
+    assert lock.endswith('FOR UPDATE')
+    assert 'ON DUPLICATE KEY UPDATE name = VALUES(name), update_time = %s' in upsert
+    assert 'create_time = ' not in upsert.split('ON DUPLICATE KEY UPDATE')[1]
+
+
+def test_text_is_deferred_unless_requested():
+    default = str(select(ResourceModel))
+    assert 'resource.text,' not in default
+    projected = str(select(ResourceModel).options(*dao._load_options(['name', 'text'])))
+    assert 'resource.text ' in projected
+    assert 'resource.queue' not in projected
+
+
+def test_load_options_rejects_unknown_field():
+    with pytest.raises(ModelColumnError):
+        dao._load_options(['not_a_column'])
+
+
+def test_meta_fields_hit_cache():
+    assert resource_dao._cacheable(RESOURCE_META_FIELDS)
+    assert not resource_dao._cacheable((*RESOURCE_META_FIELDS, 'text'))
+
+
+class _WroteSession:
+    """已在当前事务内写入的 session，查询返回一个未提交的新值"""
+
+    def __init__(self, model):
+        self.info = {'wrote': True}
+        self.new = self.dirty = self.deleted = ()
+        self.model = model
+
+    def execute(self, statement, params=None):
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(first=lambda: self.model))
+
+
+def test_select_by_id_skips_cache_after_write(monkeypatch):
+    cached = CRUDPlus(ResourceModel, cache=EntityCache())
+    model = ResourceModel(name='uncommitted', type='audio', extension='mp3', storage_url='/a')
+    monkeypatch.setattr(crud_module, 'get_session', lambda: _WroteSession(model))
+    assert cached.select_model_by_id(model.id) is model
+    assert cached.cache.get(cached._cache_key(model.id)) == (False, None)
+
+
+def test_keyset_rejects_nullable_sort_column():
+    assert dao._keyset_columns('name')[1].key == 'id'
+    with pytest.raises(SelectExpressionError, match='nullable'):
+        dao._keyset_columns('parent_id')
+
+
+def test_bulk_insert_rejects_return_pks_for_autoincrement():
+    # 自增主键无法由 lastrowid 推算，不返回可能错误的 id
+    with pytest.raises(ModelColumnError, match='client-generated'):
+        CRUDPlus(TaskModel).create_models([TaskDO(resource_id='r', type='stt')], bulk=True, return_pks=True)
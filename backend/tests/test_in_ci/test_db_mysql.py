@@ -0,0 +1,94 @@
+import asyncio
+
+from types import SimpleNamespace
+
+import pytest
+
+from sqlalchemy import create_engine, exc, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from libs.database.db_mysql import HealthySession, _handle_error
+from libs.database.db_mysql_async import AsyncRoutingSession, HealthyAsyncSession
+
+
+def _context(code: int, is_disconnect: bool = False):
+    return SimpleNamespace(
+        original_exception=Exception(code, 'error'),
+        is_disconnect=is_disconnect,
+        invalidate_pool_on_disconnect=True,
+    )
+
+
+def test_handle_error_marks_disconnect_codes():
+    context = _context(2013)
+    _handle_error(context)
+    assert context.is_disconnect
+    assert not context.invalidate_pool_on_disconnect
+
+    context = _context(1062)
+    _handle_error(context)
+    assert not context.is_disconnect
+    assert context.invalidate_pool_on_disconnect
+
+
+def _flaky_session(monkeypatch, failures: int) -> tuple[HealthySession, list]:
+    session = HealthySession(bind=create_engine('sqlite://'))
+    calls = []
+    execute = HealthySession.__mro__[1].execute
+
+    def flaky(self, statement, *args, **kwargs):
+        calls.append(statement)
+        if len(calls) <= failures:
+            raise exc.OperationalError('select', {}, Exception(2013, 'Lost connection'), connection_invalidated=True)
+        return execute(self, statement, *args, **kwargs)
+
+    monkeypatch.setattr(HealthySession.__mro__[1], 'execute', flaky)
+    monkeypatch.setattr('libs.database.db_mysql.time.sleep', lambda _: None)
+    return session, calls
+
+
+def test_read_retried_on_invalidated_connection(monkeypatch):
+    session, calls = _flaky_session(monkeypatch, failures=2)
+    assert session.execute(select(text('1'))).scalar() == 1
+    assert len(calls) == 3
+
+
+def test_write_not_retried(monkeypatch):
+    session, calls = _flaky_session(monkeypatch, failures=1)
+    with pytest.raises(exc.OperationalError):
+        session.execute(text('update t set a = 1'))
+    assert len(calls) == 1
+
+
+def test_autocommit_session_retries_after_autobegin(monkeypatch):
+    session, calls = _flaky_session(monkeypatch, failures=0)
+    session.bind = session.bind.execution_options(isolation_level='AUTOCOMMIT')
+    session.execute(select(text('1')))
+    # 长期存活的自动提交 session：autobegin 后 in_transaction() 为 True，读仍可重试
+    assert session.in_transaction()
+    calls.clear()
+    calls.extend([None, None])
+    monkeypatch.setattr('libs.database.db_mysql.time.sleep', lambda _: None)
+    assert session.execute(select(text('1'))).scalar() == 1
+
+
+def test_async_session_retries_without_blocking(monkeypatch):
+    _, calls = _flaky_session(monkeypatch, failures=2)
+
+    def blocking_sleep(_):
+        raise AssertionError('time.sleep in event loop')
+
+    async def sleep(_):
+        pass
+
+    monkeypatch.setattr('libs.database.db_mysql.time.sleep', blocking_sleep)
+    monkeypatch.setattr('libs.database.db_mysql_async.asyncio.sleep', sleep)
+
+    async def main():
+        engine = create_async_engine('sqlite+aiosqlite://')
+        async with HealthyAsyncSession(engine, sync_session_class=AsyncRoutingSession) as session:
+            assert (await session.execute(select(text('1')))).scalar() == 1
+        await engine.dispose()
+
+    asyncio.run(main())
+    assert len(calls) == 3
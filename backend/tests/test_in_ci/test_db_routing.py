@@ -0,0 +1,44 @@
+from sqlalchemy import create_engine, select, text
+
+from libs.database.db_mysql import ReplicaPool, RoutingSession, use_primary
+
+
+class _Session(RoutingSession):
+    replicas = ReplicaPool([])
+
+
+def _session() -> tuple[RoutingSession, object, list]:
+    primary = create_engine('sqlite://')
+    replicas = [create_engine('sqlite://'), create_engine('sqlite://')]
+    _Session.replicas = ReplicaPool(replicas)
+    return _Session(bind=primary), primary, replicas
+
+
+def test_reads_round_robin_over_replicas():
+    session, primary, replicas = _session()
+    binds = [session.get_bind(clause=select(text('1'))) for _ in range(4)]
+    assert binds == replicas * 2
+    assert primary not in binds
+
+
+def test_select_for_update_goes_to_primary():
+    session, primary, _ = _session()
+    assert session.get_bind(clause=select(text('1')).with_for_update(skip_locked=True)) is primary
+
+
+def test_writes_pin_transaction_to_primary():
+    session, primary, _ = _session()
+    session.execute(text('create table t (a int)'))
+    assert session.get_bind(clause=select(text('1'))) is primary
+    session.rollback()
+    assert session.get_bind(clause=select(text('1'))) is not primary
+
+
+def test_use_primary_and_ejection():
+    session, primary, replicas = _session()
+    with use_primary():
+        assert session.get_bind(clause=select(text('1'))) is primary
+    _Session.replicas.eject(replicas[0])
+    assert {session.get_bind(clause=select(text('1'))) for _ in range(3)} == {replicas[1]}
+    _Session.replicas.eject(replicas[1])
+    assert session.get_bind(clause=select(text('1'))) is primary
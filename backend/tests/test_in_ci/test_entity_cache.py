@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+from pkg.crud_plus.cache import CacheBackend, EntityCache
+
+
+class DictBackend(CacheBackend):
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_lru_eviction_and_ttl():
+    cache = EntityCache(maxsize=2, ttl=60, negative_ttl=0.01)
+    cache.set('a', {'id': 'a'})
+    cache.set('b', {'id': 'b'})
+    cache.get('a')
+    cache.set('c', {'id': 'c'})
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, {'id': 'a'})
+    assert cache.stats.evictions == 1
+
+    cache.set('missing', None)
+    assert cache.get('missing') == (True, None)
+    time.sleep(0.02)
+    assert cache.get('missing') == (False, None)
+
+
+def test_get_or_load_single_flight():
+    cache = EntityCache()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return {'id': 'x'}
+
+    threads = [threading.Thread(target=cache.get_or_load, args=('x', loader)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+    assert cache.stats.loads == 1
+
+
+def test_second_tier_and_invalidate():
+    backend = DictBackend()
+    EntityCache(backend=backend).set('k', {'id': 'k'})
+    other = EntityCache(backend=backend)
+    assert other.get('k') == (True, {'id': 'k'})
+    other.invalidate(['k'])
+    assert 'k' not in backend.data
+    assert other.get('k') == (False, None)
+
+
+def test_get_or_load_async_cancelled_loader_does_not_cancel_waiters():
+    cache = EntityCache()
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return {'id': 'x'}
+
+    async def main():
+        first = asyncio.create_task(cache.get_or_load_async('x', loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load_async('x', loader))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await waiter == {'id': 'x'}
+        assert first.cancelled()
+
+    asyncio.run(main())
+    assert len(loads) == 2
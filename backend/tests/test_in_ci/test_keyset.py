@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy.dialects import mysql
+
+from app.model.resource_model import ResourceModel
+from common.exception.errors import RequestError
+from pkg.crud_plus.keyset import decode_cursor, encode_cursor, keyset_condition
+
+
+table = ResourceModel.__table__
+
+
+def test_cursor_round_trip():
+    now = datetime(2024, 1, 1, 12, 30, 15, 123000)
+    columns = [table.c.create_time, table.c.id]
+    cursor = encode_cursor([now, 'abc'], backwards=True)
+    token = decode_cursor(cursor, columns)
+    assert token.values == [now, 'abc']
+    assert token.backwards is True
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor(['a', 'b'])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(RequestError):
+        decode_cursor(cursor, [table.c.id])
+
+
+def test_keyset_condition_expands_row_comparison():
+    condition = keyset_condition([table.c.name, table.c.id], ['n', 'i'], ascending=False)
+    sql = str(condition.compile(dialect=mysql.dialect()))
+    assert sql == 'resource.name < %s OR resource.name = %s AND resource.id < %s'
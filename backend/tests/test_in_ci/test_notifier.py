@@ -0,0 +1,62 @@
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from libs.notifier import LocalNotifier, LocalPubSub, PubSubNotifier, SocketNotifier, notify_on_commit
+
+
+def test_local_notifier():
+    notifier = LocalNotifier()
+    assert notifier.wait(0.01) is False
+    notifier.notify()
+    notifier.notify()
+    assert notifier.wait(0.01) is True
+    assert notifier.wait(0.01) is False
+
+
+def test_local_notifier_keeps_notify_after_timeout():
+    class _Event(threading.Event):
+        def wait(self, timeout=None):
+            notified = super().wait(timeout)
+            # 超时返回之后、wait 处理返回值之前，另一个线程 notify
+            self.set()
+            return notified
+
+    notifier = LocalNotifier()
+    notifier._event = _Event()
+    assert notifier.wait(0.01) is False
+    assert notifier.wait(0.01) is True
+
+
+def test_socket_notifier_across_instances(tmp_path):
+    receiver, sender = SocketNotifier(str(tmp_path)), SocketNotifier(str(tmp_path))
+    assert receiver.wait(0.01) is False
+    threading.Timer(0.05, sender.notify).start()
+    assert receiver.wait(5) is True
+    assert receiver.wait(0.01) is False
+
+
+def test_pubsub_notifier():
+    hub = LocalPubSub()
+    receiver, sender = PubSubNotifier(hub, 'task'), PubSubNotifier(hub, 'task')
+    assert receiver.wait(0.01) is False
+    sender.notify()
+    sender.notify()
+    assert receiver.wait(0.01) is True
+    assert receiver.wait(0.01) is False
+
+
+def test_notify_on_commit():
+    notifier = LocalNotifier()
+    session = Session(create_engine('sqlite://'))
+    session.execute(text('select 1'))
+    notify_on_commit(session, notifier)
+    assert notifier.wait(0) is False
+    session.rollback()
+    assert notifier.wait(0) is False
+
+    session.execute(text('select 1'))
+    notify_on_commit(session, notifier)
+    session.commit()
+    assert notifier.wait(0) is True
@@ -0,0 +1,98 @@
+import pytest
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import libs.database.session as session_module
+from libs.database.db_mysql import ReplicaPool, RoutingSession
+from libs.database.session import RequestSessionMiddleware, get_session, read_only
+
+
+class _Session(RoutingSession):
+    replicas = ReplicaPool([])
+
+
+@pytest.fixture
+def counters(monkeypatch):
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    with engine.begin() as conn:
+        conn.execute(text('create table t (a int)'))
+    autocommit_engine = engine.execution_options(isolation_level='AUTOCOMMIT')
+    monkeypatch.setattr(session_module, 'db_session', sessionmaker(bind=engine, class_=_Session))
+    monkeypatch.setattr(session_module, 'db_session_auto', sessionmaker(bind=autocommit_engine, class_=_Session))
+
+    counts = {'checkout': 0, 'commit': 0, 'autocommit': 0}
+
+    def on_checkout(*args):
+        counts['checkout'] += 1
+
+    def on_commit(conn):
+        counts['commit'] += 1
+
+    def on_execute(conn, *args):
+        if conn.get_execution_options().get('isolation_level') == 'AUTOCOMMIT':
+            counts['autocommit'] += 1
+
+    event.listen(engine.pool, 'checkout', on_checkout)
+    event.listen(engine, 'commit', on_commit)
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    return counts
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(RequestSessionMiddleware)
+
+    @app.get('/health')
+    def health():
+        return {}
+
+    @app.get('/read')
+    def read():
+        return {'count': get_session().scalar(select(text('count(*)')).select_from(text('t')))}
+
+    @app.get('/read_only', dependencies=[Depends(read_only)])
+    def read_only_route():
+        return {'count': get_session().scalar(select(text('count(*)')).select_from(text('t')))}
+
+    @app.post('/write')
+    def write():
+        get_session().execute(text('insert into t (a) values (1)'))
+        return {}
+
+    @app.post('/fail')
+    def fail():
+        get_session().execute(text('insert into t (a) values (2)'))
+        raise RuntimeError
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_request_session_is_lazy_and_commits_only_writes(counters):
+    client = _client()
+    client.get('/health')
+    assert counters == {'checkout': 0, 'commit': 0, 'autocommit': 0}
+
+    client.get('/read')
+    assert counters['checkout'] == 1
+    assert counters['commit'] == 0
+
+    assert client.post('/write').status_code == 200
+    assert counters['checkout'] == 2
+    assert counters['commit'] == 1
+
+    assert client.post('/fail').status_code == 500
+    assert counters['commit'] == 1
+    assert client.get('/read').json() == {'count': 1}
+
+    client.get('/read_only')
+    assert counters['autocommit'] == 1
+    assert counters['commit'] == 1
+    assert client.get('/read_only').json() == {'count': 1}
+
+
+def test_get_session_outside_request_uses_worker_session():
+    assert get_session() is session_module.worker_session_auto()
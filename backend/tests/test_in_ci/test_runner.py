@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+import app.task.task_worker as task_worker
+
+from app.do.resource import ResourceDO
+from app.task.task_worker import run_task
+from common.enum.resource import ResourceType
+from common.enum.task import TaskStatus, TaskType
+from core.base import RUNNERS, BaseRunner, register_runner
+from core.storage import LocalOutputStorage
+
+
+RESOURCE = ResourceDO(name='a', extension='mp3', storage_url='/a', type=ResourceType.AUDIO)
+
+
+class StreamRunner(BaseRunner):
+    setups = 0
+
+    def setup(self):
+        StreamRunner.setups += 1
+
+    def run(self, resource):
+        if resource.name == 'bad':
+            yield 'partial'
+            raise RuntimeError('boom')
+        for i in range(3):
+            yield f'{resource.id}-{i}\n'
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalOutputStorage(str(tmp_path))
+    monkeypatch.setattr(task_worker, 'output_storage', storage)
+    register_runner(TaskType.STT)(StreamRunner)
+    yield storage
+    RUNNERS.pop(TaskType.STT.value)
+
+
+def test_streamed_output_and_warm_runner(storage):
+    first = run_task(StreamRunner, RESOURCE)
+    assert first.status == TaskStatus.SUCCESS.value
+    assert first.output_url == storage.url_for(RESOURCE.id, 'stt')
+    with open(first.output_url.removeprefix('file://')) as f:
+        assert f.read() == ''.join(f'{RESOURCE.id}-{i}\n' for i in range(3))
+    run_task(StreamRunner, RESOURCE)
+    assert StreamRunner.setups == 1
+
+
+def test_failed_output_is_discarded(storage):
+    bad = RESOURCE.model_copy(update={'name': 'bad'})
+    outcome = run_task(StreamRunner, bad)
+    assert outcome == (TaskStatus.FAILED.value, 'boom', None)
+    assert not os.listdir(os.path.join(storage.root, bad.id))
+
+
+def test_duplicate_registration_is_rejected(storage):
+    with pytest.raises(ValueError):
+        register_runner(TaskType.STT)(type('OtherRunner', (BaseRunner,), {}))
@@ -0,0 +1,76 @@
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Numeric, String, column
+
+from app.do.resource import ResourceDO
+from app.model.resource_model import ResourceModel
+from common.enum.resource import ResourceType
+from common.response.response_schema import ResponseModel, response_base
+from utils.serializers import (
+    MsgSpecJSONResponse,
+    MsgSpecRoute,
+    RowSerializer,
+    pydantic_struct,
+    select_as_dict,
+    select_list_serialize,
+)
+
+
+def _resource() -> ResourceModel:
+    resource = ResourceModel(id='r1', parent_id=None, queue='q', name='n', type='audio', extension='mp3',
+                             meta_data={'duration': 1}, storage_url='/s', config={}, text='t', text_url=None)
+    resource.create_time = datetime(2024, 1, 1, 12, 30, 15, 123)
+    resource.update_time = datetime(2024, 1, 2)
+    return resource
+
+
+def test_pydantic_struct_mirrors_fields():
+    struct = pydantic_struct(ResourceDO)
+    assert struct.__struct_fields__ == tuple(ResourceDO.model_fields)
+    assert pydantic_struct(ResourceDO) is struct
+    item = ResourceDO.struct_from_orm(_resource())
+    assert item.type is ResourceType.AUDIO
+    assert type(item.meta_data).__name__ == 'ResourceMetadataStruct'
+
+
+def test_msgspec_route_matches_response_model():
+    """MsgSpecRoute 跳过 response_model 校验后，返回的 JSON 与原路径一致"""
+    fast, slow = APIRouter(route_class=MsgSpecRoute), APIRouter()
+
+    @fast.get('/fast', status_code=201)
+    async def get_fast() -> ResponseModel:
+        return response_base.success(data=ResourceDO.struct_from_orm(_resource()))
+
+    @slow.get('/slow')
+    async def get_slow() -> ResponseModel:
+        return response_base.success(data=ResourceDO.from_orm(_resource()))
+
+    app = FastAPI(default_response_class=MsgSpecJSONResponse)
+    app.include_router(fast)
+    app.include_router(slow)
+    client = TestClient(app)
+    response = client.get('/fast')
+    assert response.status_code == 201
+    assert response.json() == client.get('/slow').json()
+    assert response.json()['data']['create_time'] == '2024-01-01T12:30:15.000123'
+    schema = app.openapi()['paths']['/fast']['get']['responses']['201']
+    assert schema['content']['application/json']['schema'] == {'$ref': '#/components/schemas/ResponseModel'}
+
+
+def test_select_list_serialize():
+    rows = [_resource(), _resource()]
+    keys = ResourceModel.__table__.columns.keys()
+    assert select_list_serialize(rows) == [{k: getattr(r, k) for k in keys} for r in rows]
+    assert select_list_serialize([]) == []
+    assert select_as_dict(rows[0], use_alias=True)['storage_url'] == '/s'
+
+
+def test_row_serializer_converts_decimal_columns():
+    serializer = RowSerializer.for_columns([column('name', String()), column('price', Numeric(10, 2))])
+    rows = [('a', Decimal('1.50')), ('b', Decimal('2')), ('c', None)]
+    assert serializer.serialize_all(rows) == [
+        {'name': 'a', 'price': 1.5}, {'name': 'b', 'price': 2}, {'name': 'c', 'price': None}
+    ]
@@ -0,0 +1,19 @@
+import pytest
+
+from app.crud.crud_task import _check_acyclic
+from app.do.resource import ResourceDO
+from app.service.resource_service import _task_graph
+from common.enum.resource import ResourceType
+
+
+def test_video_stt_waits_for_v2a():
+    resource = ResourceDO(name='v', extension='mp4', storage_url='/v', type=ResourceType.VIDEO)
+    tasks, upstreams = _task_graph(resource, offset=3)
+    types = [t.type for t in tasks]
+    assert upstreams == {3 + types.index('stt'): [3 + types.index('v2a')]}
+
+
+def test_cycle_is_rejected():
+    _check_acyclic(3, {2: [0, 1], 1: [0]})
+    with pytest.raises(ValueError):
+        _check_acyclic(3, {0: [2], 1: [0], 2: [1]})
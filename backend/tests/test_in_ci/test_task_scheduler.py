@@ -0,0 +1,75 @@
+from collections import Counter
+
+import app.task.task_scheduler as task_scheduler_module
+
+from app.do.task import TaskDO
+from app.task.task_scheduler import TaskScheduler
+
+
+class FakeTaskDao:
+    def __init__(self, ready: dict[tuple[str, str], int]):
+        self.ready = dict(ready)
+        self.next_id = 0
+        self.counts = 0
+
+    def count_ready(self):
+        self.counts += 1
+        return {k: n for k, n in self.ready.items() if n}
+
+    def claim(self, owner, limit, queues, types):
+        key = (queues[0], types[0])
+        n = min(limit, self.ready.get(key, 0))
+        self.ready[key] -= n
+        self.next_id += n
+        return [TaskDO(id=self.next_id - i, resource_id='r', queue=key[0], type=key[1], lease_owner=owner)
+                for i in range(n)]
+
+
+def _schedule(monkeypatch, ready, **kwargs) -> tuple[TaskScheduler, list[TaskDO]]:
+    monkeypatch.setattr(task_scheduler_module, 'task_dao', FakeTaskDao(ready))
+    scheduler = TaskScheduler(**{'weights': {}, 'queue_limits': {}, 'type_limits': {}, **kwargs})
+    return scheduler, scheduler.schedule()
+
+
+def test_weighted_round_robin(monkeypatch):
+    _, tasks = _schedule(monkeypatch, {('a', 'stt'): 100, ('b', 'stt'): 100}, concurrency=8, weights={'a': 3})
+    assert Counter(t.queue for t in tasks) == {'a': 6, 'b': 2}
+
+
+def test_type_and_queue_limits(monkeypatch):
+    scheduler, tasks = _schedule(monkeypatch, {('a', 'vfe'): 10, ('a', 'stt'): 10, ('b', 'stt'): 10},
+                                 concurrency=10, queue_limits={'b': 2}, type_limits={'vfe': 1})
+    assert Counter((t.queue, t.type) for t in tasks) == {('a', 'vfe'): 1, ('a', 'stt'): 7, ('b', 'stt'): 2}
+    assert scheduler.free == 0
+    assert scheduler.schedule() == []
+
+    vfe = next(t for t in tasks if t.type == 'vfe')
+    scheduler.release(vfe)
+    assert scheduler.wait_released(0)
+    # b 已达队列上限，空出的位置只能给 a
+    assert [t.queue for t in scheduler.schedule()] == ['a']
+    metrics = scheduler.metrics()
+    assert metrics['types']['vfe']['limit'] == 1
+    assert metrics['types']['vfe']['running'] <= 1
+    assert metrics['queues']['b'] == dict(depth=8, running=2, claimed=2, weight=1, limit=2)
+    assert scheduler.backlog
+
+
+def test_only_registered_types_are_claimed(monkeypatch):
+    scheduler, tasks = _schedule(monkeypatch, {('a', 'stt'): 5, ('a', 'ocr'): 5}, concurrency=10, types={'stt'})
+    assert Counter(t.type for t in tasks) == {'stt': 5}
+    assert not scheduler.backlog
+
+
+def test_throttled_depths_are_not_recounted(monkeypatch):
+    scheduler, tasks = _schedule(monkeypatch, {('a', 'stt'): 10}, concurrency=10, queue_limits={'a': 2})
+    assert len(tasks) == 2
+    assert scheduler.backlog
+    scheduler.release(tasks[0])
+    assert [t.queue for t in scheduler.schedule()] == ['a']
+    assert task_scheduler_module.task_dao.counts == 1
+
+    scheduler.depth_refresh = 0
+    scheduler.release(tasks[1])
+    assert [t.queue for t in scheduler.schedule()] == ['a']
+    assert task_scheduler_module.task_dao.counts == 2
@@ -0,0 +1,70 @@
+import asyncio
+import statistics
+import time
+
+import httpx
+import pytest
+
+from fastapi import FastAPI
+
+from app.crud.crud_resource import resource_async_dao, resource_dao
+from app.crud.crud_task import task_async_dao
+from app.do.resource import ResourceDO
+from app.schema.resource_schema import CreateResourceRequest
+from app.service.resource_service import resource_service
+from common.enum.resource import ResourceType
+from libs.database.session import RequestSessionMiddleware
+
+
+CONCURRENCY = 50
+REQUESTS = 2000
+QUEUE = 'bench_async_latency'
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestSessionMiddleware)
+
+    @app.get('/sync/{id}')
+    async def get_sync(id: str):
+        # 旧路径：async 路由里直接调用同步 CRUDPlus，阻塞事件循环
+        return ResourceDO.from_orm(resource_dao.select_model_by_column('id', id))
+
+    @app.get('/async/{id}')
+    async def get_async(id: str):
+        return await resource_service.get(id=id)
+
+    return app
+
+
+async def _load(client: httpx.AsyncClient, url: str) -> list[float]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies: list[float] = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+
+    await asyncio.gather(*[one() for _ in range(REQUESTS)])
+    return latencies
+
+
+@pytest.mark.asyncio
+async def test_bench_async_latency():
+    """并发下对比同步与 asyncio 路径的 p50 / p99 延迟，需要本地 mysql"""
+    request = CreateResourceRequest(name='bench', queue=QUEUE, extension='mp3', storage_url='/bench',
+                                    type=ResourceType.AUDIO)
+    await resource_service.create(request)
+    transport = httpx.ASGITransport(app=_app())
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for path in ('sync', 'async'):
+                latencies = await _load(client, f'/{path}/{request.id}')
+                p99 = statistics.quantiles(latencies, n=100)[98]
+                print(f'{path:>5}: p50 {statistics.median(latencies):.1f}ms p99 {p99:.1f}ms')
+    finally:
+        await resource_async_dao.delete_model_by_columns(queue=QUEUE)
+        await task_async_dao.delete_model_by_columns(queue=QUEUE)
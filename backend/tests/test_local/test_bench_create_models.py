@@ -0,0 +1,38 @@
+import time
+
+from app.crud.crud_resource import resource_dao
+from app.do.resource import ResourceDO
+from common.enum.resource import ResourceType
+
+
+ROWS = 20000
+QUEUE = 'bench_create_models'
+
+
+def _resources():
+    return [
+        ResourceDO(name=f'bench-{i}', queue=QUEUE, extension='mp3', storage_url='/bench', type=ResourceType.AUDIO)
+        for i in range(ROWS)
+    ]
+
+
+def test_bench_create_models():
+    """对比 orm add_all 与 bulk 写入的 rows/sec，需要本地 mysql"""
+    try:
+        objs = _resources()
+        start = time.perf_counter()
+        resource_dao.create_models(objs)
+        orm_cost = time.perf_counter() - start
+        resource_dao.delete_model_by_columns(queue=QUEUE)
+
+        objs = _resources()
+        start = time.perf_counter()
+        pks = resource_dao.create_models(objs, bulk=True, return_pks=True)
+        bulk_cost = time.perf_counter() - start
+
+        assert pks is not None
+        assert len(pks) == ROWS
+        print(f'orm  path: {ROWS / orm_cost:.0f} rows/sec')
+        print(f'bulk path: {ROWS / bulk_cost:.0f} rows/sec')
+    finally:
+        resource_dao.delete_model_by_columns(queue=QUEUE)
@@ -0,0 +1,52 @@
+import os
+import time
+
+from app.crud.crud_resource import resource_dao
+from app.do.resource import ResourceDO
+from app.model.resource_model import ResourceModel
+from common.enum.resource import ResourceType
+
+
+ROWS = 1_000_000
+BATCH = 10_000
+QUEUE = 'bench_iter_models'
+TEXT = 'x' * 1024
+
+
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def _prepare():
+    for start in range(0, ROWS, BATCH):
+        resource_dao.create_models(
+            [
+                ResourceDO(name=f'bench-{i}', queue=QUEUE, extension='mp3', storage_url='/bench',
+                           type=ResourceType.AUDIO, text=TEXT)
+                for i in range(start, start + BATCH)
+            ],
+            bulk=True,
+        )
+
+
+def test_bench_iter_models():
+    """遍历 100 万行（每行 1KB text），RSS 应保持平稳，需要本地 mysql"""
+    try:
+        _prepare()
+        samples = []
+        start = time.perf_counter()
+        # text 是 deferred 列，显式加载，每行都读取 1KB 的 TEXT
+        fields = tuple(ResourceModel.__table__.columns.keys())
+        for i, _ in enumerate(resource_dao.iter_models(batch_size=1000, fields=fields, queue=QUEUE)):
+            if i % 100_000 == 0:
+                samples.append(_rss_mb())
+        cost = time.perf_counter() - start
+
+        print(f'iter_models: {ROWS / cost:.0f} rows/sec')
+        print('rss(MB) every 100k rows: ' + ', '.join(f'{s:.1f}' for s in samples))
+        # 前几批需要预热（连接、编译缓存），之后 RSS 不应随行数增长
+        assert max(samples[1:]) - samples[1] < 50
+    finally:
+        resource_dao.delete_model_by_columns(queue=QUEUE)
@@ -0,0 +1,81 @@
+import time
+import tracemalloc
+
+from datetime import datetime
+
+import httpx
+import pytest
+
+from fastapi import APIRouter, FastAPI
+
+from app.do.resource import ResourceDO
+from app.model.resource_model import ResourceModel
+from common.response.response_schema import ResponseModel, response_base
+from utils.serializers import MsgSpecJSONResponse, MsgSpecRoute
+
+
+REQUESTS = 5000
+TRACED_REQUESTS = 200
+TEXT = 'x' * 2048
+
+
+def _resource() -> ResourceModel:
+    resource = ResourceModel(id='bench', parent_id=None, queue='bench', name='bench', type='audio', extension='mp3',
+                             meta_data={}, storage_url='/bench', config={}, text=TEXT, text_url=None)
+    resource.create_time = resource.update_time = datetime.now()
+    return resource
+
+
+def _app() -> FastAPI:
+    """两条路由读同一个 orm 实例，只比较序列化路径，不访问数据库"""
+    resource = _resource()
+    pydantic, msgspec = APIRouter(), APIRouter(route_class=MsgSpecRoute)
+
+    @pydantic.get('/pydantic/resources/{id}')
+    async def get_pydantic(id: str) -> ResponseModel:
+        # 旧路径：from_orm 构造 pydantic 对象，再由 fastapi 按 response_model 校验、jsonable_encoder 后编码
+        return response_base.success(data=ResourceDO.from_orm(resource))
+
+    @msgspec.get('/msgspec/resources/{id}')
+    async def get_msgspec(id: str) -> ResponseModel:
+        return response_base.success(data=ResourceDO.struct_from_orm(resource))
+
+    app = FastAPI(default_response_class=MsgSpecJSONResponse)
+    app.include_router(pydantic)
+    app.include_router(msgspec)
+    return app
+
+
+async def _run(client: httpx.AsyncClient, url: str, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        response = await client.get(url)
+        assert response.status_code == 200
+    return time.perf_counter() - start
+
+
+@pytest.mark.asyncio
+async def test_bench_response():
+    """
+    GET /resources/{id} 的 requests/sec 与每个响应的峰值内存分配（tracemalloc，含 httpx 客户端的固定开销），
+    pydantic 路径对比 msgspec 路径
+    """
+    transport = httpx.ASGITransport(app=_app())
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for path in ('pydantic', 'msgspec'):
+            url = f'/{path}/resources/bench'
+            await _run(client, url, 100)
+            elapsed = await _run(client, url, REQUESTS)
+
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                peaks = []
+                for _ in range(TRACED_REQUESTS):
+                    tracemalloc.reset_peak()
+                    await client.get(url)
+                    peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            finally:
+                tracemalloc.stop()
+            print(f'{path:>8}: {REQUESTS / elapsed:,.0f} req/s, '
+                  f'peak allocation {sum(peaks) / len(peaks) / 1024:.1f}KiB/response')
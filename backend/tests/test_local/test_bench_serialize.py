@@ -0,0 +1,75 @@
+import time
+
+from decimal import Decimal
+
+from fastapi.encoders import decimal_encoder
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+
+from app.crud.crud_resource import resource_dao
+from app.do.resource import ResourceDO
+from app.model.resource_model import ResourceModel
+from common.enum.resource import ResourceType
+from libs.database.session import get_session
+from utils.serializers import RowSerializer, select_list_serialize
+
+
+ROWS = 100_000
+BATCH = 10_000
+QUEUE = 'bench_serialize'
+
+
+def _legacy_serialize(rows) -> list:
+    # 改动前的 select_list_serialize：每行每列 __table__.columns.keys()、getattr 与 isinstance(Decimal)
+    result = []
+    for row in rows:
+        item = {}
+        for column in row.__table__.columns.keys():
+            v = getattr(row, column)
+            if isinstance(v, Decimal):
+                v = decimal_encoder(v)
+            item[column] = v
+        result.append(item)
+    return result
+
+
+def _prepare():
+    for start in range(0, ROWS, BATCH):
+        resource_dao.create_models(
+            [
+                ResourceDO(name=f'bench-{i}', queue=QUEUE, extension='mp3', storage_url='/bench',
+                           type=ResourceType.AUDIO)
+                for i in range(start, start + BATCH)
+            ],
+            bulk=True,
+        )
+
+
+def _timed(label: str, fn) -> list:
+    start = time.perf_counter()
+    items = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:>16}: {elapsed * 1000:.0f}ms, {len(items) / elapsed:,.0f} rows/s')
+    return items
+
+
+def test_bench_serialize():
+    """10 万行列表序列化：orm + 逐行反射、orm + 编译后的序列化器、Core 行直接序列化，需要本地 mysql"""
+    table = ResourceModel.__table__
+    try:
+        _prepare()
+        session = get_session()
+        # text 是 deferred 列，逐行访问会各补一次查询
+        orm_query = select(ResourceModel).options(undefer(ResourceModel.text)).where(ResourceModel.queue == QUEUE)
+        core_query = select(table).where(table.c.queue == QUEUE)
+
+        legacy = _timed('orm + legacy', lambda: _legacy_serialize(session.execute(orm_query).scalars().all()))
+        session.expunge_all()
+        compiled = _timed('orm + compiled', lambda: select_list_serialize(session.execute(orm_query).scalars().all()))
+        session.expunge_all()
+        serializer = RowSerializer.for_columns(core_query.selected_columns)
+        core = _timed('core rows', lambda: serializer.serialize_all(session.execute(core_query)))
+        assert len(legacy) == len(compiled) == len(core) == ROWS
+        assert compiled == legacy
+    finally:
+        resource_dao.delete_model_by_columns(queue=QUEUE)
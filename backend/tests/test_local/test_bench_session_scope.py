@@ -0,0 +1,101 @@
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+import httpx
+import pytest
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from app.crud.crud_resource import resource_async_dao
+from app.schema.resource_schema import CreateResourceRequest
+from app.service.resource_service import resource_service
+from common.enum.resource import ResourceType
+from libs.database.session import RequestSessionMiddleware, read_only
+
+
+REQUESTS = 500
+QUEUE = 'bench_session_scope'
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestSessionMiddleware)
+
+    @app.get('/health')
+    async def health():
+        return {'status': 'ok'}
+
+    # select_version 不经过实体缓存，每个请求都会访问数据库
+    @app.get('/resources/{id}')
+    async def get_resource(id: str):
+        return {'update_time': (await resource_async_dao.select_version(id)).update_time}
+
+    @app.get('/read_only/resources/{id}', dependencies=[Depends(read_only)])
+    async def get_resource_read_only(id: str):
+        return {'update_time': (await resource_async_dao.select_version(id)).update_time}
+
+    @app.post('/resources/{id}')
+    async def update_resource(id: str):
+        await resource_async_dao.update_model(id, {'text_url': '/bench'})
+        return {}
+
+    return app
+
+
+@contextmanager
+def count_events() -> Iterator[Counter]:
+    """统计所有连接池（含 asyncio 引擎）的检出次数，以及所有引擎的 COMMIT 与发出的语句数"""
+    counter = Counter()
+
+    def on_checkout(*args):
+        counter['checkout'] += 1
+
+    def on_commit(conn):
+        counter['commit'] += 1
+
+    def on_execute(*args):
+        counter['statement'] += 1
+
+    event.listen(Pool, 'checkout', on_checkout)
+    event.listen(Engine, 'commit', on_commit)
+    event.listen(Engine, 'before_cursor_execute', on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(Pool, 'checkout', on_checkout)
+        event.remove(Engine, 'commit', on_commit)
+        event.remove(Engine, 'before_cursor_execute', on_execute)
+
+
+@pytest.mark.asyncio
+async def test_bench_session_scope():
+    """
+    RequestSessionMiddleware 下每个请求的连接检出、COMMIT 与语句数，需要本地 mysql；
+    未访问数据库的请求应为 0，只读请求不提交，写请求提交一次
+    """
+    request = CreateResourceRequest(name='bench', queue=QUEUE, extension='mp3', storage_url='/bench',
+                                    type=ResourceType.AUDIO)
+    await resource_service.create(request)
+    routes = [
+        ('GET', '/health'),
+        ('GET', '/resources/missing/extra'),  # 404，不进入路由
+        ('GET', f'/resources/{request.id}'),
+        ('GET', f'/read_only/resources/{request.id}'),
+        ('POST', f'/resources/{request.id}'),
+    ]
+    try:
+        transport = httpx.ASGITransport(app=_app())
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            for method, url in routes:
+                with count_events() as counter:
+                    for _ in range(REQUESTS):
+                        await client.request(method, url)
+                print(f'{method:>4} {url.replace(request.id, "{id}"):<30}: '
+                      f'checkout {counter["checkout"] / REQUESTS:.2f}, commit {counter["commit"] / REQUESTS:.2f}, '
+                      f'statement {counter["statement"] / REQUESTS:.2f} per request')
+    finally:
+        await resource_async_dao.delete_model_by_columns(queue=QUEUE)
@@ -0,0 +1,41 @@
+import time
+
+from sqlalchemy import and_, select, update
+
+from app.crud.crud_resource import resource_dao
+from app.do.resource import ResourceDO
+from app.model.resource_model import ResourceModel
+from common.enum.resource import ResourceType
+from libs.database.session import get_session
+
+
+QUERIES = 20000
+QUEUE = 'bench_statement_cache'
+
+
+def _qps(fn) -> float:
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        fn(i)
+    return QUERIES / (time.perf_counter() - start)
+
+
+def test_bench_statement_cache():
+    """按形状缓存语句前后的 queries/sec，before 为每次调用重新构造语句的旧写法，需要本地 mysql"""
+    resource = ResourceDO(name='bench', queue=QUEUE, extension='mp3', storage_url='/bench', type=ResourceType.AUDIO)
+    resource_dao.create_model(resource)
+    session = get_session()
+    try:
+        before = _qps(lambda i: session.execute(
+            select(ResourceModel).where(and_(ResourceModel.queue == QUEUE, ResourceModel.name == 'bench'))
+        ).scalars().first())
+        after = _qps(lambda i: resource_dao.select_model_by_columns(queue=QUEUE, name='bench'))
+        print(f'select by columns: before {before:.0f} q/s, after {after:.0f} q/s')
+
+        before = _qps(lambda i: session.execute(
+            update(ResourceModel).where(ResourceModel.queue == QUEUE).values(text_url=f'/{i}')
+        ))
+        after = _qps(lambda i: resource_dao.update_model_by_columns({'text_url': f'/{i}'}, queue=QUEUE))
+        print(f'update by columns: before {before:.0f} q/s, after {after:.0f} q/s')
+    finally:
+        resource_dao.delete_model_by_columns(queue=QUEUE)
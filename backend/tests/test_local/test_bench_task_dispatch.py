@@ -0,0 +1,93 @@
+import multiprocessing
+import threading
+import time
+
+from app.do.resource import ResourceDO
+from app.do.task import TaskDO
+from app.task.task_worker import TaskWorkerPool
+from common.enum.resource import ResourceType
+from core.base import RUNNERS, BaseRunner
+
+
+TASKS = 2000
+TYPE = 'BENCH'
+RESOURCE = ResourceDO(name='bench', extension='mp3', storage_url='/bench', type=ResourceType.AUDIO)
+
+
+class NoopRunner(BaseRunner):
+    def run(self, resource):
+        pass
+
+
+class SleepRunner(BaseRunner):
+    """模拟 io 密集的 runner"""
+
+    def run(self, resource):
+        time.sleep(0.002)
+
+
+class _Pool(TaskWorkerPool):
+    """不读写数据库，只统计完成的任务数"""
+
+    def __init__(self, mode: str):
+        super().__init__(modes={TYPE: mode}, mp_context=multiprocessing.get_context('fork'))
+        self.done = 0
+        self.finished = threading.Event()
+
+    def load_resource(self, task):
+        return RESOURCE
+
+    def report(self, task, outcome):
+        self.done += 1
+        if self.done == TASKS:
+            self.finished.set()
+
+
+def _consume(queue, acks, runner):
+    # 旧路径：TaskConsumer 子进程从 multiprocessing.Queue 逐个取任务执行
+    for _ in range(TASKS):
+        queue.get()
+        runner().run(RESOURCE)
+    acks.put(TASKS)
+
+
+def _bench_queue(tasks: list[TaskDO]) -> float:
+    queue, acks = multiprocessing.Queue(maxsize=5), multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=_consume, args=(queue, acks, RUNNERS[TYPE]), daemon=True)
+    consumer.start()
+    start = time.perf_counter()
+    for task in tasks:
+        queue.put(task)
+    acks.get()
+    return time.perf_counter() - start
+
+
+def _bench_pool(mode: str, tasks: list[TaskDO]) -> float:
+    pool = _Pool(mode)
+    pool.start()
+    # 预热进程池
+    pool.submit(tasks[0])
+    pool.done = 0
+    start = time.perf_counter()
+    for task in tasks:
+        pool.submit(task)
+    pool.finished.wait()
+    return time.perf_counter() - start
+
+
+def test_bench_task_dispatch():
+    """
+    对比 multiprocessing.Queue 与进程内 worker pool（线程池 / 进程池）每个任务的耗时：
+    空 runner 衡量调度开销，SleepRunner 衡量 io 密集任务的并发，不需要 mysql
+    """
+    tasks = [TaskDO(id=i, resource_id=RESOURCE.id, type=TYPE, lease_owner='bench') for i in range(TASKS)]
+    try:
+        for runner in (NoopRunner, SleepRunner):
+            RUNNERS[TYPE] = runner
+            for name, bench in (('mp.Queue', _bench_queue),
+                                ('thread', lambda t: _bench_pool('thread', t)),
+                                ('process', lambda t: _bench_pool('process', t))):
+                cost = bench(tasks)
+                print(f'{runner.__name__:>11} {name:>8}: {cost * 1e6 / TASKS:.1f}us/task')
+    finally:
+        RUNNERS.pop(TYPE, None)
@@ -0,0 +1,136 @@
+"""
+查询计划回归：调用 task / resource 的 CRUD 方法，记录实际发出的 SELECT / UPDATE / DELETE，逐条 EXPLAIN，
+出现全表扫描（type=ALL）或 Using filesort 即失败；需要本地 mysql，且已执行 migrations
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Iterator
+
+import pytest
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.engine import Engine
+
+from app.crud.crud_resource import resource_async_dao, resource_cache, resource_dao
+from app.crud.crud_task import task_async_dao, task_dao
+from app.model.resource_model import ResourceModel
+from app.model.task_dependency_model import TaskDependencyModel
+from app.model.task_model import TaskModel
+from common.enum.task import TaskStatus
+from libs.database.db_mysql import engine
+from libs.database.session import request_session_scope
+
+
+QUEUE = 'test_plan'
+QUEUES = [f'{QUEUE}_{i}' for i in range(8)]
+TYPES = ['stt', 'ocr', 'v2a', 'vfe']
+# 优化器按统计信息选择执行计划，行数太少时全表扫描本身就是最优解
+ROWS = 20000
+OWNER = 'plan'
+
+
+@contextmanager
+def capture() -> Iterator[list[tuple[str, Any]]]:
+    """记录块内所有引擎（含 asyncio 引擎与从库）发出的 SELECT / UPDATE / DELETE 及其参数"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+            statements.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def explain(statement: str, parameters: Any) -> list[dict]:
+    with engine.connect() as conn:
+        return [dict(row) for row in conn.exec_driver_sql(f'EXPLAIN {statement}', parameters).mappings()]
+
+
+def regressions(plan: list[dict]) -> list[dict]:
+    return [row for row in plan if row['type'] == 'ALL' or 'Using filesort' in (row['Extra'] or '')]
+
+
+@pytest.fixture(scope='module')
+def seeded():
+    """
+    按线上的分布造数据：大部分任务已结束，少量 PENDING / RUNNING，资源分散在多个分组
+    """
+    now = datetime.now()
+    resources, tasks = [], []
+    for i in range(ROWS):
+        queue = QUEUES[i % len(QUEUES)]
+        resource_id = f'{QUEUE}-{i:08d}'
+        resources.append(dict(
+            id=resource_id, parent_id=f'{QUEUE}-{i // 10 * 10:08d}' if i % 10 else None, queue=queue,
+            name=resource_id, type='audio', extension='mp3', storage_url='/plan',
+        ))
+        if i % 50 == 0:
+            status, lease = TaskStatus.PENDING.value, None
+        elif i % 50 == 1:
+            status, lease = TaskStatus.RUNNING.value, now + timedelta(seconds=600 if i % 100 else -600)
+        else:
+            status, lease = TaskStatus.SUCCESS.value, None
+        tasks.append(dict(
+            resource_id=resource_id, queue=queue, type=TYPES[i % len(TYPES)], status=status,
+            retry_count=0, pending_upstreams=0, run_time=now - timedelta(seconds=i % 7),
+            lease_owner=OWNER if lease else None, lease_expire_time=lease,
+        ))
+    with engine.begin() as conn:
+        conn.execute(insert(ResourceModel), resources)
+        conn.execute(insert(TaskModel), tasks)
+        conn.exec_driver_sql('ANALYZE TABLE task, resource, task_dependency')
+    try:
+        yield
+    finally:
+        task_ids = select(TaskModel.id).where(TaskModel.queue.in_(QUEUES))
+        with engine.begin() as conn:
+            conn.execute(delete(TaskDependencyModel).where(TaskDependencyModel.task_id.in_(task_ids)))
+            conn.execute(delete(TaskModel).where(TaskModel.queue.in_(QUEUES)))
+            conn.execute(delete(ResourceModel).where(ResourceModel.queue.in_(QUEUES)))
+
+
+@pytest.mark.asyncio
+async def test_query_plans(seeded):
+    resource_cache.clear()
+    resource_id = f'{QUEUE}-{ROWS // 2:08d}'
+    with capture() as statements:
+        # producer / worker / reaper
+        task_dao.count_ready()
+        claimed = task_dao.claim(OWNER, limit=2, queues=[QUEUES[0]], types=[TYPES[0]])
+        assert len(claimed) == 2
+        task_dao.heartbeat([t.id for t in claimed], claimed[0].lease_owner)
+        task_dao.list_by_ids([t.id for t in claimed])
+        task_dao.complete(claimed[0].id, claimed[0].lease_owner, TaskStatus.SUCCESS)
+        task_dao.complete(claimed[1].id, claimed[1].lease_owner, TaskStatus.FAILED, error_msg='plan')
+        task_dao.reap_expired()
+        resource_dao.select_model_by_id(resource_id)
+        resource_dao.update_model(resource_id, {'text_url': '/plan'})
+        # api
+        async with request_session_scope():
+            await task_async_dao.count_ready()
+            await resource_async_dao.select_model_by_id(f'{QUEUE}-{ROWS // 3:08d}')
+            await resource_async_dao.list_existing_ids([resource_id, 'missing'])
+            await resource_async_dao.select_version(resource_id)
+            parent_id = f'{QUEUE}-{ROWS // 2 // 10 * 10:08d}'
+            for conditions in ({}, {'queue': QUEUES[1]}, {'parent_id': parent_id},
+                               {'queue': QUEUES[0], 'parent_id': parent_id}):
+                page = await resource_async_dao.select_models_keyset(size=10, **conditions)
+                if page.next_cursor:
+                    page = await resource_async_dao.select_models_keyset(cursor=page.next_cursor, size=10,
+                                                                         **conditions)
+                    await resource_async_dao.select_models_keyset(cursor=page.previous_cursor, size=10,
+                                                                  **conditions)
+
+    failures = []
+    for statement, parameters in statements:
+        plan = explain(statement, parameters)
+        if regressions(plan):
+            failures.append('\n'.join([statement, *(
+                f"  {row['table']}: type={row['type']} key={row['key']} rows={row['rows']} extra={row['Extra']}"
+                for row in plan
+            )]))
+    assert not failures, '全表扫描或 filesort:\n' + '\n\n'.join(failures)
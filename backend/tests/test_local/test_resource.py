@@ -1,12 +1,92 @@
+import csv
+import gzip
+import io
+
+import msgspec
 import pytest
 
+from app.crud.crud_resource import resource_async_dao, resource_dao
+from app.crud.crud_task import task_async_dao
 from app.schema.resource_schema import CreateResourceRequest
 from app.service.resource_service import resource_service
-from common.enum.resource import ResourceType
+from common.enum.resource import ExportFormat, ResourceType
 
 
 @pytest.mark.asyncio
 async def test_create_resource():
-    resource_service.create(
+    await resource_service.create(
         CreateResourceRequest(name="123", extension="mp3", storage_url="/abc", type=ResourceType.AUDIO))
     print("end")
+
+
+@pytest.mark.asyncio
+async def test_create_resource_batch():
+    request = CreateResourceRequest(name="123", extension="mp4", storage_url="/abc", type=ResourceType.VIDEO)
+    results = await resource_service.create_batch([request, request.model_copy(update={'id': 'dup'}),
+                                                   request.model_copy(update={'id': 'dup'})])
+    assert results[0].id
+    assert results[1].id == 'dup'
+    assert results[2].error is not None
+
+
+@pytest.mark.asyncio
+async def test_create_resource_batch_concurrent_insert(monkeypatch):
+    """查重之后其他事务写入了相同 id：只跳过冲突的条目，需要本地 mysql"""
+    queue = 'test_batch_race'
+    requests = [CreateResourceRequest(id=f'{queue}_{i}', name=f'n{i}', queue=queue, extension='mp3',
+                                      storage_url='/abc', type=ResourceType.AUDIO) for i in range(3)]
+    await resource_service.create(requests[1])
+
+    async def list_existing_ids(ids):
+        return set()
+
+    # 模拟查重时 requests[1] 尚未写入
+    monkeypatch.setattr(resource_async_dao, 'list_existing_ids', list_existing_ids)
+    try:
+        results = await resource_service.create_batch(requests)
+        assert [r.id for r in results] == [requests[0].id, None, requests[2].id]
+        assert '已存在' in results[1].error
+        tasks = await task_async_dao.select_models_by_column('queue', queue)
+        assert sorted(t.resource_id for t in tasks) == sorted(r.id for r in requests)
+    finally:
+        await resource_async_dao.delete_model_by_columns(queue=queue)
+        await task_async_dao.delete_model_by_columns(queue=queue)
+
+
+@pytest.mark.asyncio
+async def test_export_resources():
+    """小批量导出，跨多个批次，需要本地 mysql"""
+    queue = 'test_export'
+    requests = [CreateResourceRequest(name=f'n,{i}', queue=queue, extension='mp3', storage_url='/abc',
+                                      type=ResourceType.AUDIO) for i in range(5)]
+    await resource_service.create_batch(requests)
+    try:
+        chunks = resource_service.export(ExportFormat.NDJSON, queue=queue, batch_size=2)
+        lines = b''.join([c async for c in chunks]).splitlines()
+        assert sorted(msgspec.json.decode(line)['name'] for line in lines) == [r.name for r in requests]
+
+        chunks = resource_service.export(ExportFormat.CSV, queue=queue, fields=['id', 'name', 'meta_data'],
+                                         gzip=True, batch_size=2)
+        rows = list(csv.reader(io.StringIO(gzip.decompress(b''.join([c async for c in chunks])).decode())))
+        assert rows[0] == ['id', 'name', 'meta_data']
+        assert len(rows) == 6
+        assert {row[2] for row in rows[1:]} == {'{}'}
+    finally:
+        await resource_async_dao.delete_model_by_columns(queue=queue)
+        await task_async_dao.delete_model_by_columns(queue=queue)
+
+
+@pytest.mark.asyncio
+async def test_output_urls_are_keyed_by_task_type():
+    """同一资源的多个任务分别记录输出地址，互不覆盖，需要本地 mysql"""
+    queue = 'test_output_urls'
+    request = CreateResourceRequest(name='v', queue=queue, extension='mp4', storage_url='/abc', type=ResourceType.VIDEO)
+    await resource_service.create(request)
+    try:
+        assert resource_dao.set_output_url(request.id, 'stt', '/stt.txt') == 1
+        assert resource_dao.set_output_url(request.id, 'ocr', '/ocr.txt') == 1
+        resource = resource_dao.select_model_by_id(request.id)
+        assert resource.output_urls == {'stt': '/stt.txt', 'ocr': '/ocr.txt'}
+    finally:
+        await resource_async_dao.delete_model_by_columns(queue=queue)
+        await task_async_dao.delete_model_by_columns(queue=queue)
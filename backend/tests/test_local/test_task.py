@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy import delete, select, text, update
+
+from app.crud.crud_task import task_async_dao, task_dao
+from app.do.task import TaskDO
+from app.model.task_dependency_model import TaskDependencyModel
+from app.model.task_model import TaskModel
+from app.task.task_reaper import TaskReaper
+from common.enum.task import TaskStatus
+from libs.database.db_mysql import engine
+from libs.database.session import get_async_session, get_session, request_session_scope
+
+
+QUEUE = 'test_task'
+
+
+def test_claim_and_reap():
+    """领取、续约、过期回收，需要本地 mysql"""
+    task_dao.create_models([TaskDO(resource_id='r', queue=QUEUE, type='STT') for _ in range(3)], bulk=True)
+    try:
+        first = task_dao.claim('w1', limit=2, queues=[QUEUE])
+        second = task_dao.claim('w2', limit=2, queues=[QUEUE])
+        assert len(first) == 2
+        assert len(second) == 1
+        assert not {t.id for t in first} & {t.id for t in second}
+        lease = first[0].lease_owner
+        assert lease.startswith('w1:')
+        assert lease != second[0].lease_owner
+        assert task_dao.heartbeat([t.id for t in first], lease) == 2
+        assert task_dao.heartbeat([t.id for t in first], second[0].lease_owner) == 0
+
+        # 模拟 w1 崩溃，租约过期
+        get_session().execute(update(TaskModel).where(TaskModel.lease_owner == lease)
+                              .values(lease_expire_time=datetime(2000, 1, 1)))
+        reaper = TaskReaper()
+        assert reaper.reap() == (2, 0)
+        assert reaper.stats.last_stale_leases == 2
+        tasks = task_dao.list_by_ids([t.id for t in first])
+        assert {(t.status, t.retry_count, t.lease_owner) for t in tasks} == {(TaskStatus.PENDING.value, 1, None)}
+        assert task_dao.complete(first[0].id, lease, TaskStatus.SUCCESS) == 0
+        # 同一 worker 重新领取后，旧的租约不能再续约或结束任务
+        get_session().execute(update(TaskModel).where(TaskModel.id.in_([t.id for t in first]))
+                              .values(run_time=datetime(2000, 1, 1)))
+        again = task_dao.claim('w1', limit=2, queues=[QUEUE])
+        assert {t.id for t in again} == {t.id for t in first}
+        assert task_dao.heartbeat([t.id for t in again], lease) == 0
+        assert task_dao.complete(again[0].id, lease, TaskStatus.SUCCESS) == 0
+    finally:
+        task_dao.delete_model_by_columns(queue=QUEUE)
+
+
+@pytest.mark.asyncio
+async def test_task_graph():
+    """下游任务在上游成功后才能被领取，上游失败时下游被取消，需要本地 mysql"""
+    async with request_session_scope():
+        ids = await task_async_dao.create_graph(
+            [TaskDO(resource_id='r', queue=QUEUE, type=t) for t in ('v2a', 'stt', 'ocr')], {1: [0], 2: [1]}
+        )
+    try:
+        claimed = task_dao.claim('w', limit=10, queues=[QUEUE])
+        assert [t.id for t in claimed] == [ids[0]]
+        task_dao.complete(ids[0], claimed[0].lease_owner, TaskStatus.SUCCESS)
+        claimed = task_dao.claim('w', limit=10, queues=[QUEUE])
+        assert [t.id for t in claimed] == [ids[1]]
+        task_dao.complete(ids[1], claimed[0].lease_owner, TaskStatus.FAILED, error_msg='x')
+        assert task_dao.list_by_ids([ids[2]])[0].status == TaskStatus.CANCEL.value
+    finally:
+        task_dao.delete_model_by_columns(queue=QUEUE)
+
+
+@pytest.mark.asyncio
+async def test_task_graph_edges_use_real_ids():
+    """auto_increment_increment != 1 时自增 id 不连续，依赖关系与 pending_upstreams 仍对应真实的任务，需要本地 mysql"""
+    types = ('v2a', 'stt', 'ocr')
+    async with request_session_scope():
+        session = get_async_session()
+        await session.execute(text('SET SESSION auto_increment_increment = 2'))
+        try:
+            ids = await task_async_dao.create_graph(
+                [TaskDO(resource_id='r', queue=QUEUE, type=t) for t in types], {1: [0], 2: [0, 1]}
+            )
+        finally:
+            await session.execute(text('SET SESSION auto_increment_increment = 1'))
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(TaskModel.type, TaskModel.id, TaskModel.pending_upstreams).where(TaskModel.queue == QUEUE)
+            ).all()
+            edges = set(conn.execute(
+                select(TaskDependencyModel.upstream_id, TaskDependencyModel.task_id)
+                .where(TaskDependencyModel.task_id.in_(ids))
+            ).all())
+        real = {type: id for type, id, _ in rows}
+        assert ids == [real[t] for t in types]
+        assert {type: pending for type, _, pending in rows} == {'v2a': 0, 'stt': 1, 'ocr': 2}
+        assert edges == {(real['v2a'], real['stt']), (real['v2a'], real['ocr']), (real['stt'], real['ocr'])}
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(TaskDependencyModel).where(TaskDependencyModel.task_id.in_(ids)))
+        task_dao.delete_model_by_columns(queue=QUEUE)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import importlib.util
+import zlib
+
+from typing import AsyncIterable, AsyncIterator, Protocol
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from libs.conf import settings
+
+
+# wbits=31 输出 gzip 格式（带 header 与 crc32）
+GZIP_WBITS = 31
+
+# 只压缩文本类响应，图片、音视频与压缩包本身已经压缩过
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml')
+
+
+async def gzip_stream(chunks: AsyncIterable[bytes], level: int = settings.COMPRESS_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """
+    逐块压缩，压缩器只保留窗口大小的状态，内存占用与总长度无关；
+    每块以 Z_SYNC_FLUSH 输出，客户端收到即可解压，不会被压缩器缓冲到下一块或结束
+
+    :param chunks:
+    :param level:
+    :return:
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+class Compressor(Protocol):
+    """与 zlib 压缩对象的接口一致，mode 为 Z_SYNC_FLUSH 时输出已缓冲的数据，Z_FINISH 时结束"""
+
+    def compress(self, data: bytes) -> bytes:
+        ...
+
+    def flush(self, mode: int = zlib.Z_FINISH) -> bytes:
+        ...
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        # 可选依赖，只在客户端接受 br 且已安装时使用
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self, mode: int = zlib.Z_FINISH) -> bytes:
+        return self._compressor.finish() if mode == zlib.Z_FINISH else self._compressor.flush()
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """
+    解析 Accept-Encoding，返回 q > 0 的编码
+
+    :param header: 如 'gzip, deflate, br;q=0.5, identity;q=0'
+    :return:
+    """
+    accepted = set()
+    for item in header.lower().split(','):
+        coding, *params = item.split(';')
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding.strip() and q > 0:
+            accepted.add(coding.strip())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    按 Accept-Encoding 以 br（已安装 brotli 时优先）或 gzip 压缩响应；小于 minimum_size 的响应、
+    非文本类型、已带 Content-Encoding（如导出接口自行 gzip）的响应原样返回
+
+    流式响应逐块压缩并 flush 后立即发送，客户端按块收到完整的数据，背压与未压缩时一致；
+    压缩后的字节与原响应不同，强 ETag 改为弱 ETag，If-None-Match 本身按弱比较，条件请求不受影响
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            minimum_size: int = settings.COMPRESS_MINIMUM_SIZE,
+            gzip_level: int = settings.COMPRESS_GZIP_LEVEL,
+            brotli_quality: int = settings.COMPRESS_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ('br', 'gzip') if importlib.util.find_spec('brotli') else ('gzip',)
+
+    def negotiate(self, accept_encoding: str) -> str | None:
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in self.encodings:
+            if encoding in accepted or '*' in accepted:
+                return encoding
+        return None
+
+    def compressor(self, encoding: str) -> Compressor:
+        if encoding == 'br':
+            return _BrotliCompressor(self.brotli_quality)
+        return zlib.compressobj(self.gzip_level, zlib.DEFLATED, GZIP_WBITS)
+
+    @staticmethod
+    def compressible(start: Message, headers: Headers) -> bool:
+        if start['status'] < 200 or start['status'] in (204, 304) or 'content-encoding' in headers:
+            return False
+        return headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        compressor: Compressor | None = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message['type'] == 'http.response.start':
+                # 等第一块 body 确定是否压缩后再发送响应头
+                start = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+            body, more_body = message.get('body', b''), message.get('more_body', False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start['headers'])
+                if not self.compressible(start, headers) or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = self.compressor(encoding)
+                data = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+                headers['Content-Encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                etag = headers.get('etag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = f'W/{etag}'
+                if more_body:
+                    del headers['Content-Length']
+                else:
+                    headers['Content-Length'] = str(len(data))
+                await send(start)
+            else:
+                data = compressor.compress(body) + compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+            await send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+
+from typing import Any
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    由决定响应内容的各部分（如 id、update_time、返回的字段）生成强 ETag；
+    每次更新都必须改变其中某一部分，update_time 需精确到微秒（datetime(6)），否则同一秒内的更新会返回过期的 304
+
+    :param parts:
+    :return: 带引号的 ETag，如 "9f86d081884c7d65"
+    """
+    digest = hashlib.blake2b('|'.join(map(str, parts)).encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match 按弱比较（忽略 W/ 前缀），压缩中间件把强 ETag 改为弱 ETag 后仍能匹配
+
+    :param if_none_match: 请求头，可能是 * 或逗号分隔的多个 ETag
+    :param etag:
+    :return:
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
@@ -1,12 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from decimal import Decimal
-from typing import Any, Sequence, TypeVar
+import functools
+import inspect
+import operator
+import types
+
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Iterable, Sequence, TypeVar, Union, get_args, get_origin
+
+import msgspec
 
 from fastapi.encoders import decimal_encoder
-from sqlalchemy import Row, RowMapping
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from sqlalchemy import ColumnElement, Numeric, Row, RowMapping
 from sqlalchemy.orm import ColumnProperty, SynonymProperty, class_mapper
-from starlette.responses import JSONResponse
+from sqlalchemy.types import TypeEngine
+from starlette.responses import JSONResponse, Response
 
 from msgspec import json
 
@@ -16,6 +26,106 @@ RowData = Row | RowMapping | Any
 R = TypeVar('R', bound=RowData)
 
 
+def _is_decimal(type_: TypeEngine | None) -> bool:
+    # Numeric(asdecimal=True) 的列读出 Decimal，需要转为 int / float；Float 默认 asdecimal=False
+    return isinstance(type_, Numeric) and bool(type_.asdecimal)
+
+
+class RowSerializer:
+    """
+    按列预先确定输出的 key 与需要转换类型的列，之后每行只做一次 zip 与少量转换
+
+    E.g. ::
+
+        stmt = select(ResourceModel.id, ResourceModel.name)
+        serializer = RowSerializer.for_columns(stmt.selected_columns)
+        items = serializer.serialize_all(session.execute(stmt))
+    """
+
+    __slots__ = ('keys', '_decimals')
+
+    def __init__(self, keys: Sequence[str], types: Sequence[TypeEngine | None] = ()):
+        self.keys = tuple(keys)
+        self._decimals = tuple(key for key, type_ in zip(self.keys, types) if _is_decimal(type_))
+
+    @classmethod
+    def for_columns(cls, columns: Iterable[ColumnElement]) -> 'RowSerializer':
+        columns = list(columns)
+        # 选出的列都有 key（列名或 label）
+        return cls([c.key for c in columns], [c.type for c in columns])  # type: ignore[misc]
+
+    def __call__(self, values: Sequence[Any]) -> dict:
+        result = dict(zip(self.keys, values))
+        for key in self._decimals:
+            if result[key] is not None:
+                result[key] = decimal_encoder(result[key])
+        return result
+
+    def serialize_all(self, rows: Iterable[Sequence[Any]]) -> list[dict]:
+        """
+        Core 查询的行（Row 即 tuple）直接转为 dict，不构造 orm 实例
+
+        :param rows: Result 或行的序列
+        :return:
+        """
+        if self._decimals:
+            return [self(row) for row in rows]
+        keys = self.keys
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def _getter(keys: Sequence[str]) -> Callable[[Any], tuple]:
+    """
+    已加载的列值就在实例的 __dict__ 中，用 itemgetter 一次取出，绕过逐个属性的 descriptor；
+    有未加载的列（deferred、expired）或 synonym 时回退到 getattr，由 orm 补查
+    """
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: (getattr(row, key),)
+    get_items, get_attrs = itemgetter(*keys), attrgetter(*keys)
+
+    def get(row: Any) -> tuple:
+        try:
+            return get_items(row.__dict__)
+        except KeyError:
+            return get_attrs(row)
+
+    return get
+
+
+class ModelSerializer:
+    """
+    按 mapper 编译一次的序列化器：表的列名、对应的 attrgetter 与类型转换，以及 ColumnProperty / SynonymProperty 的 key
+    """
+
+    __slots__ = ('model', '_columns', '_get_columns', '_properties', '_get_properties')
+
+    def __init__(self, model: type):
+        self.model = model
+        columns = model.__table__.columns  # type: ignore[attr-defined]
+        self._columns = RowSerializer(columns.keys(), [c.type for c in columns])
+        self._get_columns = _getter(self._columns.keys)
+        self._properties = tuple(
+            prop.key for prop in class_mapper(model).iterate_properties
+            if isinstance(prop, (ColumnProperty, SynonymProperty))
+        )
+        self._get_properties = _getter(self._properties)
+
+    def columns(self, row: Any) -> dict:
+        return self._columns(self._get_columns(row))
+
+    def columns_all(self, rows: Iterable[Any]) -> list[dict]:
+        return self._columns.serialize_all(map(self._get_columns, rows))
+
+    def properties(self, row: Any) -> dict:
+        return dict(zip(self._properties, self._get_properties(row)))
+
+
+@functools.cache
+def model_serializer(model: type) -> ModelSerializer:
+    return ModelSerializer(model)
+
+
 def select_columns_serialize(row: R) -> dict:
     """
     Serialize SQLAlchemy select table columns, does not contain relational columns
@@ -23,13 +133,8 @@ def select_columns_serialize(row: R) -> dict:
     :param row:
     :return:
     """
-    result = {}
-    for column in row.__table__.columns.keys():
-        v = getattr(row, column)
-        if isinstance(v, Decimal):
-            v = decimal_encoder(v)
-        result[column] = v
-    return result
+    model: type = type(row)
+    return model_serializer(model).columns(row)
 
 
 def select_list_serialize(row: Sequence[R]) -> list:
@@ -39,8 +144,12 @@ def select_list_serialize(row: Sequence[R]) -> list:
     :param row:
     :return:
     """
-    result = [select_columns_serialize(_) for _ in row]
-    return result
+    if not row:
+        return []
+    model: type = type(row[0])
+    if all(type(_) is model for _ in row):
+        return model_serializer(model).columns_all(row)
+    return [select_columns_serialize(_) for _ in row]
 
 
 def select_as_dict(row: R, use_alias: bool = False) -> dict:
@@ -60,20 +169,108 @@ def select_as_dict(row: R, use_alias: bool = False) -> dict:
         if '_sa_instance_state' in result:
             del result['_sa_instance_state']
     else:
-        result = {}
-        mapper = class_mapper(row.__class__)
-        for prop in mapper.iterate_properties:
-            if isinstance(prop, (ColumnProperty, SynonymProperty)):
-                key = prop.key
-                result[key] = getattr(row, key)
+        model: type = type(row)
+        result = model_serializer(model).properties(row)
 
     return result
 
 
+def _struct_type(annotation: Any) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pydantic_struct(annotation)
+    args = get_args(annotation)
+    mapped = tuple(_struct_type(arg) for arg in args)
+    if mapped == args:
+        return annotation
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        return functools.reduce(operator.or_, mapped)
+    return origin[mapped]
+
+
+@functools.cache
+def pydantic_struct(model: type[BaseModel]) -> type[msgspec.Struct]:
+    """
+    按 pydantic 模型的字段（类型、默认值、alias）生成对应的 msgspec.Struct（类名加 Struct 后缀），
+    嵌套的 pydantic 模型一并转换，模型字段变化时不需要手工同步
+
+    :param model:
+    :return:
+    """
+    fields = []
+    for name, info in model.model_fields.items():
+        options: dict[str, Any] = {}
+        if info.alias:
+            options['name'] = info.alias
+        if info.default_factory is not None:
+            options['default_factory'] = info.default_factory
+        elif not info.is_required():
+            options['default'] = info.default
+        fields.append((name, _struct_type(info.annotation), msgspec.field(**options)))
+    return msgspec.defstruct(f'{model.__name__}Struct', fields, kw_only=True, module=model.__module__)
+
+
+def orm_to_struct(row: R, struct: type[msgspec.Struct]) -> msgspec.Struct:
+    """
+    按属性读取 orm 实例构造 Struct，类型转换（如 str -> Enum）在 msgspec 内完成，不经过 pydantic 校验
+
+    :param row:
+    :param struct:
+    :return:
+    """
+    return msgspec.convert(row, struct, from_attributes=True)
+
+
+def _enc_hook(obj: Any) -> Any:
+    # 仍返回 pydantic 对象（如 ResponseModel、KeysetPage）的接口，转为 dict 后继续由 msgspec 编码
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(by_alias=True)
+    raise NotImplementedError(f'Objects of type {type(obj)} are not supported')
+
+
+_encoder = json.Encoder(enc_hook=_enc_hook)
+
+
 class MsgSpecJSONResponse(JSONResponse):
     """
     JSON response using the high-performance msgspec library to serialize data to JSON.
     """
 
     def render(self, content: Any) -> bytes:
-        return json.encode(content)
+        return _encoder.encode(content)
+
+
+class MsgSpecRoute(APIRoute):
+    """
+    handler 的返回值直接由 MsgSpecJSONResponse 编码，跳过 response_model 的校验与 jsonable_encoder；
+    response_model（含返回类型注解）仍用于生成 openapi 文档
+
+    .. warning::
+
+        与 handler 直接返回 Response 相同，通过 Response 参数设置的 header 与状态码不会生效
+
+    E.g. ::
+
+        router = APIRouter(prefix='/resources', route_class=MsgSpecRoute)
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, _encode_returned(endpoint, kwargs.get('status_code') or 200), **kwargs)
+
+
+def _encode_returned(endpoint: Callable[..., Any], status_code: int) -> Callable[..., Any]:
+    # functools.wraps 保留 __wrapped__，fastapi 仍按原函数的签名解析参数与返回类型
+    def encode(content: Any) -> Response:
+        if isinstance(content, Response):
+            return content
+        return MsgSpecJSONResponse(content, status_code=status_code)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return encode(await endpoint(*args, **kwargs))
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return encode(endpoint(*args, **kwargs))
+    return wrapper